@@ -33,7 +33,7 @@ export async function postTokenRefresh(refreshToken: string) {
 		`${getServerApi()}/token/refresh`,
 		{
 			method: "POST",
-			query: { refreshToken },
+			query: { refresh_token: refreshToken },
 		}
 	);
 }
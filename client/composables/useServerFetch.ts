@@ -41,8 +41,9 @@ export async function useServerFetch<T>(url: string, options: any = {}) {
 			await postTokenRefresh(authStore.refreshToken);
 
 		if (refreshStatus.value == "success" && refreshData.value) {
-			// Refresh Token Valid
-			authStore.accessToken = refreshData.value.accessToken;
+			// Refresh Token Valid. It is rotated, so keep the new one
+			authStore.accessToken = refreshData.value.access_token;
+			authStore.refreshToken = refreshData.value.refresh_token;
 
 			options.headers.Authorization = `Bearer ${authStore.accessToken}`;
 
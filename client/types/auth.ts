@@ -11,8 +11,9 @@ export interface SignUpDetails {
 }
 
 export interface TokenRefreshResponse {
-	accessToken: string;
-	tokenType: string;
+	access_token: string;
+	refresh_token: string;
+	token_type: string;
 }
 
 export interface TokenResponse {
@@ -13,12 +13,6 @@ export interface CausalityAssessmentLevelGetResponseInterface {
 	adr_id: string;
 	ml_model_id: string;
 	causality_assessment_level_value: CausalityAssessmentLevelEnum;
-	base_values?: number[];
-	shap_values_matrix?: number[][];
-	shap_values_sum_per_class?: number[];
-	shap_values_and_base_values_sum_per_class?: number[];
-	feature_names?: string[];
-	feature_values?: string[];
 	created_at: string;
 	updated_at: string;
 }
@@ -28,14 +22,23 @@ export interface CausalityAssessmentLevelWithReviewCountGetResponseInterface {
 	adr_id: string;
 	ml_model_id: string;
 	causality_assessment_level_value: CausalityAssessmentLevelEnum;
+	approved_count: number;
+	not_approved_count: number;
+	created_at: string;
+	updated_at: string;
+}
+
+export interface ADRExplanationGetResponseInterface {
+	causality_assessment_level_id: string;
+	adr_id: string;
+	ml_model_id: string;
+	causality_assessment_level_value: CausalityAssessmentLevelEnum;
 	base_values?: number[];
-	shap_values_matrix?: number[][];
 	shap_values_sum_per_class?: number[];
 	shap_values_and_base_values_sum_per_class?: number[];
+	shap_values_matrix?: number[][];
 	feature_names?: string[];
 	feature_values?: any[];
-	approved_count: number;
-	not_approved_count: number;
-	created_at: string;
-	updated_at: string;
+	feature_count: number;
+	other_features_sum_per_class?: number[];
 }
@@ -16,6 +16,28 @@ export interface SMSMessageGetResponse {
 	status_code: number;
 }
 
+export type SMSOutboxStatusEnum = "pending" | "sending" | "sent" | "failed";
+
+export interface SMSOutboxGetResponse {
+	id: string;
+	idempotency_key: string;
+	adr_id?: string;
+	sms_type: SMSMessageTypeEnum;
+	recipients: string[];
+	content: string;
+	status: SMSOutboxStatusEnum;
+	attempts: number;
+	next_attempt_at: string;
+	last_error?: string;
+	created_at: string;
+}
+
+export interface IndividualAlertCampaignPostResponse {
+	campaign_id: string;
+	queued: number;
+	skipped: { adr_id: string; reason: string }[];
+}
+
 export interface SMSMessageCountGetResponse {
 	adr_id: string;
 	medical_institution_mfl_code: string;
@@ -1,46 +1,50 @@
 import calendar
 import datetime
-import json
+import gc
 import logging
 import math
 import os
 import random
+import secrets
 import shutil
-from collections import defaultdict
+import time
+from collections import Counter, defaultdict
 from contextlib import asynccontextmanager
-from typing import List, Tuple
+from typing import List
 from uuid import uuid4
 
-import africastalking
-import boto3
-import joblib
-import jwt
-import mlflow
 import numpy as np
 import pandas as pd
-import shap
 from auth import (
+    build_access_token_claims,
     create_access_token,
     create_refresh_token,
+    decode_refresh_token,
     get_current_user,
-    get_password_hash,
-    verify_password,
+    hash_password,
+    invalidate_principal,
+    verify_and_update_password,
 )
 from basemodels import (
     ActionTakenEnum,
     AdditionalInfoPostRequest,
+    ADRDetailResponse,
+    ADRExplanationGetResponse,
     ADRGetResponse,
     ADRPostRequest,
     ADRReviewCreateRequest,
     ADRReviewGetResponse,
+    CausalityAssessmentLevelDetailResponse,
     CausalityAssessmentLevelEnum,
     CausalityAssessmentLevelGetResponse,
     CriteriaForSeriousnessEnum,
     DechallengeEnum,
     GenderEnum,
+    IndividualAlertCampaignPostRequest,
     IndividualAlertPostRequest,
     IsSeriousEnum,
     KnownAllergyEnum,
+    MedicalInstitutionAutocompleteResponse,
     MedicalInstitutionGetResponse,
     MedicalInstitutionPostRequest,
     MedicalInstitutionTelephoneGetResponse,
@@ -49,44 +53,114 @@ from basemodels import (
     OutcomeEnum,
     PregnancyStatusEnum,
     RechallengeEnum,
+    RescoringJobGetResponse,
+    ReviewBatchCreateRequest,
     ReviewGetResponse,
     SeverityEnum,
     SMSMessageGetResponse,
     SMSMessageTypeEnum,
+    SMSOutboxGetResponse,
     Token,
     UnclassifiablePostRequest,
     UserDetailsBaseModel,
     UserGetResponse,
     UserSignupBaseModel,
 )
+from bulk_updates import set_causality_assessment_level_values
 from config import settings
+from delivery_reports import delivery_report_buffer
+from denormalization import (
+    adjust_review_counts,
+    adjust_review_counts_batch,
+    backfill_current_causality_assessment_levels,
+    backfill_shap_contributions,
+    reconcile_review_counts,
+    refresh_current_causality_assessment_level,
+    set_current_causality_assessment_level,
+)
 from dependencies import get_db
 from engines import engine
-from fastapi import Depends, FastAPI, HTTPException, Path, Query, status
+from fastapi import (
+    Depends,
+    FastAPI,
+    Form,
+    HTTPException,
+    Path,
+    Query,
+    status,
+)
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_pagination import Page, add_pagination
 from fastapi_pagination.ext.sqlalchemy import paginate
-from mlflow.tracking import MlflowClient
+from institution_directory import institution_directory
+from metrics import (
+    generate_metrics,
+    inference_duration_seconds,
+    record_cache_lookup,
+    record_request_metrics,
+)
+from migrations import add_missing_columns, migrate_legacy_shap_columns
 from models import (
     ADRModel,
     Base,
     CausalityAssessmentLevelModel,
     MedicalInstitutionModel,
     MedicalInstitutionTelephoneModel,
+    RefreshTokenFamilyModel,
+    RescoringJobModel,
     ReviewModel,
+    ShadowPredictionModel,
+    ShapContributionModel,
     SMSMessageModel,
+    SMSOutboxModel,
     UserModel,
 )
+from prediction import (
+    ML_MODEL_ID_FILENAME,
+    build_explainer,
+    format_feature_values,
+    get_encoders,
+    get_ml_model,
+    get_mlflow_client,
+    get_served_ml_model_id,
+    get_shap_values,
+    input_to_prediction_format,
+    is_scorable,
+)
+from query_profiler import profile_slow_requests, slow_request_log
+from search import (
+    adr_search,
+    create_search_indexes,
+    get_search_params,
+    get_short_terms_condition,
+    medical_institution_search,
+)
+from shadow_scoring import shadow_scorer
 from shap import Explainer, Explanation, KernelExplainer
-from sklearn.base import BaseEstimator
-from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
-from sqlalchemy import case, desc, func, text
+from shap_analytics import shap_importance_cache
+from shap_storage import (
+    decode_shap_values,
+    get_class_values,
+    get_top_feature_indices,
+    get_top_shap_contributions,
+    save_feature_name_set,
+)
+from sms_dispatcher import enqueue_sms, enqueue_sms_batch, sms_dispatcher
+from sqlalchemy import bindparam, case, desc, func, insert, literal_column, text
 from sqlalchemy.engine import Row
-from sqlalchemy.orm import Session, joinedload, load_only
-from typing_extensions import Annotated, Dict
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, load_only, raiseload, undefer_group
+from token_families import (
+    create_token_family,
+    prune_expired_token_families,
+    revoke_token_families,
+    revoked_token_families,
+    rotate_token_family,
+)
+from typing_extensions import Annotated
 
 DB_PATH = "db.sqlite"
 ADR_CSV_PATH = "data.csv"  # Path to the CSV file
@@ -112,35 +186,13 @@ def safe_date_parse(value):
         return None
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+def download_ml_model_artifacts():
     # ML Model Artifacts
     if not os.path.exists(ARTIFACTS_DIR):
         try:
             logging.info("Downloading ML Model Artifacts")
 
-            # Tracking URI
-            mlflow.set_tracking_uri(
-                f"http://{settings.mlflow_tracking_server_host}:{settings.mlflow_tracking_server_port}"
-            )
-
-            # Credentials
-            # Set MinIO Credentials
-            os.environ["AWS_ACCESS_KEY_ID"] = settings.minio_access_key
-            os.environ["AWS_SECRET_ACCESS_KEY"] = settings.minio_secret_access_key
-            os.environ["AWS_DEFAULT_REGION"] = settings.aws_region
-
-            os.environ["MLFLOW_S3_ENDPOINT_URL"] = (
-                f"http://{settings.minio_host}:{settings.minio_api_port}"
-            )
-
-            # Test if credentials are set correctly
-            boto3.client(
-                "s3",
-                endpoint_url=os.getenv("MLFLOW_S3_ENDPOINT_URL"),
-            )
-
-            mlflow_client = MlflowClient()
+            mlflow_client = get_mlflow_client()
 
             ml_model_version = mlflow_client.get_model_version_by_alias(
                 settings.mlflow_model_name, settings.mlflow_model_alias
@@ -168,6 +220,8 @@ async def lifespan(app: FastAPI):
                 "",
                 dst_path=ARTIFACTS_DIR,
             )
+            with open(f"{ARTIFACTS_DIR}/{ML_MODEL_ID_FILENAME}", "w") as f:
+                f.write(f"{settings.mlflow_model_name}/{ml_model_version.version}")
             logging.info("Downloaded ML Model Artifacts")
 
         except Exception as e:
@@ -176,27 +230,44 @@ async def lifespan(app: FastAPI):
     else:
         logging.info("Skipping artifact download")
 
+
+def load_explainer():
+    """Download the bundle if needed and build the SHAP explainer."""
+    global explainer
+
+    if explainer is not None:
+        return
+
+    download_ml_model_artifacts()
+
     # Explain with SHAP
     logging.info("SHAP Explainer Setup Started...")
 
-    ml_model = get_ml_model()
+    explainer = build_explainer(get_ml_model())
 
-    # Load and preprocess new data
-    new_data_df = pd.read_csv("data.csv")
+    logging.info("SHAP Explainer Setup Finished...")
 
-    final_input_df = input_to_prediction_format(new_data_df)
 
-    global explainer
+# With `gunicorn --preload` this module is imported once and the workers are
+# forked from it, so they share the model and explainer instead of each
+# loading a copy
+if settings.preload_explainer:
+    load_explainer()
+    # Objects created so far are never collected, keep the garbage collector
+    # from writing to their shared pages in every worker
+    gc.freeze()
 
-    explainer = shap.KernelExplainer(
-        ml_model.predict_proba, shap.kmeans(final_input_df, 10)
-    )
 
-    logging.info("SHAP Explainer Setup Finished...")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    load_explainer()
 
     # Create tables once before the app starts
     try:
         Base.metadata.create_all(engine)
+        add_missing_columns(engine, Base.metadata)
+        migrate_legacy_shap_columns(engine)
+        create_search_indexes(engine)
     except Exception as e:
         logging.error(f"Error creating tables: {e}")
 
@@ -251,6 +322,15 @@ async def lifespan(app: FastAPI):
     else:
         logging.info("Medical Institution Telephones already inserted")
 
+    institution_directory.refresh(session)
+    logging.info("Medical Institution directory loaded")
+
+    pruned_token_families = prune_expired_token_families(session)
+    revoked_token_families.refresh(session)
+    logging.info(
+        f"Refresh token families loaded ({pruned_token_families} expired pruned)"
+    )
+
     # Add users
     user_count = session.query(UserModel).count()
 
@@ -375,6 +455,7 @@ async def lifespan(app: FastAPI):
             session.refresh(adr_entry)
 
         logging.info("ADR inserted successfully.")
+        ml_model_id = get_served_ml_model_id()
         # Now that adr_entries have IDs, link them to causality entries
         for adr_entry, record in zip(
             adr_entries, new_data_df.to_dict(orient="records")
@@ -383,8 +464,6 @@ async def lifespan(app: FastAPI):
 
             _, ordinal_encoder = get_encoders()
 
-            minmax_scaler = get_scalers()
-
             # Load and preprocess new data
             adr_data_df = pd.DataFrame([record])
 
@@ -412,11 +491,11 @@ async def lifespan(app: FastAPI):
             ]
 
             feature_names = final_input_df.columns.tolist()
-            feature_values = final_input_df.iloc[0].tolist()
 
             # Add causality assessment level
             causality_entry = CausalityAssessmentLevelModel(
                 adr_id=adr_entry.id,
+                ml_model_id=ml_model_id,
                 causality_assessment_level_value=CausalityAssessmentLevelEnum(
                     decoded_prediction
                 ),
@@ -424,8 +503,13 @@ async def lifespan(app: FastAPI):
                 shap_values_matrix=shap_values_matrix,
                 shap_values_sum_per_class=shap_values_sum_per_class,
                 shap_values_and_base_values_sum_per_class=shap_values_and_base_values_sum_per_class,
-                feature_names=feature_names,
-                feature_values=format_feature_values(feature_values),
+                feature_name_set_id=save_feature_name_set(
+                    session, ml_model_id, feature_names
+                ),
+                feature_values=format_feature_values(final_input_df),
+                shap_contributions=get_shap_contributions(
+                    shap_values, feature_names, get_class_values(ordinal_encoder)
+                ),
             )
 
             causality_entries.append(causality_entry)
@@ -437,6 +521,10 @@ async def lifespan(app: FastAPI):
     else:
         logging.info("ADR and Causality data already exists. Skipping CSV insertion.")
 
+    # Point ADRs at their first causality assessment
+    backfill_current_causality_assessment_levels(session)
+    session.commit()
+
     # Add reviews
     review_count = session.query(ReviewModel).count()
 
@@ -495,6 +583,20 @@ async def lifespan(app: FastAPI):
     else:
         logging.info("Review data already inserted")
 
+    # Repair review tallies that drifted (or were just added to the schema)
+    repaired_review_counts = reconcile_review_counts(session)
+    session.commit()
+    logging.info(f"Review counts reconciled ({repaired_review_counts} repaired)")
+
+    # Store top SHAP contributions for assessments made before they were kept
+    backfilled_shap_contributions = backfill_shap_contributions(
+        session, get_class_values(get_encoders()[1]), settings.shap_top_k
+    )
+    session.commit()
+    logging.info(
+        f"SHAP contributions backfilled ({backfilled_shap_contributions} assessments)"
+    )
+
         # Add SMS messages for each ADR
     sms_message_count = session.query(SMSMessageModel).count()
 
@@ -543,19 +645,8 @@ async def lifespan(app: FastAPI):
 
         for cal in certain_assessments:
             adr = session.query(ADRModel).filter(ADRModel.id == cal.adr_id).first()
-            reviews = (
-                session.query(ReviewModel)
-                .filter(ReviewModel.causality_assessment_level_id == cal.id)
-                .all()
-            )
-
-            if not reviews:
-                continue
 
-            approvals = sum(1 for r in reviews if r.approved)
-            denials = len(reviews) - approvals
-
-            if approvals > denials:
+            if cal.approved_count > cal.unapproved_count:
                 # Add a random number of messages
                 for _ in range(random.randint(0, 3)):
                     sms_message = SMSMessageModel(
@@ -584,8 +675,16 @@ async def lifespan(app: FastAPI):
 
     session.close()
 
+    sms_dispatcher.start()
+    delivery_report_buffer.start()
+    shadow_scorer.start()
+
     yield
 
+    await sms_dispatcher.stop()
+    await delivery_report_buffer.stop()
+    shadow_scorer.stop()
+
     # # Delete the SQLite database after shutdown
     # if os.path.exists(DB_PATH):
     #     try:
@@ -613,6 +712,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.middleware("http")(record_request_metrics)
+
+if slow_request_log.enabled:
+    app.middleware("http")(profile_slow_requests)
+
 add_pagination(app)
 
 
@@ -622,6 +726,12 @@ def root():
     return "test"
 
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    content, media_type = generate_metrics()
+    return Response(content=content, media_type=media_type)
+
+
 @app.post("/api/v1/signup", status_code=status.HTTP_201_CREATED)
 async def signup(user: UserSignupBaseModel, db: Session = Depends(get_db)):
     existing_user = (
@@ -635,7 +745,7 @@ async def signup(user: UserSignupBaseModel, db: Session = Depends(get_db)):
 
     new_user = UserModel(
         username=user.username,
-        password=get_password_hash(user.username),
+        password=await hash_password(user.password),
         first_name=user.first_name,
         last_name=user.last_name,
     )
@@ -671,95 +781,123 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    if not verify_password(form_data.password, existing_user.password):
+    is_valid_password, updated_password_hash = await verify_and_update_password(
+        form_data.password, existing_user.password
+    )
+
+    if not is_valid_password:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token_expires = datetime.timedelta(
-        minutes=settings.server_access_token_expire_minutes
-    )
+    # The stored hash was made with a different bcrypt cost
+    if updated_password_hash is not None:
+        existing_user.password = updated_password_hash
+        db.commit()
 
-    access_token = create_access_token(
-        data={"sub": existing_user.username}, expires_delta=access_token_expires
+    # A fresh login replaces whatever principal was cached for older tokens
+    invalidate_principal(existing_user.username)
+
+    return JSONResponse(
+        content=jsonable_encoder(create_session_tokens(db, existing_user)),
+        status_code=status.HTTP_200_OK,
     )
 
+
+def create_session_tokens(
+    db: Session, user: UserModel, family: RefreshTokenFamilyModel | None = None
+) -> dict:
+    """Issue an access and refresh token pair, starting a token family if needed."""
     refresh_token_expires = datetime.timedelta(
         days=settings.server_refresh_token_expire_days
     )
 
-    refresh_token = create_refresh_token(
-        data={"sub": existing_user.username}, expires_delta=refresh_token_expires
-    )
+    if family is None:
+        family = create_token_family(db, user.id, refresh_token_expires)
 
-    return JSONResponse(
-        content=jsonable_encoder(
-            {
-                "access_token": access_token,
-                "refresh_token": refresh_token,
-                "token_type": "bearer",
-            }
+    access_token = create_access_token(
+        data=build_access_token_claims(user, family.id),
+        expires_delta=datetime.timedelta(
+            minutes=settings.server_access_token_expire_minutes
         ),
-        status_code=status.HTTP_200_OK,
     )
 
+    refresh_token = create_refresh_token(
+        data={"sub": user.username, "fid": family.id, "jti": family.current_jti},
+        expires_delta=refresh_token_expires,
+    )
 
-@app.post("/api/v1/token/refresh", status_code=status.HTTP_201_CREATED)
-async def refresh_access_token(refresh_token: str):
-    try:
-        payload = jwt.decode(
-            refresh_token,
-            settings.server_refresh_secret_key,
-            algorithms=[settings.server_refresh_algorithm],
-        )
-        username = payload.get("sub")
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
 
-        if username is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
-            )
 
-        # Generate new access token
-        new_access_token = create_access_token(
-            data={"sub": username},
-            expires_delta=datetime.timedelta(
-                minutes=settings.server_access_token_expire_minutes
-            ),
-        )
-        return {"access_token": new_access_token, "token_type": "bearer"}
+@app.post("/api/v1/token/refresh", status_code=status.HTTP_201_CREATED)
+async def refresh_access_token(refresh_token: str, db: Session = Depends(get_db)):
+    payload = decode_refresh_token(refresh_token)
 
-    except jwt.ExpiredSignatureError:
+    family = rotate_token_family(
+        db,
+        payload["fid"],
+        payload["jti"],
+        datetime.timedelta(days=settings.server_refresh_token_expire_days),
+    )
+
+    if family is None:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token reused or revoked",
         )
-    except jwt.JWTError:
+
+    existing_user = db.get(UserModel, family.user_id)
+
+    if existing_user is None or existing_user.username != payload["sub"]:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
         )
 
+    invalidate_principal(existing_user.username)
 
-@app.get("/api/v1/users/me", status_code=status.HTTP_201_CREATED)
-async def read_users_me(
+    # The previous refresh token is spent; the client must store the new one
+    return create_session_tokens(db, existing_user, family)
+
+
+@app.post("/api/v1/token/revoke", status_code=status.HTTP_200_OK)
+async def revoke_refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+    payload = decode_refresh_token(refresh_token)
+
+    revoke_token_families(db, [payload["fid"]])
+
+    return {"revoked": 1}
+
+
+@app.post("/api/v1/users/me/revoke_sessions", status_code=status.HTTP_200_OK)
+async def revoke_sessions_for_current_user(
     current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
     db: Session = Depends(get_db),
 ):
-    db_user = (
-        db.query(UserModel)
-        .options(
-            load_only(
-                UserModel.id,
-                UserModel.username,
-                UserModel.first_name,
-                UserModel.last_name,
-            )
+    family_ids = [
+        family_id
+        for (family_id,) in db.query(RefreshTokenFamilyModel.id).filter(
+            RefreshTokenFamilyModel.user_id == current_user.id,
+            RefreshTokenFamilyModel.revoked_at.is_(None),
         )
-        .filter(UserModel.username == current_user.username)
-        .first()
-    )
+    ]
+
+    revoke_token_families(db, family_ids)
+
+    return {"revoked": len(family_ids)}
 
-    return db_user
+
+@app.get("/api/v1/users/me", status_code=status.HTTP_201_CREATED)
+async def read_users_me(
+    current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
+):
+    return current_user
 
 
 @app.get(
@@ -770,18 +908,33 @@ def get_adrs(
     query: str = Query("", description="Search query(optional)"),
     db: Session = Depends(get_db),
 ):
-    if query:
-        content = db.query(ADRModel).filter(
-            ADRModel.patient_name.ilike(f"%{query}%")
-            | ADRModel.patient_address.ilike(f"%{query}%")
-            | ADRModel.inpatient_or_outpatient_number.ilike(f"%{query}%")
-            | ADRModel.ward_or_clinic.ilike(f"%{query}%")
+    search_params = get_search_params(db, "adr_search", query)
+
+    content = db.query(ADRModel)
+
+    if search_params["search"]:
+        content = (
+            content.join(adr_search, adr_search.c.rowid == literal_column("adr.rowid"))
+            .filter(
+                text("adr_search MATCH :search").bindparams(
+                    search=search_params["search"]
+                )
+            )
+            .order_by(adr_search.c.rank)
         )
 
-    else:
-        content = db.query(ADRModel)
+    if search_params["search_short_terms"]:
+        content = content.filter(
+            text(get_short_terms_condition("adr_search", "adr")).bindparams(
+                search_short_terms=search_params["search_short_terms"]
+            )
+        )
 
-    content = content.order_by(desc(ADRModel.created_at))
+    # Read only the columns of the list projection
+    content = content.options(
+        load_only(*(getattr(ADRModel, field) for field in ADRGetResponse.model_fields)),
+        raiseload("*"),
+    ).order_by(desc(ADRModel.created_at))
 
     return paginate(content)
 
@@ -799,46 +952,48 @@ def get_adrs_with_causality_and_review_count(
     db: Session = Depends(get_db),
 ):
     offset = (page - 1) * size
-    search_term = f"%{query}%" if query else None
+    search_params = get_search_params(db, "adr_search", query)
 
     # Total count query
-    total_sql = text("""
+    total_sql = text(f"""
         SELECT COUNT(*) FROM adr
-        WHERE (:query IS NULL OR LOWER(patient_name) LIKE LOWER(:query));
+        WHERE (:search IS NULL OR adr.rowid IN (
+                SELECT rowid FROM adr_search WHERE adr_search MATCH :search
+            ))
+            AND {get_short_terms_condition("adr_search", "adr")};
     """)
-    total_result = db.execute(total_sql, {"query": search_term})
+    total_result = db.execute(total_sql, search_params)
     total = total_result.scalar_one()
     pages = math.ceil(total / size) if total > 0 else 1
 
-    # Main query using ROW_NUMBER and CTE for SQLite compatibility
-    main_sql = text("""
-        WITH ranked_causality AS (
-            SELECT *,
-                   ROW_NUMBER() OVER (PARTITION BY adr_id ORDER BY created_at ASC) AS rn
-            FROM causality_assessment_level
-        )
+    # Main query joining the denormalized first causality assessment and its tallies
+    main_sql = text(f"""
         SELECT
             a.id AS adr_id,
             a.patient_name,
             u.first_name || ' ' || u.last_name AS created_by,
             a.created_at,
             cal.causality_assessment_level_value,
-            COUNT(CASE WHEN r.approved = 1 THEN 1 END) AS approved_reviews,
-            COUNT(CASE WHEN r.approved = 0 THEN 1 END) AS unapproved_reviews
+            COALESCE(cal.approved_count, 0) AS approved_reviews,
+            COALESCE(cal.unapproved_count, 0) AS unapproved_reviews
         FROM adr a
         JOIN "user" u ON a.user_id = u.id
-        LEFT JOIN ranked_causality cal ON cal.adr_id = a.id AND cal.rn = 1
-        LEFT JOIN review r ON r.causality_assessment_level_id = cal.id
-        WHERE (:query IS NULL OR LOWER(a.patient_name) LIKE LOWER(:query))
-        GROUP BY a.id, a.patient_name, u.first_name, u.last_name, cal.causality_assessment_level_value
-        ORDER BY a.created_at DESC
+        LEFT JOIN causality_assessment_level cal
+            ON cal.id = a.current_causality_assessment_level_id
+        LEFT JOIN (
+            SELECT rowid, rank FROM adr_search
+            WHERE :search IS NOT NULL AND adr_search MATCH :search
+        ) search ON search.rowid = a.rowid
+        WHERE (:search IS NULL OR search.rowid IS NOT NULL)
+            AND {get_short_terms_condition("adr_search", "a")}
+        ORDER BY search.rank, a.created_at DESC
         LIMIT :limit OFFSET :offset;
     """)
 
     result = db.execute(
         main_sql,
         {
-            "query": search_term,
+            **search_params,
             "limit": size,
             "offset": offset,
         },
@@ -860,13 +1015,21 @@ def get_adr_by_id(
     adr_id: str = Path(..., description="ID of ADR to read"),
     db: Session = Depends(get_db),
 ):
-    adr = db.query(ADRModel).filter(ADRModel.id == adr_id).first()
+    adr = (
+        db.query(ADRModel)
+        .options(raiseload("*"))
+        .filter(ADRModel.id == adr_id)
+        .first()
+    )
 
     if not adr:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="ADR record not found"
         )
-    return JSONResponse(content=jsonable_encoder(adr), status_code=status.HTTP_200_OK)
+
+    content = jsonable_encoder(ADRDetailResponse.model_validate(adr))
+
+    return JSONResponse(content=content, status_code=status.HTTP_200_OK)
 
 
 @app.post("/api/v1/adr", status_code=status.HTTP_201_CREATED)
@@ -875,14 +1038,9 @@ async def post_adr(
     adr: ADRPostRequest,
     db: Session = Depends(get_db),
 ):
-    # Get user id
-    db_user = (
-        db.query(UserModel).filter(UserModel.username == current_user.username).first()
-    )
-
     adr_model = ADRModel(
         **adr.model_dump(),
-        user_id=db_user.id,
+        user_id=current_user.id,
     )
 
     db.add(adr_model)
@@ -891,60 +1049,65 @@ async def post_adr(
 
     # Check if ADR has the appropriate fields present.
     # If not, set the causality level to unclassified and just return immediately
-    if (
-        adr.rifampicin_suspected is None
-        and adr.isoniazid_suspected is None
-        and adr.pyrazinamide_suspected is None
-        and adr.ethambutol_suspected is None
-    ) or (
-        adr.rechallenge is RechallengeEnum.unknown
-        and adr.dechallenge is DechallengeEnum.unknown
-    ):
+    if not is_scorable(adr):
         casuality_assessment_level_model = CausalityAssessmentLevelModel(
             adr_id=adr_model.id,
+            ml_model_id=get_served_ml_model_id(),
             causality_assessment_level_value=CausalityAssessmentLevelEnum.unclassified,
             base_values=None,
             shap_values_matrix=None,
             shap_values_sum_per_class=None,
             shap_values_and_base_values_sum_per_class=None,
-            feature_names=None,
+            feature_name_set_id=None,
             feature_values=None,
         )
 
         db.add(casuality_assessment_level_model)
+        db.flush()
+        set_current_causality_assessment_level(
+            db, adr_model.id, casuality_assessment_level_model.id
+        )
         db.commit()
-        db.refresh(casuality_assessment_level_model)
 
-        # To load the causality assessment levels
-        content = db.query(ADRModel).filter(ADRModel.id == adr_model.id).first()
+        content = jsonable_encoder(ADRDetailResponse.model_validate(adr_model))
 
         return JSONResponse(
-            content=jsonable_encoder(content),
+            content=content,
             status_code=status.HTTP_201_CREATED,
         )
 
     # Get ML Model
     ml_model = get_ml_model()
+    ml_model_id = get_served_ml_model_id()
 
     # Get encoders
     _, ordinal_encoder = get_encoders()
 
     # Save data as temp df
-    temp_df = pd.DataFrame([adr.model_dump()])
+    adr_record = adr.model_dump()
+    temp_df = pd.DataFrame([adr_record])
+
+    # Timed like the shadow candidate: feature preparation and prediction
+    prediction_started_at = time.perf_counter()
 
     # Extract prediction input
-    prediction_input = input_to_prediction_format(temp_df)
+    with inference_duration_seconds.labels("feature_preparation").time():
+        prediction_input = input_to_prediction_format(temp_df)
 
     # Predict using the ML model
-    prediction = ml_model.predict(prediction_input)
+    with inference_duration_seconds.labels("prediction").time():
+        prediction = ml_model.predict(prediction_input)
 
     decoded_prediction = ordinal_encoder.inverse_transform(prediction.reshape(-1, 1))[
         0
     ][0]
 
+    prediction_latency_ms = (time.perf_counter() - prediction_started_at) * 1000
+
     global explainer
 
-    shap_values = explainer(prediction_input)
+    with inference_duration_seconds.labels("shap").time():
+        shap_values = explainer(prediction_input)
 
     broken_down_shap_values = get_shap_values(shap_values)
 
@@ -956,11 +1119,11 @@ async def post_adr(
     ]
 
     feature_names = prediction_input.columns.tolist()
-    feature_values = prediction_input.iloc[0].tolist()
 
     # Add causality assessment level
     casuality_assessment_level_model = CausalityAssessmentLevelModel(
         adr_id=adr_model.id,
+        ml_model_id=ml_model_id,
         causality_assessment_level_value=CausalityAssessmentLevelEnum(
             decoded_prediction
         ),
@@ -968,19 +1131,31 @@ async def post_adr(
         shap_values_matrix=shap_values_matrix,
         shap_values_sum_per_class=shap_values_sum_per_class,
         shap_values_and_base_values_sum_per_class=shap_values_and_base_values_sum_per_class,
-        feature_names=feature_names,
-        feature_values=format_feature_values(feature_values),
+        feature_name_set_id=save_feature_name_set(db, ml_model_id, feature_names),
+        feature_values=format_feature_values(prediction_input),
+        shap_contributions=get_shap_contributions(
+            shap_values, feature_names, get_class_values(ordinal_encoder)
+        ),
     )
 
     db.add(casuality_assessment_level_model)
+    db.flush()
+    set_current_causality_assessment_level(
+        db, adr_model.id, casuality_assessment_level_model.id
+    )
     db.commit()
-    db.refresh(casuality_assessment_level_model)
 
-    # To load the causality assessment levels
-    content = db.query(ADRModel).filter(ADRModel.id == adr_model.id).first()
+    shadow_scorer.submit(
+        adr_model.id,
+        adr_record,
+        CausalityAssessmentLevelEnum(decoded_prediction),
+        prediction_latency_ms,
+    )
+
+    content = jsonable_encoder(ADRDetailResponse.model_validate(adr_model))
 
     return JSONResponse(
-        content=jsonable_encoder(content),
+        content=content,
         status_code=status.HTTP_201_CREATED,
     )
 
@@ -1004,35 +1179,30 @@ async def update_adr(
     db.commit()
     db.refresh(adr_model)
 
-    if (
-        adr_model.rifampicin_suspected is None
-        and adr_model.isoniazid_suspected is None
-        and adr_model.pyrazinamide_suspected is None
-        and adr_model.ethambutol_suspected is None
-    ) or (
-        adr_model.rechallenge is RechallengeEnum.unknown
-        and adr_model.dechallenge is DechallengeEnum.unknown
-    ):
+    if not is_scorable(adr_model):
         casuality_assessment_level_model = CausalityAssessmentLevelModel(
             adr_id=adr_model.id,
+            ml_model_id=get_served_ml_model_id(),
             causality_assessment_level_value=CausalityAssessmentLevelEnum.unclassified,
             base_values=None,
             shap_values_matrix=None,
             shap_values_sum_per_class=None,
             shap_values_and_base_values_sum_per_class=None,
-            feature_names=None,
+            feature_name_set_id=None,
             feature_values=None,
         )
 
         db.add(casuality_assessment_level_model)
+        db.flush()
+        set_current_causality_assessment_level(
+            db, adr_model.id, casuality_assessment_level_model.id
+        )
         db.commit()
-        db.refresh(casuality_assessment_level_model)
 
-        # To load the causality assessment levels
-        content = db.query(ADRModel).filter(ADRModel.id == adr_model.id).first()
+        content = jsonable_encoder(ADRDetailResponse.model_validate(adr_model))
 
         return JSONResponse(
-            content=jsonable_encoder(content),
+            content=content,
             status_code=status.HTTP_201_CREATED,
         )
 
@@ -1043,17 +1213,20 @@ async def update_adr(
 
     temp_df = pd.DataFrame([updated_adr.model_dump()])
 
-    prediction_input = input_to_prediction_format(temp_df)
+    with inference_duration_seconds.labels("feature_preparation").time():
+        prediction_input = input_to_prediction_format(temp_df)
 
     # Predict and decode
-    prediction = ml_model.predict(prediction_input)
+    with inference_duration_seconds.labels("prediction").time():
+        prediction = ml_model.predict(prediction_input)
     decoded_prediction = ordinal_encoder.inverse_transform(prediction.reshape(-1, 1))[
         0
     ][0]
 
     global explainer
 
-    shap_values = explainer(prediction_input)
+    with inference_duration_seconds.labels("shap").time():
+        shap_values = explainer(prediction_input)
 
     broken_down_shap_values = get_shap_values(shap_values)
 
@@ -1065,12 +1238,17 @@ async def update_adr(
     ]
 
     feature_names = prediction_input.columns.tolist()
-    feature_values = prediction_input.iloc[0].tolist()
 
-    # Update causality assessment model
+    # Update the assessment made by the served model, assessments made by
+    # other models are kept and a new one is added if there is none yet
+    ml_model_id = get_served_ml_model_id()
     causality_record = (
         db.query(CausalityAssessmentLevelModel)
-        .filter(CausalityAssessmentLevelModel.adr_id == adr_model.id)
+        .filter(
+            CausalityAssessmentLevelModel.adr_id == adr_model.id,
+            CausalityAssessmentLevelModel.ml_model_id == ml_model_id,
+        )
+        .order_by(CausalityAssessmentLevelModel.created_at.desc())
         .first()
     )
 
@@ -1084,14 +1262,22 @@ async def update_adr(
         causality_record.shap_values_and_base_values_sum_per_class = (
             shap_values_and_base_values_sum_per_class
         )
-        causality_record.feature_names = feature_names
-        causality_record.feature_values = format_feature_values(feature_values)
+        causality_record.feature_name_set_id = save_feature_name_set(
+            db, ml_model_id, feature_names
+        )
+        causality_record.feature_values = format_feature_values(prediction_input)
+        # Replaces the stored contributions, the old rows are deleted as orphans
+        causality_record.shap_contributions = get_shap_contributions(
+            shap_values, feature_names, get_class_values(ordinal_encoder)
+        )
 
         db.commit()
-        db.refresh(causality_record)
+        # The cached population importance still counts the old explanation
+        shap_importance_cache.clear()
     else:
         new_causality = CausalityAssessmentLevelModel(
             adr_id=adr_model.id,
+            ml_model_id=ml_model_id,
             causality_assessment_level_value=CausalityAssessmentLevelEnum(
                 decoded_prediction
             ),
@@ -1099,18 +1285,22 @@ async def update_adr(
             shap_values_matrix=shap_values_matrix,
             shap_values_sum_per_class=shap_values_sum_per_class,
             shap_values_and_base_values_sum_per_class=shap_values_and_base_values_sum_per_class,
-            feature_names=feature_names,
-            feature_values=format_feature_values(feature_values),
+            feature_name_set_id=save_feature_name_set(db, ml_model_id, feature_names),
+            feature_values=format_feature_values(prediction_input),
+            shap_contributions=get_shap_contributions(
+                shap_values, feature_names, get_class_values(ordinal_encoder)
+            ),
         )
         db.add(new_causality)
+        db.flush()
+        set_current_causality_assessment_level(db, adr_model.id, new_causality.id)
         db.commit()
-        db.refresh(new_causality)
 
-    # Step 8: Return updated record with causality details
-    content = db.query(ADRModel).filter(ADRModel.id == adr_model.id).first()
+    # Step 8: Return updated record
+    content = jsonable_encoder(ADRDetailResponse.model_validate(adr_model))
 
     return JSONResponse(
-        content=jsonable_encoder(content),
+        content=content,
         status_code=status.HTTP_200_OK,
     )
 
@@ -1129,6 +1319,7 @@ def delete_adr_by_id(
 
     db.delete(adr)
     db.commit()
+    shap_importance_cache.clear()
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -1146,6 +1337,7 @@ async def get_causality_assessment_level_by_id(
 ):
     causality_assessment_level = (
         db.query(CausalityAssessmentLevelModel)
+        .options(raiseload("*"))
         .filter(CausalityAssessmentLevelModel.id == causality_assessment_level_id)
         .first()
     )
@@ -1156,16 +1348,11 @@ async def get_causality_assessment_level_by_id(
             detail="Causality Assessment Level record not found",
         )
 
-    approved_count = sum(1 for r in causality_assessment_level.reviews if r.approved)
-    not_approved_count = sum(
-        1 for r in causality_assessment_level.reviews if not r.approved
+    content = jsonable_encoder(
+        CausalityAssessmentLevelDetailResponse.model_validate(
+            causality_assessment_level
+        )
     )
-
-    content = {
-        **jsonable_encoder(causality_assessment_level),
-        "approved_count": approved_count,
-        "not_approved_count": not_approved_count,
-    }
     return JSONResponse(
         content=content,
         status_code=status.HTTP_200_OK,
@@ -1183,7 +1370,13 @@ async def get_causality_assessment_level_by_adr_id(
 ):
     causality_assessment_level = (
         db.query(CausalityAssessmentLevelModel)
-        .filter(CausalityAssessmentLevelModel.adr_id == adr_id)
+        .options(raiseload("*"))
+        .join(
+            ADRModel,
+            ADRModel.current_causality_assessment_level_id
+            == CausalityAssessmentLevelModel.id,
+        )
+        .filter(ADRModel.id == adr_id)
         .first()
     )
 
@@ -1193,22 +1386,92 @@ async def get_causality_assessment_level_by_adr_id(
             detail="Causality Assessment Level record not found",
         )
 
-    approved_count = sum(1 for r in causality_assessment_level.reviews if r.approved)
-    not_approved_count = sum(
-        1 for r in causality_assessment_level.reviews if not r.approved
+    content = jsonable_encoder(
+        CausalityAssessmentLevelDetailResponse.model_validate(
+            causality_assessment_level
+        )
     )
-
-    content = {
-        **jsonable_encoder(causality_assessment_level),
-        "approved_count": approved_count,
-        "not_approved_count": not_approved_count,
-    }
     return JSONResponse(
         content=content,
         status_code=status.HTTP_200_OK,
     )
 
 
+@app.get(
+    "/api/v1/adr/{adr_id}/explanation",
+    response_model=ADRExplanationGetResponse,
+    status_code=status.HTTP_200_OK,
+)
+def get_adr_explanation(
+    current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
+    adr_id: str = Path(..., description="ID of ADR to explain"),
+    causality_assessment_level_id: str | None = Query(
+        None, description="Causality assessment to explain, the current one if unset"
+    ),
+    top_k: int | None = Query(
+        None, ge=1, description="Only return the most influential features"
+    ),
+    db: Session = Depends(get_db),
+):
+    query = db.query(CausalityAssessmentLevelModel).options(
+        undefer_group("explanation"), raiseload("*")
+    )
+
+    if causality_assessment_level_id is None:
+        query = query.join(
+            ADRModel,
+            ADRModel.current_causality_assessment_level_id
+            == CausalityAssessmentLevelModel.id,
+        ).filter(ADRModel.id == adr_id)
+    else:
+        query = query.filter(
+            CausalityAssessmentLevelModel.id == causality_assessment_level_id,
+            CausalityAssessmentLevelModel.adr_id == adr_id,
+        )
+
+    causality_assessment_level = query.first()
+
+    if not causality_assessment_level:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Causality Assessment Level record not found",
+        )
+
+    shap_values = decode_shap_values(
+        causality_assessment_level.shap_values_blob,
+        len(causality_assessment_level.base_values or []),
+    )
+    feature_names = causality_assessment_level.feature_names
+    feature_values = causality_assessment_level.feature_values
+    feature_count = 0 if shap_values is None else len(shap_values)
+    other_features_sum_per_class = None
+
+    if shap_values is not None and top_k is not None and top_k < feature_count:
+        top_feature_indices = get_top_feature_indices(shap_values, top_k)
+        other_features_sum_per_class = (
+            shap_values.sum(axis=0, dtype=np.float64)
+            - shap_values[top_feature_indices].sum(axis=0, dtype=np.float64)
+        ).tolist()
+        shap_values = shap_values[top_feature_indices]
+        feature_names = [feature_names[i] for i in top_feature_indices]
+        feature_values = [feature_values[i] for i in top_feature_indices]
+
+    return ADRExplanationGetResponse(
+        causality_assessment_level_id=causality_assessment_level.id,
+        adr_id=causality_assessment_level.adr_id,
+        ml_model_id=causality_assessment_level.ml_model_id,
+        causality_assessment_level_value=causality_assessment_level.causality_assessment_level_value,
+        base_values=causality_assessment_level.base_values,
+        shap_values_sum_per_class=causality_assessment_level.shap_values_sum_per_class,
+        shap_values_and_base_values_sum_per_class=causality_assessment_level.shap_values_and_base_values_sum_per_class,
+        shap_values_matrix=None if shap_values is None else shap_values.tolist(),
+        feature_names=feature_names,
+        feature_values=feature_values,
+        feature_count=feature_count,
+        other_features_sum_per_class=other_features_sum_per_class,
+    )
+
+
 @app.get(
     "/api/v1/adr/{adr_id}/causality_assessment_level",
     response_model=Page[CausalityAssessmentLevelGetResponse],
@@ -1218,7 +1481,7 @@ def get_causality_assessment_levels_for_adr(
     adr_id: str = Path(..., description="ID of ADR to read"),
     db: Session = Depends(get_db),
 ):
-    adr = db.query(ADRModel).filter(ADRModel.id == adr_id).first()
+    adr = db.query(ADRModel.id).filter(ADRModel.id == adr_id).first()
 
     if not adr:
         raise HTTPException(
@@ -1283,7 +1546,10 @@ def delete_causality_assessment_level_by_id(
         )
 
     db.delete(cal)
+    db.flush()
+    refresh_current_causality_assessment_level(db, cal.adr_id)
     db.commit()
+    shap_importance_cache.clear()
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -1298,10 +1564,18 @@ async def get_reviews(
     query: str = Query("", description="Search query(optional)"),
     db: Session = Depends(get_db),
 ):
-    if query:
-        content = db.query(ReviewModel).order_by(desc(ReviewModel.created_at))
-    else:
-        content = db.query(ReviewModel).order_by(desc(ReviewModel.created_at))
+    content = (
+        db.query(ReviewModel)
+        .options(
+            joinedload(ReviewModel.user).load_only(
+                UserModel.id,
+                UserModel.username,
+                UserModel.first_name,
+                UserModel.last_name,
+            )
+        )
+        .order_by(desc(ReviewModel.created_at))
+    )
 
     return paginate(content)
 
@@ -1338,15 +1612,11 @@ async def get_review_for_specific_user_and_causality_assessment_level(
     ),
     db: Session = Depends(get_db),
 ):
-    db_user = (
-        db.query(UserModel).filter(UserModel.username == current_user.username).first()
-    )
-
     review = (
         db.query(ReviewModel)
         .filter(
             ReviewModel.causality_assessment_level_id == causality_assessment_level_id,
-            ReviewModel.user_id == db_user.id,
+            ReviewModel.user_id == current_user.id,
         )
         .first()
     )
@@ -1357,6 +1627,51 @@ async def get_review_for_specific_user_and_causality_assessment_level(
     return review
 
 
+@app.get("/api/v1/review_queue", status_code=status.HTTP_200_OK)
+def get_review_queue(
+    current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    The next causality assessments the current user has not reviewed, serious
+    ADRs first and then the longest waiting. Reviewed assessments drop out of
+    the queue, so the next batch is fetched with the same request.
+    """
+    # Walks ix_adr_review_queue_order in order and probes the unique
+    # review(user_id, causality_assessment_level_id) index for each ADR,
+    # stopping after `limit` unreviewed assessments
+    review_queue_sql = text("""
+        SELECT
+            a.id AS adr_id,
+            cal.id AS causality_assessment_level_id,
+            a.patient_name,
+            u.first_name || ' ' || u.last_name AS created_by,
+            a.created_at,
+            a.is_serious,
+            a.severity,
+            cal.causality_assessment_level_value,
+            cal.approved_count AS approved_reviews,
+            cal.unapproved_count AS unapproved_reviews
+        FROM adr a
+        JOIN causality_assessment_level cal
+            ON cal.id = a.current_causality_assessment_level_id
+        JOIN "user" u ON u.id = a.user_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM review r
+            WHERE r.user_id = :user_id
+                AND r.causality_assessment_level_id = cal.id
+        )
+        ORDER BY CASE WHEN a.is_serious = 'yes' THEN 1 ELSE 0 END DESC,
+            a.created_at ASC
+        LIMIT :limit;
+    """)
+
+    result = db.execute(review_queue_sql, {"user_id": current_user.id, "limit": limit})
+
+    return [dict(row._mapping) for row in result.fetchall()]
+
+
 @app.get(
     "/api/v1/causality_assessment_level/{causality_assessment_level_id}/review",
     response_model=Page[ReviewGetResponse],
@@ -1423,18 +1738,27 @@ async def post_review(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Causality Level not found"
         )
 
-    db_user = (
-        db.query(UserModel).filter(UserModel.username == current_user.username).first()
-    )
-
     review_model = ReviewModel(
         **review.model_dump(),
-        user_id=db_user.id,
+        user_id=current_user.id,
         causality_assessment_level_id=causality_assessment_level_id,
     )
 
     db.add(review_model)
-    db.commit()
+
+    try:
+        db.flush()
+        adjust_review_counts(
+            db, causality_assessment_level_id, review_model.approved, delta=1
+        )
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="You have already reviewed this causality assessment",
+        )
+
     db.refresh(review_model)
     # content = ADRCreateResponse.model_validate(adr_model)
     return JSONResponse(
@@ -1443,6 +1767,102 @@ async def post_review(
     )
 
 
+@app.post("/api/v1/review/batch", status_code=status.HTTP_201_CREATED)
+async def post_reviews_batch(
+    current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
+    review_batch: ReviewBatchCreateRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    Submit reviews of several causality assessments at once. Either every
+    review is stored or none is. The unique index on (user_id,
+    causality_assessment_level_id) rejects assessments already reviewed.
+    """
+    causality_assessment_level_ids = [
+        review.causality_assessment_level_id for review in review_batch.reviews
+    ]
+    duplicate_ids = [
+        causality_assessment_level_id
+        for causality_assessment_level_id, count in Counter(
+            causality_assessment_level_ids
+        ).items()
+        if count > 1
+    ]
+
+    if duplicate_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": "Causality assessments reviewed more than once in batch",
+                "causality_assessment_level_ids": duplicate_ids,
+            },
+        )
+
+    found_ids = {
+        causality_assessment_level_id
+        for (causality_assessment_level_id,) in db.query(
+            CausalityAssessmentLevelModel.id
+        ).filter(CausalityAssessmentLevelModel.id.in_(causality_assessment_level_ids))
+    }
+    missing_ids = [
+        causality_assessment_level_id
+        for causality_assessment_level_id in causality_assessment_level_ids
+        if causality_assessment_level_id not in found_ids
+    ]
+
+    if missing_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": "Causality Levels not found",
+                "causality_assessment_level_ids": missing_ids,
+            },
+        )
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    review_rows = [
+        {
+            **review.model_dump(),
+            "id": str(uuid4()),
+            "user_id": current_user.id,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for review in review_batch.reviews
+    ]
+
+    try:
+        # Against the table so rows with and without a reason stay one executemany
+        db.execute(insert(ReviewModel.__table__), review_rows)
+        adjust_review_counts_batch(db, review_rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        already_reviewed_ids = [
+            causality_assessment_level_id
+            for (causality_assessment_level_id,) in db.query(
+                ReviewModel.causality_assessment_level_id
+            ).filter(
+                ReviewModel.user_id == current_user.id,
+                ReviewModel.causality_assessment_level_id.in_(
+                    causality_assessment_level_ids
+                ),
+            )
+        ]
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "You have already reviewed these causality assessments",
+                "causality_assessment_level_ids": already_reviewed_ids,
+            },
+        )
+
+    return JSONResponse(
+        content=jsonable_encoder(review_rows),
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
 @app.put("/api/v1/review/{review_id}", status_code=status.HTTP_200_OK)
 async def update_review_by_id(
     current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
@@ -1459,10 +1879,21 @@ async def update_review_by_id(
             detail="Review not found",
         )
 
+    previously_approved = review.approved
+
     # Step 2: Update the fields
     for key, value in review_update.model_dump().items():
         setattr(review, key, value)
 
+    # Move the review between the tallies if its verdict changed
+    if review.approved != previously_approved:
+        adjust_review_counts(
+            db, review.causality_assessment_level_id, previously_approved, delta=-1
+        )
+        adjust_review_counts(
+            db, review.causality_assessment_level_id, review.approved, delta=1
+        )
+
     db.commit()
     db.refresh(review)
 
@@ -1488,11 +1919,134 @@ def delete_review_by_id(
         )
 
     db.delete(review)
+    adjust_review_counts(
+        db, review.causality_assessment_level_id, review.approved, delta=-1
+    )
     db.commit()
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
+@app.get(
+    "/api/v1/rescoring_job",
+    response_model=List[RescoringJobGetResponse],
+    status_code=status.HTTP_200_OK,
+)
+def get_rescoring_jobs(
+    current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
+    db: Session = Depends(get_db),
+):
+    """Progress and throughput of the re-scoring jobs, see `rescoring.py`."""
+    rescoring_jobs = (
+        db.query(RescoringJobModel).order_by(RescoringJobModel.started_at.desc()).all()
+    )
+
+    return [
+        RescoringJobGetResponse.model_validate(rescoring_job)
+        for rescoring_job in rescoring_jobs
+    ]
+
+
+@app.get("/api/v1/shadow_prediction/summary", status_code=status.HTTP_200_OK)
+def get_shadow_prediction_summary(
+    current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
+    ml_model_id: str = settings.shadow_ml_model_id,
+    db: Session = Depends(get_db),
+):
+    """
+    How often a shadow candidate agreed with production, where they
+    disagreed, and how their prediction latencies compare.
+    """
+    confusion_rows = db.execute(
+        text("""
+        SELECT production_value, candidate_value, COUNT(*) AS count
+        FROM shadow_prediction
+        WHERE ml_model_id = :ml_model_id AND candidate_value IS NOT NULL
+        GROUP BY production_value, candidate_value
+        ORDER BY count DESC
+        """),
+        {"ml_model_id": ml_model_id},
+    ).fetchall()
+
+    latency_rows = (
+        db.query(
+            ShadowPredictionModel.production_latency_ms,
+            ShadowPredictionModel.candidate_latency_ms,
+        )
+        .filter(ShadowPredictionModel.ml_model_id == ml_model_id)
+        .all()
+    )
+
+    scored_count = sum(row.count for row in confusion_rows)
+    agreed_count = sum(
+        row.count
+        for row in confusion_rows
+        if row.production_value == row.candidate_value
+    )
+
+    def summarize_latencies(latencies_ms: List[float]) -> dict | None:
+        if not latencies_ms:
+            return None
+
+        return {
+            "mean": float(np.mean(latencies_ms)),
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p95": float(np.percentile(latencies_ms, 95)),
+        }
+
+    return {
+        "ml_model_id": ml_model_id,
+        "production_ml_model_id": get_served_ml_model_id(),
+        "count": len(latency_rows),
+        "error_count": len(latency_rows) - scored_count,
+        "agreement_rate": agreed_count / scored_count if scored_count else None,
+        "confusion": [
+            {
+                "production_value": CausalityAssessmentLevelEnum[
+                    row.production_value
+                ].value,
+                "candidate_value": CausalityAssessmentLevelEnum[
+                    row.candidate_value
+                ].value,
+                "count": row.count,
+            }
+            for row in confusion_rows
+        ],
+        "latency_ms": {
+            "production": summarize_latencies(
+                [row.production_latency_ms for row in latency_rows]
+            ),
+            "candidate": summarize_latencies(
+                [
+                    row.candidate_latency_ms
+                    for row in latency_rows
+                    if row.candidate_latency_ms is not None
+                ]
+            ),
+        },
+    }
+
+
+@app.get("/api/v1/admin/slow_requests", status_code=status.HTTP_200_OK)
+def get_slow_requests(
+    current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
+):
+    """
+    Recent requests over `slow_request_threshold_ms`, most recent first, with
+    their SQL statements and the query plan of the slowest one.
+    """
+    return JSONResponse(
+        content=jsonable_encoder(
+            {
+                "enabled": slow_request_log.enabled,
+                "threshold_ms": slow_request_log.threshold_ms,
+                "slow_requests": slow_request_log.to_list(),
+            }
+        ),
+        status_code=status.HTTP_200_OK,
+    )
+
+
 @app.get("/api/v1/adr_monitoring", status_code=status.HTTP_200_OK)
 def get_adr_monitoring(
     current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
@@ -1590,8 +2144,6 @@ def get_adr_monitoring(
         "outcome_proportions": outcome_proportions_content,
     }
 
-    print(content)
-
     return JSONResponse(
         content=jsonable_encoder(content),
         status_code=status.HTTP_200_OK,
@@ -1651,18 +2203,13 @@ def approval_status(db: Session = Depends(get_db)):
     sql = text("""
         SELECT status, COUNT(*) as count FROM (
             SELECT
-                cal.id AS cal_id,
-                SUM(CASE WHEN r.approved = 1 THEN 1 ELSE 0 END) AS approved_count,
-                SUM(CASE WHEN r.approved = 0 THEN 1 ELSE 0 END) AS unapproved_count,
                 CASE
-                    WHEN SUM(CASE WHEN r.approved = 1 THEN 1 ELSE 0 END) >
-                         SUM(CASE WHEN r.approved = 0 THEN 1 ELSE 0 END)
+                    WHEN cal.approved_count > cal.unapproved_count
                     THEN 'Approved'
                     ELSE 'Unapproved'
                 END AS status
             FROM causality_assessment_level cal
-            JOIN review r ON cal.id = r.causality_assessment_level_id
-            GROUP BY cal.id
+            WHERE cal.approved_count + cal.unapproved_count > 0
         ) AS sub
         GROUP BY status
     """)
@@ -1694,6 +2241,88 @@ def top_reporting_institutions(db: Session = Depends(get_db)):
     return {"series": [r[1] for r in rows], "data": [r[0] for r in rows]}
 
 
+#  Features driving a causality class
+@app.get("/api/v1/dashboard/shap-top-features")
+def shap_top_features(
+    class_value: CausalityAssessmentLevelEnum = CausalityAssessmentLevelEnum.certain,
+    direction: str = Query("positive", pattern="^(positive|negative)$"),
+    county: str | None = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    How often each feature is among the strongest contributions towards the
+    current assessments predicted as `class_value`, and its mean SHAP value.
+    """
+    sql = text(f"""
+        SELECT c.feature_name, COUNT(*) AS count, AVG(c.shap_value) AS mean_shap_value
+        FROM shap_contribution c
+        JOIN causality_assessment_level cal ON cal.id = c.causality_assessment_level_id
+        JOIN adr a ON a.current_causality_assessment_level_id = cal.id
+        {"JOIN medical_institution mi ON mi.id = a.medical_institution_id" if county else ""}
+        WHERE c.class_value = :class_value
+            AND cal.causality_assessment_level_value = :class_value
+            AND c.shap_value {">" if direction == "positive" else "<"} 0
+            {"AND mi.county = :county" if county else ""}
+        GROUP BY c.feature_name
+        ORDER BY count DESC, ABS(AVG(c.shap_value)) DESC
+        LIMIT :limit
+    """)
+    result = db.execute(
+        sql, {"class_value": class_value.name, "county": county, "limit": limit}
+    ).fetchall()
+    return {
+        "series": [r.count for r in result],
+        "data": [r.feature_name for r in result],
+        "mean_shap_values": [r.mean_shap_value for r in result],
+    }
+
+
+#  Population feature importance
+@app.get("/api/v1/dashboard/shap-importance")
+def shap_importance(
+    start: str | None = Query(None, description="YYYY-MM-DD (optional)"),
+    end: str | None = Query(None, description="YYYY-MM-DD (optional)"),
+    medical_institution_id: str | None = None,
+    ml_model_id: str | None = None,
+    top_k: int | None = Query(None, ge=1),
+    db: Session = Depends(get_db),
+):
+    """
+    Mean |SHAP| per feature and causality class over the assessments made by
+    `ml_model_id`, the served model by default, optionally within a date range
+    and institution.
+    """
+    ml_model_id = ml_model_id or get_served_ml_model_id()
+
+    try:
+        start_date = datetime.datetime.strptime(start, "%Y-%m-%d") if start else None
+        # Include the full end day
+        end_date = (
+            datetime.datetime.strptime(end, "%Y-%m-%d")
+            + datetime.timedelta(days=1)
+            - datetime.timedelta(microseconds=1)
+            if end
+            else None
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Dates must be formatted as YYYY-MM-DD",
+        )
+
+    aggregate = shap_importance_cache.get(
+        db, ml_model_id, start_date, end_date, medical_institution_id
+    )
+
+    _, ordinal_encoder = get_encoders()
+
+    return {
+        "ml_model_id": ml_model_id,
+        **aggregate.to_dict(db, get_class_values(ordinal_encoder), top_k),
+    }
+
+
 #  ADRs Weekly (Raw SQL with structured output)
 @app.get("/api/v1/dashboard/adrs-weekly")
 def adrs_weekly(db: Session = Depends(get_db)):
@@ -1850,24 +2479,61 @@ async def get_medical_institution(
     query: str = Query("", description="Search query(optional)"),
     db: Session = Depends(get_db),
 ):
-    if query:
+    search_params = get_search_params(db, "medical_institution_search", query)
+
+    content = db.query(MedicalInstitutionModel)
+
+    if search_params["search"]:
         content = (
-            db.query(MedicalInstitutionModel)
+            content.join(
+                medical_institution_search,
+                medical_institution_search.c.rowid
+                == literal_column("medical_institution.rowid"),
+            )
             .filter(
-                MedicalInstitutionModel.name.ilike(f"%{query}%")
-                | MedicalInstitutionModel.county.ilike(f"%{query}%")
-                | MedicalInstitutionModel.sub_county.ilike(f"%{query}%")
+                text("medical_institution_search MATCH :search").bindparams(
+                    search=search_params["search"]
+                )
             )
-            .order_by(desc(MedicalInstitutionModel.created_at))
+            .order_by(medical_institution_search.c.rank)
         )
-    else:
-        content = db.query(MedicalInstitutionModel).order_by(
-            desc(MedicalInstitutionModel.created_at)
+
+    if search_params["search_short_terms"]:
+        content = content.filter(
+            text(
+                get_short_terms_condition(
+                    "medical_institution_search", "medical_institution"
+                )
+            ).bindparams(search_short_terms=search_params["search_short_terms"])
         )
 
+    content = content.order_by(desc(MedicalInstitutionModel.created_at))
+
     return paginate(content)
 
 
+@app.get(
+    "/api/v1/medical_institution/autocomplete",
+    response_model=List[MedicalInstitutionAutocompleteResponse],
+    status_code=status.HTTP_200_OK,
+)
+async def autocomplete_medical_institution(
+    current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
+    query: str = Query(..., description="Name or MFL code prefix"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    # Served from memory; a stale directory is rebuilt in the background
+    institution_directory_stale = institution_directory.is_stale()
+    record_cache_lookup("institution_directory", not institution_directory_stale)
+    if institution_directory_stale:
+        institution_directory.refresh_in_background()
+
+    return JSONResponse(
+        content=institution_directory.autocomplete(query, limit),
+        status_code=status.HTTP_200_OK,
+    )
+
+
 @app.get("/api/v1/medical_institution/{institution_id}", status_code=status.HTTP_200_OK)
 async def get_medical_institution_by_id(
     current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
@@ -1904,6 +2570,8 @@ async def post_medical_institution(
     db.commit()
     db.refresh(new_institution)
 
+    institution_directory.refresh_in_background(rerun_if_running=True)
+
     return JSONResponse(
         content=jsonable_encoder(new_institution),
         status_code=status.HTTP_201_CREATED,
@@ -1935,6 +2603,8 @@ async def update_medical_institution(
     db.commit()
     db.refresh(db_institution)
 
+    institution_directory.refresh_in_background(rerun_if_running=True)
+
     return JSONResponse(
         content=jsonable_encoder(db_institution),
         status_code=status.HTTP_200_OK,
@@ -1965,6 +2635,8 @@ async def delete_medical_institution(
     db.delete(db_institution)
     db.commit()
 
+    institution_directory.refresh_in_background(rerun_if_running=True)
+
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -2033,6 +2705,8 @@ async def create_medical_institution_telephone(
     for telephone in new_telephones:
         db.refresh(telephone)
 
+    institution_directory.refresh_in_background(rerun_if_running=True)
+
     return JSONResponse(
         content=jsonable_encoder(new_telephones),
         status_code=status.HTTP_201_CREATED,
@@ -2067,6 +2741,8 @@ async def update_medical_institution_telephone(
     db.commit()
     db.refresh(db_telephone)
 
+    institution_directory.refresh_in_background(rerun_if_running=True)
+
     return JSONResponse(
         content=jsonable_encoder(db_telephone),
         status_code=status.HTTP_200_OK,
@@ -2097,6 +2773,8 @@ async def delete_medical_institution_telephone(
     db.delete(db_telephone)
     db.commit()
 
+    institution_directory.refresh_in_background(rerun_if_running=True)
+
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -2285,9 +2963,9 @@ async def get_adrs_with_individual_alerts(
     offset = (page - 1) * size
     limit = size
 
-    search_term = f"%{query}%" if query else None
+    search_params = get_search_params(db, "adr_search", query)
 
-    result_sql = text("""
+    result_sql = text(f"""
     SELECT
         adr.id AS adr_id,
         adr.patient_name AS patient_name,
@@ -2296,22 +2974,25 @@ async def get_adrs_with_individual_alerts(
         adr.created_at AS created_at,
         GROUP_CONCAT(DISTINCT mit.telephone) AS telephones,
         COUNT(DISTINCT sms.id) AS sms_count,
-        COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) AS approved_reviews,
-        COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END) AS unapproved_reviews
+        MAX(cal.approved_count) AS approved_reviews,
+        MAX(cal.unapproved_count) AS unapproved_reviews
         
     FROM adr
     JOIN causality_assessment_level cal ON adr.id = cal.adr_id
     JOIN medical_institution mi ON adr.medical_institution_id = mi.id
     LEFT JOIN medical_institution_telephone mit ON mi.id = mit.medical_institution_id
-    LEFT JOIN review ON cal.id = review.causality_assessment_level_id
     LEFT JOIN sms_message sms ON adr.id = sms.adr_id
+    LEFT JOIN (
+        SELECT rowid, rank FROM adr_search
+        WHERE :search IS NOT NULL AND adr_search MATCH :search
+    ) search ON search.rowid = adr.rowid
     WHERE cal.causality_assessment_level_value = :level_value
-        AND (:query IS NULL OR LOWER(adr.patient_name) LIKE LOWER(:query))
-    GROUP BY adr.id, adr.patient_name, mi.name, mi.mfl_code, adr.created_at
+        AND cal.approved_count > cal.unapproved_count
+        AND (:search IS NULL OR search.rowid IS NOT NULL)
+        AND {get_short_terms_condition("adr_search", "adr")}
+    GROUP BY adr.id, adr.patient_name, mi.name, mi.mfl_code, adr.created_at, search.rank
     HAVING COUNT(DISTINCT sms.id) != 0
-        AND COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) >
-        COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END)
-    ORDER BY adr.created_at DESC
+    ORDER BY search.rank, adr.created_at DESC
     LIMIT :limit OFFSET :offset
     """)
 
@@ -2319,7 +3000,7 @@ async def get_adrs_with_individual_alerts(
         "level_value": "certain",
         "limit": limit,
         "offset": offset,
-        "query": search_term,
+        **search_params,
     }
 
     result = db.execute(result_sql, result_params)
@@ -2339,25 +3020,28 @@ async def get_adrs_with_individual_alerts(
         for row in rows
     ]
 
-    total_sql = text("""
+    total_sql = text(f"""
     SELECT COUNT(*) FROM (
         SELECT
             adr.id,
             COUNT(DISTINCT sms.id) AS sms_count
         FROM adr
         JOIN causality_assessment_level cal ON adr.id = cal.adr_id
-        LEFT JOIN review ON cal.id = review.causality_assessment_level_id
         LEFT JOIN sms_message sms ON adr.id = sms.adr_id
+        LEFT JOIN (
+            SELECT rowid, rank FROM adr_search
+            WHERE :search IS NOT NULL AND adr_search MATCH :search
+        ) search ON search.rowid = adr.rowid
         WHERE cal.causality_assessment_level_value = :level_value
-            AND (:query IS NULL OR LOWER(adr.patient_name) LIKE LOWER(:query))
+            AND cal.approved_count > cal.unapproved_count
+            AND (:search IS NULL OR search.rowid IS NOT NULL)
+            AND {get_short_terms_condition("adr_search", "adr")}
         GROUP BY adr.id
         HAVING COUNT(DISTINCT sms.id) != 0
-            AND COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) >
-            COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END)
     ) AS sub
     """)
 
-    total_result_params = {"level_value": "certain", "query": search_term}
+    total_result_params = {"level_value": "certain", **search_params}
     total_result = db.execute(total_sql, total_result_params).scalar()
     # Calculate the total number of pages
     pages = (total_result + size - 1) // size  # Equivalent to math.ceil(total / size)
@@ -2383,9 +3067,9 @@ async def get_adrs_to_be_sent_for_individual_alerts(
     offset = (page - 1) * size
     limit = size
 
-    search_term = f"%{query}%" if query else None
+    search_params = get_search_params(db, "adr_search", query)
 
-    result_sql = text("""
+    result_sql = text(f"""
     SELECT
         adr.id AS adr_id,
         adr.patient_name AS patient_name,
@@ -2394,21 +3078,24 @@ async def get_adrs_to_be_sent_for_individual_alerts(
         adr.created_at AS created_at,
         GROUP_CONCAT(DISTINCT mit.telephone) AS telephones,
         COUNT(DISTINCT sms.id) AS sms_count,
-        COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) AS approved_reviews,
-        COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END) AS unapproved_reviews
+        MAX(cal.approved_count) AS approved_reviews,
+        MAX(cal.unapproved_count) AS unapproved_reviews
     FROM adr
     JOIN causality_assessment_level cal ON adr.id = cal.adr_id
     JOIN medical_institution mi ON adr.medical_institution_id = mi.id
     LEFT JOIN medical_institution_telephone mit ON mi.id = mit.medical_institution_id
-    LEFT JOIN review ON cal.id = review.causality_assessment_level_id
     LEFT JOIN sms_message sms ON adr.id = sms.adr_id
+    LEFT JOIN (
+        SELECT rowid, rank FROM adr_search
+        WHERE :search IS NOT NULL AND adr_search MATCH :search
+    ) search ON search.rowid = adr.rowid
     WHERE cal.causality_assessment_level_value = :level_value
-        AND (:query IS NULL OR LOWER(adr.patient_name) LIKE LOWER(:query))
-    GROUP BY adr.id, adr.patient_name, mi.name, mi.mfl_code, adr.created_at
+        AND cal.approved_count > cal.unapproved_count
+        AND (:search IS NULL OR search.rowid IS NOT NULL)
+        AND {get_short_terms_condition("adr_search", "adr")}
+    GROUP BY adr.id, adr.patient_name, mi.name, mi.mfl_code, adr.created_at, search.rank
     HAVING COUNT(DISTINCT sms.id) = 0
-        AND COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) >
-        COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END)
-    ORDER BY adr.created_at DESC
+    ORDER BY search.rank, adr.created_at DESC
     LIMIT :limit OFFSET :offset
     """)
 
@@ -2416,7 +3103,7 @@ async def get_adrs_to_be_sent_for_individual_alerts(
         "level_value": "certain",
         "limit": limit,
         "offset": offset,
-        "query": search_term,
+        **search_params,
     }
 
     result = db.execute(result_sql, result_params)
@@ -2436,25 +3123,28 @@ async def get_adrs_to_be_sent_for_individual_alerts(
         for row in rows
     ]
 
-    total_sql = text("""
+    total_sql = text(f"""
     SELECT COUNT(*) FROM (
         SELECT
             adr.id,
             COUNT(DISTINCT sms.id) AS sms_count
         FROM adr
         JOIN causality_assessment_level cal ON adr.id = cal.adr_id
-        LEFT JOIN review ON cal.id = review.causality_assessment_level_id
         LEFT JOIN sms_message sms ON adr.id = sms.adr_id
+        LEFT JOIN (
+            SELECT rowid, rank FROM adr_search
+            WHERE :search IS NOT NULL AND adr_search MATCH :search
+        ) search ON search.rowid = adr.rowid
         WHERE cal.causality_assessment_level_value = :level_value
-            AND (:query IS NULL OR LOWER(adr.patient_name) LIKE LOWER(:query))
+            AND cal.approved_count > cal.unapproved_count
+            AND (:search IS NULL OR search.rowid IS NOT NULL)
+            AND {get_short_terms_condition("adr_search", "adr")}
         GROUP BY adr.id
         HAVING COUNT(DISTINCT sms.id) = 0
-            AND COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) >
-            COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END)
     ) AS sub
     """)
 
-    total_result_params = {"level_value": "certain", "query": search_term}
+    total_result_params = {"level_value": "certain", **search_params}
 
     total_result = db.execute(total_sql, total_result_params).scalar()
     # Calculate the total number of pages
@@ -2481,9 +3171,9 @@ async def get_adrs_with_additional_info_requests(
     offset = (page - 1) * size
     limit = size
 
-    search_term = f"%{query}%" if query else None
+    search_params = get_search_params(db, "adr_search", query)
 
-    result_sql = text("""
+    result_sql = text(f"""
     SELECT
         adr.id AS adr_id,
         adr.patient_name AS patient_name,
@@ -2492,22 +3182,25 @@ async def get_adrs_with_additional_info_requests(
         adr.created_at AS created_at,
         GROUP_CONCAT(DISTINCT mit.telephone) AS telephones,
         COUNT(DISTINCT sms.id) AS sms_count,
-        COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) AS approved_reviews,
-        COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END) AS unapproved_reviews
+        MAX(cal.approved_count) AS approved_reviews,
+        MAX(cal.unapproved_count) AS unapproved_reviews
         
     FROM adr
     JOIN causality_assessment_level cal ON adr.id = cal.adr_id
     JOIN medical_institution mi ON adr.medical_institution_id = mi.id
     LEFT JOIN medical_institution_telephone mit ON mi.id = mit.medical_institution_id
-    LEFT JOIN review ON cal.id = review.causality_assessment_level_id
     LEFT JOIN sms_message sms ON adr.id = sms.adr_id
+    LEFT JOIN (
+        SELECT rowid, rank FROM adr_search
+        WHERE :search IS NOT NULL AND adr_search MATCH :search
+    ) search ON search.rowid = adr.rowid
     WHERE cal.causality_assessment_level_value = :level_value
-        AND (:query IS NULL OR LOWER(adr.patient_name) LIKE LOWER(:query))
-    GROUP BY adr.id, adr.patient_name, mi.name, mi.mfl_code, adr.created_at
+        AND cal.approved_count > cal.unapproved_count
+        AND (:search IS NULL OR search.rowid IS NOT NULL)
+        AND {get_short_terms_condition("adr_search", "adr")}
+    GROUP BY adr.id, adr.patient_name, mi.name, mi.mfl_code, adr.created_at, search.rank
     HAVING COUNT(DISTINCT sms.id) != 0
-        AND COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) >
-        COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END)
-    ORDER BY adr.created_at DESC
+    ORDER BY search.rank, adr.created_at DESC
     LIMIT :limit OFFSET :offset
     """)
 
@@ -2515,7 +3208,7 @@ async def get_adrs_with_additional_info_requests(
         "level_value": "unclassified",
         "limit": limit,
         "offset": offset,
-        "query": search_term,
+        **search_params,
     }
 
     result = db.execute(result_sql, result_params)
@@ -2535,25 +3228,28 @@ async def get_adrs_with_additional_info_requests(
         for row in rows
     ]
 
-    total_sql = text("""
+    total_sql = text(f"""
     SELECT COUNT(*) FROM (
         SELECT
             adr.id,
             COUNT(DISTINCT sms.id) AS sms_count
         FROM adr
         JOIN causality_assessment_level cal ON adr.id = cal.adr_id
-        LEFT JOIN review ON cal.id = review.causality_assessment_level_id
         LEFT JOIN sms_message sms ON adr.id = sms.adr_id
+        LEFT JOIN (
+            SELECT rowid, rank FROM adr_search
+            WHERE :search IS NOT NULL AND adr_search MATCH :search
+        ) search ON search.rowid = adr.rowid
         WHERE cal.causality_assessment_level_value = :level_value
-            AND (:query IS NULL OR LOWER(adr.patient_name) LIKE LOWER(:query))
+            AND cal.approved_count > cal.unapproved_count
+            AND (:search IS NULL OR search.rowid IS NOT NULL)
+            AND {get_short_terms_condition("adr_search", "adr")}
         GROUP BY adr.id
         HAVING COUNT(DISTINCT sms.id) != 0
-            AND COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) >
-            COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END)
     ) AS sub
     """)
 
-    total_result_params = {"level_value": "unclassifiable", "query": search_term}
+    total_result_params = {"level_value": "unclassifiable", **search_params}
 
     total_result = db.execute(total_sql, total_result_params).scalar()
     # Calculate the total number of pages
@@ -2580,9 +3276,9 @@ async def get_adrs_to_be_sent_for_additional_info_requests(
     offset = (page - 1) * size
     limit = size
 
-    search_term = f"%{query}%" if query else None
+    search_params = get_search_params(db, "adr_search", query)
 
-    result_sql = text("""
+    result_sql = text(f"""
     SELECT
         adr.id AS adr_id,
         adr.patient_name AS patient_name,
@@ -2591,21 +3287,24 @@ async def get_adrs_to_be_sent_for_additional_info_requests(
         adr.created_at AS created_at,
         GROUP_CONCAT(DISTINCT mit.telephone) AS telephones,
         COUNT(DISTINCT sms.id) AS sms_count,
-        COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) AS approved_reviews,
-        COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END) AS unapproved_reviews
+        MAX(cal.approved_count) AS approved_reviews,
+        MAX(cal.unapproved_count) AS unapproved_reviews
     FROM adr
     JOIN causality_assessment_level cal ON adr.id = cal.adr_id
     JOIN medical_institution mi ON adr.medical_institution_id = mi.id
     LEFT JOIN medical_institution_telephone mit ON mi.id = mit.medical_institution_id
-    LEFT JOIN review ON cal.id = review.causality_assessment_level_id
     LEFT JOIN sms_message sms ON adr.id = sms.adr_id
+    LEFT JOIN (
+        SELECT rowid, rank FROM adr_search
+        WHERE :search IS NOT NULL AND adr_search MATCH :search
+    ) search ON search.rowid = adr.rowid
     WHERE cal.causality_assessment_level_value = :level_value
-        AND (:query IS NULL OR LOWER(adr.patient_name) LIKE LOWER(:query))
-    GROUP BY adr.id, adr.patient_name, mi.name, mi.mfl_code, adr.created_at
+        AND cal.approved_count > cal.unapproved_count
+        AND (:search IS NULL OR search.rowid IS NOT NULL)
+        AND {get_short_terms_condition("adr_search", "adr")}
+    GROUP BY adr.id, adr.patient_name, mi.name, mi.mfl_code, adr.created_at, search.rank
     HAVING COUNT(DISTINCT sms.id) = 0
-        AND COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) >
-        COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END)
-    ORDER BY adr.created_at DESC
+    ORDER BY search.rank, adr.created_at DESC
     LIMIT :limit OFFSET :offset
     """)
 
@@ -2613,7 +3312,7 @@ async def get_adrs_to_be_sent_for_additional_info_requests(
         "level_value": "unclassified",
         "limit": limit,
         "offset": offset,
-        "query": search_term,
+        **search_params,
     }
 
     result = db.execute(result_sql, result_params)
@@ -2633,25 +3332,28 @@ async def get_adrs_to_be_sent_for_additional_info_requests(
         for row in rows
     ]
 
-    total_sql = text("""
+    total_sql = text(f"""
     SELECT COUNT(*) FROM (
         SELECT
             adr.id,
             COUNT(DISTINCT sms.id) AS sms_count
         FROM adr
         JOIN causality_assessment_level cal ON adr.id = cal.adr_id
-        LEFT JOIN review ON cal.id = review.causality_assessment_level_id
         LEFT JOIN sms_message sms ON adr.id = sms.adr_id
+        LEFT JOIN (
+            SELECT rowid, rank FROM adr_search
+            WHERE :search IS NOT NULL AND adr_search MATCH :search
+        ) search ON search.rowid = adr.rowid
         WHERE cal.causality_assessment_level_value = :level_value
-            AND (:query IS NULL OR LOWER(adr.patient_name) LIKE LOWER(:query))
+            AND cal.approved_count > cal.unapproved_count
+            AND (:search IS NULL OR search.rowid IS NOT NULL)
+            AND {get_short_terms_condition("adr_search", "adr")}
         GROUP BY adr.id
         HAVING COUNT(DISTINCT sms.id) = 0
-            AND COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) >
-            COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END)
     ) AS sub
     """)
 
-    total_result_params = {"level_value": "unclassified", "query": search_term}
+    total_result_params = {"level_value": "unclassified", **search_params}
 
     total_result = db.execute(total_sql, total_result_params).scalar()
     # Calculate the total number of pages
@@ -2666,28 +3368,18 @@ async def get_adrs_to_be_sent_for_additional_info_requests(
     }
 
 
-@app.put("api/v1/update_causalities_to_unclassifiable")
+@app.put("/api/v1/update_causalities_to_unclassifiable")
 def update_causalities_to_unclassifiable(
     data: UnclassifiablePostRequest,
     db: Session = Depends(get_db),
 ):
-    for adr_id in data.adr_ids:
-        cals = (
-            db.query(CausalityAssessmentLevelModel)
-            .filter(CausalityAssessmentLevelModel.adr_id == adr_id)
-            .all()
-        )
-
-        for cal in cals:
-            cal.causality_assessment_level_value = (
-                CausalityAssessmentLevelEnum.unclassifiable
-            )
-
+    updated_count = set_causality_assessment_level_values(
+        db, data.adr_ids, CausalityAssessmentLevelEnum.unclassifiable
+    )
     db.commit()
-    db.refresh()
 
     return JSONResponse(
-        content="ADR models with unclassifiable set", status_code=status.HTTP_200_OK
+        content={"updated_count": updated_count}, status_code=status.HTTP_200_OK
     )
 
 
@@ -2710,20 +3402,18 @@ async def get_adrs_with_unclassifiable_causality(
         adr.created_at AS created_at,
         GROUP_CONCAT(DISTINCT mit.telephone) AS telephones,
         COUNT(DISTINCT sms.id) AS sms_count,
-        COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) AS approved_reviews,
-        COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END) AS unapproved_reviews
+        MAX(cal.approved_count) AS approved_reviews,
+        MAX(cal.unapproved_count) AS unapproved_reviews
         
     FROM adr
     JOIN causality_assessment_level cal ON adr.id = cal.adr_id
     JOIN medical_institution mi ON adr.medical_institution_id = mi.id
     LEFT JOIN medical_institution_telephone mit ON mi.id = mit.medical_institution_id
-    LEFT JOIN review ON cal.id = review.causality_assessment_level_id
     LEFT JOIN sms_message sms ON adr.id = sms.adr_id
     WHERE cal.causality_assessment_level_value = :level_value
+        AND cal.approved_count > cal.unapproved_count
     GROUP BY adr.id, adr.patient_name, mi.name, mi.mfl_code, adr.created_at
     HAVING COUNT(DISTINCT sms.id) != 0
-        AND COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) >
-        COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END)
     ORDER BY adr.created_at DESC
     LIMIT :limit OFFSET :offset
     """)
@@ -2754,13 +3444,11 @@ async def get_adrs_with_unclassifiable_causality(
             COUNT(DISTINCT sms.id) AS sms_count
         FROM adr
         JOIN causality_assessment_level cal ON adr.id = cal.adr_id
-        LEFT JOIN review ON cal.id = review.causality_assessment_level_id
         LEFT JOIN sms_message sms ON adr.id = sms.adr_id
         WHERE cal.causality_assessment_level_value = :level_value
+            AND cal.approved_count > cal.unapproved_count
         GROUP BY adr.id
         HAVING COUNT(DISTINCT sms.id) != 0
-            AND COUNT(DISTINCT CASE WHEN review.approved = 1 THEN review.id END) >
-            COUNT(DISTINCT CASE WHEN review.approved = 0 THEN review.id END)
     ) AS sub
     """)
 
@@ -2781,24 +3469,22 @@ async def get_adrs_with_unclassifiable_causality(
     }
 
 
-@app.post("/api/v1/send_individual_alert")
+def get_individual_alert_message(patient_name: str, medical_institution_name: str):
+    return (
+        f"URGENT ADR ALERT: {patient_name} at {medical_institution_name} "
+        f"has a causality assessment of CERTAIN. We are further investigating this as the Pharmacy and Poisons Board (PPB) for further guidance. Call +254795743049 for further information."
+    )
+
+
+@app.post("/api/v1/send_individual_alert", status_code=status.HTTP_202_ACCEPTED)
 def send_individual_alert(
     data: IndividualAlertPostRequest, db: Session = Depends(get_db)
 ):
-    try:
-        africastalking.initialize(
-            settings.africas_talking_username, settings.africas_talking_api_key
-        )
-    except Exception as e:
-        return HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Failed to initialize Africa's Talking: " + str(e),
-        )
-
-    sms = africastalking.SMS
-
     adr_model = db.query(ADRModel).filter(ADRModel.id == data.adr_id).first()
 
+    if not adr_model:
+        raise HTTPException(status_code=404, detail="ADR not found")
+
     medical_institution_model = (
         db.query(MedicalInstitutionModel)
         .filter(MedicalInstitutionModel.id == adr_model.medical_institution_id)
@@ -2814,309 +3500,281 @@ def send_individual_alert(
         .first()
     )
 
-    message_content = (
-        f"URGENT ADR ALERT: {adr_model.patient_name} at {medical_institution_model.name} "
-        f"has a causality assessment of CERTAIN. We are further investigating this as the Pharmacy and Poisons Board (PPB) for further guidance. Call +254795743049 for further information."
+    if not telephone_number_model:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Medical institution has no telephone number",
+        )
+
+    message_content = get_individual_alert_message(
+        adr_model.patient_name, medical_institution_model.name
     )
 
     message_type = SMSMessageTypeEnum.individual_alert
 
     recipients = [telephone_number_model.telephone]
 
-    response: Dict = sms.send(message_content, recipients)
-
-    sms_messages = []
-
-    for message in response.get("SMSMessageData").get("Recipients"):
-        sms_message = SMSMessageModel(
-            adr_id=adr_model.id,
-            content=message_content,
-            sms_type=message_type,
-            cost=message.get("cost", None),
-            message_id=message.get("messageId", None),
-            message_parts=message.get("messageParts", None),
-            number=message.get("number", None),
-            status=message.get("status"),
-            status_code=message.get("statusCode"),
-        )
-
-        sms_messages.append(sms_message)
-
-    db.add_all(sms_messages)
-    db.commit()
-
-    for sms_message in sms_messages:
-        db.refresh(sms_message)
+    sms_outbox_model = enqueue_sms(
+        db, adr_model.id, message_type, recipients, message_content
+    )
+    sms_dispatcher.wake()
 
-    content = jsonable_encoder(sms_messages)
+    content = jsonable_encoder(SMSOutboxGetResponse.model_validate(sms_outbox_model))
 
-    return JSONResponse(content=content, status_code=status.HTTP_200_OK)
+    return JSONResponse(content=content, status_code=status.HTTP_202_ACCEPTED)
 
 
-@app.post("/api/v1/send_additional_info_request")
-def send_additional_info_request(
-    data: AdditionalInfoPostRequest, db: Session = Depends(get_db)
+@app.post(
+    "/api/v1/individual_alert_campaign", status_code=status.HTTP_202_ACCEPTED
+)
+def post_individual_alert_campaign(
+    current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
+    data: IndividualAlertCampaignPostRequest,
+    db: Session = Depends(get_db),
 ):
-    try:
-        africastalking.initialize(
-            settings.africas_talking_username, settings.africas_talking_api_key
-        )
-    except Exception as e:
-        return HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Failed to initialize Africa's Talking: " + str(e),
-        )
-
-    sms = africastalking.SMS
-
-    adr_model = db.query(ADRModel).filter(ADRModel.id == data.adr_id).first()
+    search_params = get_search_params(db, "adr_search", data.query)
 
-    medical_institution_model = (
-        db.query(MedicalInstitutionModel)
-        .filter(MedicalInstitutionModel.id == adr_model.medical_institution_id)
-        .first()
-    )
+    adr_ids_condition = "AND adr.id IN :adr_ids" if data.adr_ids is not None else ""
 
-    telephone_number_model = (
-        db.query(MedicalInstitutionTelephoneModel)
-        .filter(
-            MedicalInstitutionTelephoneModel.medical_institution_id
-            == adr_model.medical_institution_id
+    # Same selection as the individual alerts to be sent listing, resolved for
+    # every ADR at once together with all telephones of its institution
+    recipients_sql = text(f"""
+    SELECT
+        adr.id AS adr_id,
+        adr.patient_name AS patient_name,
+        mi.name AS medical_institution_name,
+        GROUP_CONCAT(DISTINCT mit.telephone) AS telephones
+    FROM adr
+    JOIN causality_assessment_level cal ON adr.id = cal.adr_id
+    JOIN medical_institution mi ON adr.medical_institution_id = mi.id
+    LEFT JOIN medical_institution_telephone mit ON mi.id = mit.medical_institution_id
+    LEFT JOIN (
+        SELECT rowid FROM adr_search
+        WHERE :search IS NOT NULL AND adr_search MATCH :search
+    ) search ON search.rowid = adr.rowid
+    WHERE cal.causality_assessment_level_value = :level_value
+        AND cal.approved_count > cal.unapproved_count
+        AND (:search IS NULL OR search.rowid IS NOT NULL)
+        AND {get_short_terms_condition("adr_search", "adr")}
+        AND NOT EXISTS (SELECT 1 FROM sms_message sms WHERE sms.adr_id = adr.id)
+        AND NOT EXISTS (
+            SELECT 1 FROM sms_outbox o
+            WHERE o.adr_id = adr.id AND o.sms_type = :sms_type
         )
-        .first()
-    )
-
-    message_content = (
-        f"ADR FOLLOW-UP: An ADR case involving {adr_model.patient_name} from {medical_institution_model.name} requires additional clinical details. "
-        f"Kindly review and submit supporting information to the Pharmacy and Poisons Board (PPB)."
-    )
-
-    message_type = SMSMessageTypeEnum.additional_info
-
-    recipients = [telephone_number_model.telephone]
-
-    response: Dict = sms.send(message_content, recipients)
+        {adr_ids_condition}
+    GROUP BY adr.id, adr.patient_name, mi.name
+    """)
 
-    sms_messages = []
+    recipients_params = {
+        "level_value": "certain",
+        "sms_type": SMSMessageTypeEnum.individual_alert.name,
+        **search_params,
+    }
 
-    for message in response.get("SMSMessageData").get("Recipients"):
-        sms_message = SMSMessageModel(
-            adr_id=adr_model.id,
-            content=message_content,
-            sms_type=message_type,
-            cost=message.get("cost", None),
-            message_id=message.get("messageId", None),
-            message_parts=message.get("messageParts", None),
-            number=message.get("number", None),
-            status=message.get("status"),
-            status_code=message.get("statusCode"),
+    if data.adr_ids is not None:
+        recipients_sql = recipients_sql.bindparams(
+            bindparam("adr_ids", expanding=True)
         )
+        recipients_params["adr_ids"] = data.adr_ids
 
-        sms_messages.append(sms_message)
-
-    db.add_all(sms_messages)
-    db.commit()
-
-    for sms_message in sms_messages:
-        db.refresh(sms_message)
-
-    content = jsonable_encoder(sms_messages)
-
-    return JSONResponse(content=content, status_code=status.HTTP_200_OK)
-
-
-# Utility functions
-def get_ml_model() -> BaseEstimator:
-    """Load the trained ML model."""
-    model_path = f"{settings.mlflow_model_artifacts_path}/model/model.pkl"
-    return joblib.load(model_path)
+    rows = db.execute(recipients_sql, recipients_params).fetchall()
 
+    messages = []
+    skipped = []
 
-def get_scalers() -> BaseEstimator:
-    """Load the trained ML model."""
-    minmax_scaler_path = (
-        f"{settings.mlflow_model_artifacts_path}/scalers/minmax_scaler.pkl"
-    )
-    return joblib.load(minmax_scaler_path)
+    for row in rows:
+        if not row.telephones:
+            skipped.append({"adr_id": row.adr_id, "reason": "no telephone"})
+            continue
 
+        messages.append(
+            {
+                "adr_id": row.adr_id,
+                "sms_type": SMSMessageTypeEnum.individual_alert,
+                "recipients": row.telephones.split(","),
+                "content": get_individual_alert_message(
+                    row.patient_name, row.medical_institution_name
+                ),
+            }
+        )
 
-def get_encoders() -> Tuple[OneHotEncoder, OrdinalEncoder]:
-    """Load the one-hot and ordinal encoders."""
-    encoders_path = f"{settings.mlflow_model_artifacts_path}/encoders"
-    one_hot_encoder = joblib.load(f"{encoders_path}/one_hot_encoder.pkl")
-    ordinal_encoder = joblib.load(f"{encoders_path}/ordinal_encoder.pkl")
-    return one_hot_encoder, ordinal_encoder
+    if data.adr_ids is not None:
+        resolved_adr_ids = {row.adr_id for row in rows}
+        skipped.extend(
+            {"adr_id": adr_id, "reason": "not awaiting an individual alert"}
+            for adr_id in dict.fromkeys(data.adr_ids)
+            if adr_id not in resolved_adr_ids
+        )
 
+    campaign_id = str(uuid4())
+    queued_count = enqueue_sms_batch(db, messages, campaign_id=campaign_id)
+    sms_dispatcher.wake()
 
-def get_column_metadata() -> dict:
-    """Return list of categorical fields used for encoding."""
-    """Load the one-hot and ordinal encoders."""
-    column_metadata_path = (
-        f"{settings.mlflow_model_artifacts_path}/metadata/model_columns.json"
+    return JSONResponse(
+        content=jsonable_encoder(
+            {"campaign_id": campaign_id, "queued": queued_count, "skipped": skipped}
+        ),
+        status_code=status.HTTP_202_ACCEPTED,
     )
-    with open(column_metadata_path, "r") as f:
-        column_metadata = json.load(f)
-
-    categorical_columns = column_metadata["categorical_columns"]
-    numerical_columns = column_metadata["numerical_columns"]
-    date_columns = column_metadata["date_columns"]
-    boolean_columns = column_metadata["boolean_columns"]
-    prediction_columns = column_metadata["prediction_columns"]
-    columns_to_drop = column_metadata["columns_to_drop"]
-
-    return {
-        "categorical_columns": categorical_columns,
-        "numerical_columns": numerical_columns,
-        "date_columns": date_columns,
-        "boolean_columns": boolean_columns,
-        "prediction_columns": prediction_columns,
-        "columns_to_drop": columns_to_drop,
-    }
-
-
-def input_to_prediction_format(input_df: pd.DataFrame) -> pd.DataFrame:
-    """
-    This function returns for a proper dataframe for the ML model and SHAP model
-    """
-
-    column_metadata = get_column_metadata()
-
-    categorical_columns = column_metadata["categorical_columns"]
-    numerical_columns = column_metadata["numerical_columns"]
-    date_columns = column_metadata["date_columns"]
-    boolean_columns = column_metadata["boolean_columns"]
-    prediction_columns = column_metadata["prediction_columns"]
-    columns_to_drop = column_metadata["columns_to_drop"]
-
-    # Create all the columns not originally in dataset
-    ## Num suspected drugs
-    input_df["num_suspected_drugs"] = input_df[boolean_columns].sum(axis=1)
 
-    for column in categorical_columns:
-        input_df[column] = input_df[column].astype("category")
 
-    ## Patient Age and Patient Date of Birth
-    date_columns_without_created_at = date_columns
-    date_columns_without_created_at.remove("created_at")
-
-    for column in date_columns:
-        input_df[column] = pd.to_datetime(input_df[column], errors="coerce")
-
-    today = pd.to_datetime("today")
-
-    missing_age_mask = (
-        input_df["patient_age"].isnull() & input_df["patient_date_of_birth"].notnull()
+@app.get("/api/v1/individual_alert_campaign/{campaign_id}")
+def get_individual_alert_campaign(
+    current_user: Annotated[UserDetailsBaseModel, Depends(get_current_user)],
+    campaign_id: str,
+    db: Session = Depends(get_db),
+):
+    rows = (
+        db.query(
+            SMSOutboxModel.adr_id,
+            SMSOutboxModel.status.label("job_status"),
+            SMSOutboxModel.recipients,
+            SMSOutboxModel.attempts,
+            SMSOutboxModel.last_error,
+            ADRModel.patient_name,
+            SMSMessageModel.number,
+            SMSMessageModel.status,
+            SMSMessageModel.status_code,
+            SMSMessageModel.message_id,
+        )
+        .join(ADRModel, ADRModel.id == SMSOutboxModel.adr_id)
+        .outerjoin(SMSMessageModel, SMSMessageModel.sms_outbox_id == SMSOutboxModel.id)
+        .filter(SMSOutboxModel.campaign_id == campaign_id)
+        .order_by(SMSMessageModel.created_at)
+        .all()
     )
 
-    input_df.loc[missing_age_mask, "patient_age"] = (
-        today - input_df.loc[missing_age_mask, "patient_date_of_birth"]
-    ).dt.days // 365
+    if not rows:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    # A number retried after the provider rejected it has a message per
+    # attempt, the latest one is reported
+    recipients = {}
+
+    for row in rows:
+        # Messages not sent yet are reported per queued recipient
+        numbers = [row.number] if row.number is not None else row.recipients
+
+        for number in numbers:
+            recipients[(row.adr_id, number)] = {
+                "adr_id": row.adr_id,
+                "patient_name": row.patient_name,
+                "number": number,
+                "job_status": row.job_status,
+                "attempts": row.attempts,
+                "status": row.status,
+                "status_code": row.status_code,
+                "message_id": row.message_id,
+                "last_error": row.last_error,
+            }
 
-    input_df["patient_age"] = input_df["patient_age"].fillna(
-        input_df["patient_age"].median()
+    job_status_counts = Counter(
+        row.job_status.value for row in {row.adr_id: row for row in rows}.values()
     )
 
-    ## Patient BMI
-    input_df["patient_bmi"] = input_df["patient_weight_kg"] / (
-        input_df["patient_height_cm"] * input_df["patient_height_cm"]
+    return JSONResponse(
+        content=jsonable_encoder(
+            {
+                "campaign_id": campaign_id,
+                "job_status_counts": job_status_counts,
+                "recipients": list(recipients.values()),
+            }
+        ),
+        status_code=status.HTTP_200_OK,
     )
 
-    ## Drug columns
-    drug_names = ["rifampicin", "isoniazid", "pyrazinamide", "ethambutol"]
 
-    for drug in drug_names:
-        start_col = f"{drug}_start_to_onset_days"
-        stop_col = f"{drug}_stop_to_onset_days"
-        start_stop_col = f"{drug}_start_stop_difference"
+@app.post("/api/v1/sms/delivery_report", status_code=status.HTTP_200_OK)
+async def post_sms_delivery_report(
+    id: str = Form(...),
+    status_: str = Form(..., alias="status"),
+    failure_reason: str | None = Form(None, alias="failureReason"),
+    token: str | None = Query(None),
+):
+    """
+    Africa's Talking delivery report callback. Reports are buffered and
+    applied in batches, so this returns before the database is updated.
 
-        input_df[start_col] = (
-            input_df["date_of_onset_of_reaction"] - input_df[f"{drug}_start_date"]
-        ).dt.days
-        input_df[stop_col] = (
-            input_df["date_of_onset_of_reaction"] - input_df[f"{drug}_stop_date"]
-        ).dt.days
-        input_df[start_stop_col] = (
-            input_df[f"{drug}_stop_date"] - input_df[f"{drug}_start_date"]
-        ).dt.days
+    The callback URL must carry `?token=<DELIVERY_REPORT_TOKEN>`. Without a
+    configured token every report is refused.
+    """
+    if settings.delivery_report_token is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Delivery reports are not configured",
+        )
 
-    # Drop date columns
-    input_df = input_df.drop(columns=date_columns)
+    if token is None or not secrets.compare_digest(
+        token, settings.delivery_report_token
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
-    input_df = input_df.drop(columns=columns_to_drop)
+    delivery_report_buffer.add(id, status_, failure_reason)
 
-    # Fill null valuea
-    input_df[numerical_columns] = input_df[numerical_columns].fillna(-1)
+    return Response(status_code=status.HTTP_200_OK)
 
-    # Scale numerical columns
-    minmax_scaler = get_scalers()
-    scaled_numericals = minmax_scaler.transform(input_df[numerical_columns])
-    scaled_numericals_df = pd.DataFrame(scaled_numericals, columns=numerical_columns)
 
-    # Encode categorical columns
+@app.post("/api/v1/send_additional_info_request", status_code=status.HTTP_202_ACCEPTED)
+def send_additional_info_request(
+    data: AdditionalInfoPostRequest, db: Session = Depends(get_db)
+):
+    adr_model = db.query(ADRModel).filter(ADRModel.id == data.adr_id).first()
 
-    one_hot_encoder, _ = get_encoders()
+    if not adr_model:
+        raise HTTPException(status_code=404, detail="ADR not found")
 
-    cat_encoded = one_hot_encoder.transform(input_df[categorical_columns])
-    cat_encoded_df = pd.DataFrame(
-        cat_encoded, columns=one_hot_encoder.get_feature_names_out(categorical_columns)
+    medical_institution_model = (
+        db.query(MedicalInstitutionModel)
+        .filter(MedicalInstitutionModel.id == adr_model.medical_institution_id)
+        .first()
     )
 
-    # Merge all features
-    final_input_df = pd.concat(
-        [
-            cat_encoded_df,
-            input_df[boolean_columns].reset_index(drop=True),
-            scaled_numericals_df,
-        ],
-        axis=1,
+    telephone_number_model = (
+        db.query(MedicalInstitutionTelephoneModel)
+        .filter(
+            MedicalInstitutionTelephoneModel.medical_institution_id
+            == adr_model.medical_institution_id
+        )
+        .first()
     )
 
-    # Reorder to match training time
-    final_input_df = final_input_df[prediction_columns]
-
-    return final_input_df
-
+    if not telephone_number_model:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Medical institution has no telephone number",
+        )
 
-def get_shap_values(shap_values: Explainer):
-    base_values = list(shap_values.base_values[0])
-    shap_values_matrix = shap_values.values[0].tolist()
-    shap_values_sum_per_class = np.sum(shap_values.values[0], axis=0).tolist()
-    shap_values_and_base_values_sum_per_class = list(
-        np.sum(shap_values.values[0], axis=0) + shap_values.base_values[0]
+    message_content = (
+        f"ADR FOLLOW-UP: An ADR case involving {adr_model.patient_name} from {medical_institution_model.name} requires additional clinical details. "
+        f"Kindly review and submit supporting information to the Pharmacy and Poisons Board (PPB)."
     )
 
-    return {
-        "base_values": base_values,
-        "shap_values_matrix": shap_values_matrix,
-        "shap_values_sum_per_class": shap_values_sum_per_class,
-        "shap_values_and_base_values_sum_per_class": shap_values_and_base_values_sum_per_class,
-    }
-
+    message_type = SMSMessageTypeEnum.additional_info
 
-def format_feature_values(feature_values: List[any]) -> List[any]:
-    minmax_scaler = get_scalers()
+    recipients = [telephone_number_model.telephone]
 
-    reversed_values = []
+    sms_outbox_model = enqueue_sms(
+        db, adr_model.id, message_type, recipients, message_content
+    )
+    sms_dispatcher.wake()
 
-    for i, value in enumerate(feature_values):
-        # Handle logical encoding: 0 → False, 1 → True, -1 → None
-        if value == 0:
-            reversed_values.append(False)
-        elif value == 1:
-            reversed_values.append(True)
+    content = jsonable_encoder(SMSOutboxGetResponse.model_validate(sms_outbox_model))
 
-        # Reverse min-max scaling for decimal floats
-        elif isinstance(value, float) and not value.is_integer():
-            min_val = minmax_scaler.data_min_[i]
-            max_val = minmax_scaler.data_max_[i]
-            original = round(value * (max_val - min_val) + min_val)
-            if original == -1:
-                reversed_values.append(None)
-            else:
-                reversed_values.append(original)
+    return JSONResponse(content=content, status_code=status.HTTP_202_ACCEPTED)
 
-        # Leave all other values as-is
-        else:
-            reversed_values.append(value)
 
-    return reversed_values
+# Utility functions
+def get_shap_contributions(
+    shap_values: Explainer,
+    feature_names: List[str],
+    class_values: List[CausalityAssessmentLevelEnum],
+) -> List[ShapContributionModel]:
+    return [
+        ShapContributionModel(**contribution)
+        for contribution in get_top_shap_contributions(
+            np.asarray(shap_values.values[0]),
+            feature_names,
+            class_values,
+            settings.shap_top_k,
+        )
+    ]
@@ -1,4 +1,8 @@
+import asyncio
 import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import jwt
 from basemodels import Token, TokenData, UserDetailsBaseModel
@@ -11,11 +15,32 @@ from typing_extensions import Annotated
 from sqlalchemy.orm import Session
 from models import UserModel
 from dependencies import get_db
+from token_families import revoked_token_families
+from metrics import record_cache_lookup
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/token")
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min and max rounds to the configured cost makes passlib flag hashes
+# made with any other cost for an update, so logins rehash them
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event
+# loop while capping how many hashes run at once
+password_hashing_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hashing_workers,
+    thread_name_prefix="password-hashing",
+)
+
+# Resolved principals keyed by token subject, each stored with its expiry time
+principal_cache: dict[str, tuple[float, UserDetailsBaseModel]] = {}
+principal_cache_lock = threading.Lock()
 
 
 def verify_password(plain_password, hashed_password):
@@ -26,6 +51,70 @@ def get_password_hash(plain_password):
     return pwd_context.hash(plain_password)
 
 
+async def hash_password(plain_password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_hashing_executor, pwd_context.hash, plain_password
+    )
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """
+    Verify a password in the hashing pool. Also returns a new hash when the
+    stored one was made with a different cost, otherwise None.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_hashing_executor,
+        pwd_context.verify_and_update,
+        plain_password,
+        hashed_password,
+    )
+
+
+def build_access_token_claims(user: UserModel, family_id: str) -> dict:
+    """Claims that let `get_current_user` resolve the user without a query."""
+    return {
+        "sub": user.username,
+        "fid": family_id,
+        "user_id": user.id,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "disabled": bool(user.disabled),
+    }
+
+
+def get_cached_principal(subject: str) -> UserDetailsBaseModel | None:
+    with principal_cache_lock:
+        cached = principal_cache.get(subject)
+
+    if cached is None or cached[0] < time.monotonic():
+        return None
+
+    return cached[1]
+
+
+def cache_principal(subject: str, principal: UserDetailsBaseModel):
+    now = time.monotonic()
+
+    with principal_cache_lock:
+        # Drop expired entries so subjects that stopped calling the API do
+        # not accumulate
+        for expired_subject in [
+            key for key, (expires_at, _) in principal_cache.items() if expires_at < now
+        ]:
+            del principal_cache[expired_subject]
+
+        principal_cache[subject] = (now + settings.principal_cache_ttl_seconds, principal)
+
+
+def invalidate_principal(subject: str):
+    with principal_cache_lock:
+        principal_cache.pop(subject, None)
+
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)
 ):
@@ -49,14 +138,51 @@ async def get_current_user(
     except InvalidTokenError:
         raise credentials_exception
 
-    user = db.query(UserModel).filter(UserModel.username == token_data.username).first()
+    # Reject access tokens of revoked sessions
+    revoked_token_families_stale = revoked_token_families.is_stale()
+    record_cache_lookup("revoked_token_families", not revoked_token_families_stale)
+    if revoked_token_families_stale:
+        revoked_token_families.refresh(db)
 
-    if user is None:
+    if payload.get("fid") in revoked_token_families:
         raise credentials_exception
 
-    return UserDetailsBaseModel(
-        username=user.username, first_name=user.first_name, last_name=user.last_name
-    )
+    principal = get_cached_principal(token_data.username)
+    record_cache_lookup("principal", principal is not None)
+
+    if principal is not None:
+        return principal
+
+    if payload.get("user_id") is not None:
+        principal = UserDetailsBaseModel(
+            id=payload["user_id"],
+            username=token_data.username,
+            first_name=payload.get("first_name"),
+            last_name=payload.get("last_name"),
+            disabled=payload.get("disabled", False),
+        )
+    else:
+        # Tokens issued before the user claims were added
+        user = (
+            db.query(UserModel)
+            .filter(UserModel.username == token_data.username)
+            .first()
+        )
+
+        if user is None:
+            raise credentials_exception
+
+        principal = UserDetailsBaseModel(
+            id=user.id,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            disabled=bool(user.disabled),
+        )
+
+    cache_principal(token_data.username, principal)
+
+    return principal
 
 
 async def get_current_active_user(
@@ -84,6 +210,32 @@ def create_access_token(data: dict, expires_delta: datetime.timedelta | None = N
     return encoded_jwt
 
 
+def decode_refresh_token(refresh_token: str) -> dict:
+    """Decode a refresh token, requiring the claims of its token family."""
+    try:
+        payload = jwt.decode(
+            refresh_token,
+            settings.server_refresh_secret_key,
+            algorithms=[settings.server_refresh_algorithm],
+        )
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired"
+        )
+    except InvalidTokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
+        )
+
+    # Tokens issued before token families existed cannot be rotated
+    if not all(payload.get(claim) for claim in ("sub", "fid", "jti")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
+        )
+
+    return payload
+
+
 def create_refresh_token(data: dict, expires_delta: datetime.timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
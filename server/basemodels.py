@@ -3,7 +3,7 @@ from datetime import date, datetime
 from typing import List, Optional, Any
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from pydantic.alias_generators import to_camel
 
 
@@ -99,6 +99,19 @@ class SMSMessageTypeEnum(str, enum.Enum):
     additional_info = "additional info"
 
 
+class SMSOutboxStatusEnum(str, enum.Enum):
+    pending = "pending"
+    sending = "sending"
+    sent = "sent"
+    failed = "failed"
+
+
+class RescoringJobStatusEnum(str, enum.Enum):
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
 # Users
 class User(BaseModel):
     username: str
@@ -132,6 +145,7 @@ class UserDetailsBaseModel(BaseModel):
     username: str
     first_name: str | None = None
     last_name: str | None = None
+    disabled: bool = False
 
 
 class UserLoginBaseModel(BaseModel):
@@ -192,12 +206,33 @@ class CausalityAssessmentLevelGetResponse(BaseModel):
     ml_model_id: str = "final_ml_model@champion"
     causality_assessment_level_value: CausalityAssessmentLevelEnum
 
+
+class CausalityAssessmentLevelDetailResponse(CausalityAssessmentLevelGetResponse):
+    model_config = ConfigDict(from_attributes=True)
+
+    approved_count: int = 0
+    # Named as the client has always read it
+    not_approved_count: int = Field(0, validation_alias="unapproved_count")
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
+class ADRExplanationGetResponse(BaseModel):
+    causality_assessment_level_id: str
+    adr_id: str
+    ml_model_id: str
+    causality_assessment_level_value: CausalityAssessmentLevelEnum
+
     base_values: Optional[List[float]] = None
-    shap_values_matrix: Optional[List[List[float]]] = None
     shap_values_sum_per_class: Optional[List[float]] = None
     shap_values_and_base_values_sum_per_class: Optional[List[float]] = None
+    # One row, name and value per returned feature, in the same order
+    shap_values_matrix: Optional[List[List[float]]] = None
     feature_names: Optional[List[str]] = None
     feature_values: Optional[List[Any]] = None
+    # Features before `top_k`, and the per class sum of those left out
+    feature_count: int = 0
+    other_features_sum_per_class: Optional[List[float]] = None
 
 
 # ADR
@@ -285,7 +320,7 @@ class ADRGetResponse(BaseModel):
     medical_institution_id: str | None = None
     # Personal Details
     patient_name: str
-    inpatient_or_outpatient_number: str
+    inpatient_or_outpatient_number: str | None = None
     patient_age: int | None = None
     patient_date_of_birth: date | None = None
     patient_address: str | None = None
@@ -312,12 +347,30 @@ class ADRGetResponse(BaseModel):
     # causality_assessment_levels: List[CausalityAssessmentLevelGetResponse] = []
 
 
+class ADRDetailResponse(ADRPostRequest):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    user_id: str
+    current_causality_assessment_level_id: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
 class ADRReviewCreateRequest(BaseModel):
     approved: bool
     proposed_causality_level: CausalityAssessmentLevelEnum | None = None
     reason: str | None = None
 
 
+class ReviewBatchItem(ADRReviewCreateRequest):
+    causality_assessment_level_id: str
+
+
+class ReviewBatchCreateRequest(BaseModel):
+    reviews: List[ReviewBatchItem] = Field(min_length=1)
+
+
 class ADRReviewSchema(BaseModel):
     review_id: str
     user_id: str
@@ -355,6 +408,15 @@ class MedicalInstitutionGetResponse(BaseModel):
     sub_county: str | None = None
 
 
+class MedicalInstitutionAutocompleteResponse(BaseModel):
+    id: str
+    name: str
+    mfl_code: str | None = None
+    county: str | None = None
+    sub_county: str | None = None
+    telephones: List[str] = []
+
+
 class MedicalInstitutionPostRequest(BaseModel):
     name: str
     mfl_code: str | None = None
@@ -393,10 +455,50 @@ class SMSMessageGetResponse(BaseModel):
     created_at: datetime
 
 
+class SMSOutboxGetResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    idempotency_key: str
+    adr_id: str | None = None
+    sms_type: SMSMessageTypeEnum
+    recipients: List[str]
+    content: str
+    status: SMSOutboxStatusEnum
+    attempts: int
+    next_attempt_at: datetime
+    last_error: str | None = None
+    campaign_id: str | None = None
+    created_at: datetime
+
+
+class RescoringJobGetResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    ml_model_id: str
+    status: RescoringJobStatusEnum
+    total_count: int
+    processed_count: int
+    scored_count: int
+    elapsed_seconds: float
+    adrs_per_second: float | None = None
+    last_error: str | None = None
+    started_at: datetime
+    finished_at: datetime | None = None
+
+
 class IndividualAlertPostRequest(BaseModel):
     adr_id: str
 
 
+class IndividualAlertCampaignPostRequest(BaseModel):
+    # Restrict the campaign to these ADRs, otherwise every ADR awaiting an
+    # individual alert (optionally matching `query`) is included
+    adr_ids: List[str] | None = None
+    query: str = ""
+
+
 class AdditionalInfoPostRequest(BaseModel):
     adr_id: str
 
@@ -0,0 +1,73 @@
+"""
+Login throughput under concurrent load.
+
+Runs a burst of concurrent password verifications, the expensive part of
+`login_for_access_token`, once inline on the event loop (the old behaviour)
+and once through the password hashing pool. A ticker coroutine measures how
+long the event loop is stalled, which is what every other request waits for
+during a login burst.
+
+    cd server && python -m benchmarks.login_throughput --logins 64
+"""
+
+import argparse
+import asyncio
+import time
+
+from auth import pwd_context, verify_and_update_password, verify_password
+
+
+async def ticker(stop: asyncio.Event, interval: float, stalls: list):
+    while not stop.is_set():
+        started_at = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - started_at - interval)
+
+
+async def inline_login(password: str, hashed_password: str):
+    return verify_password(password, hashed_password)
+
+
+async def pooled_login(password: str, hashed_password: str):
+    return await verify_and_update_password(password, hashed_password)
+
+
+async def run(login, logins: int, password: str, hashed_password: str):
+    stop = asyncio.Event()
+    stalls = []
+    ticker_task = asyncio.create_task(ticker(stop, 0.005, stalls))
+    await asyncio.sleep(0)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(login(password, hashed_password) for _ in range(logins)))
+    elapsed = time.perf_counter() - started_at
+
+    stop.set()
+    await ticker_task
+
+    return {
+        "logins_per_second": logins / elapsed,
+        "elapsed_seconds": elapsed,
+        "max_loop_stall_ms": max(stalls, default=0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--logins", type=int, default=64)
+    args = parser.parse_args()
+
+    password = "correct horse battery staple"
+    hashed_password = pwd_context.hash(password)
+
+    for name, login in [("inline", inline_login), ("pooled", pooled_login)]:
+        result = asyncio.run(run(login, args.logins, password, hashed_password))
+        print(
+            f"{name:>7}: {result['logins_per_second']:8.1f} logins/s  "
+            f"{result['elapsed_seconds']:6.2f} s total  "
+            f"max event loop stall {result['max_loop_stall_ms']:8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
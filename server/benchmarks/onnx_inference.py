@@ -0,0 +1,70 @@
+"""
+Prediction latency of the scikit-learn model against its ONNX export.
+
+Prepares `data.csv` once, then times `predict_proba` on single rows and on
+the whole file with both backends. Run `onnx_export` first.
+
+    cd server && python -m benchmarks.onnx_inference --repeat 2000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from onnx_export import get_onnx_model_path
+from prediction import OnnxModel, get_sklearn_ml_model, input_to_prediction_format
+
+
+def time_calls(predict_proba, inputs: list, repeat: int) -> np.ndarray:
+    """Latency of each call in microseconds."""
+    latencies = np.empty(repeat)
+
+    for i in range(repeat):
+        X = inputs[i % len(inputs)]
+        started_at = time.perf_counter()
+        predict_proba(X)
+        latencies[i] = (time.perf_counter() - started_at) * 1e6
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--artifacts-path", default=None)
+    parser.add_argument("--data", default="data.csv")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--batch-repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    prediction_input = input_to_prediction_format(
+        pd.read_csv(args.data), artifacts_path=args.artifacts_path
+    )
+    single_rows = [prediction_input.iloc[[i]] for i in range(len(prediction_input))]
+
+    backends = [
+        ("scikit-learn", get_sklearn_ml_model(args.artifacts_path)),
+        ("ONNX Runtime", OnnxModel(get_onnx_model_path(args.artifacts_path))),
+    ]
+
+    for name, ml_model in backends:
+        # Warm up caches and lazy initialisation before timing
+        time_calls(ml_model.predict_proba, single_rows, 50)
+
+        single_row_latencies = time_calls(
+            ml_model.predict_proba, single_rows, args.repeat
+        )
+        batch_latencies = time_calls(
+            ml_model.predict_proba, [prediction_input], args.batch_repeat
+        )
+
+        print(
+            f"{name:>12}: single row p50 {np.percentile(single_row_latencies, 50):8.1f} us"
+            f"  p95 {np.percentile(single_row_latencies, 95):8.1f} us  |  "
+            f"{len(prediction_input)} rows p50 "
+            f"{np.percentile(batch_latencies, 50) / 1000:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
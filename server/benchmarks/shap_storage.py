@@ -0,0 +1,154 @@
+"""
+Storage size and read latency of SHAP explanations.
+
+Fills a throwaway SQLite database with causality assessments in the old
+layout (JSON `shap_values_matrix` and `feature_names` on every row), reads
+random explanations back, then converts the file with
+`drop_legacy_shap_columns` and repeats the reads against the float32 blob
+and shared feature name set.
+
+    cd server && python -m benchmarks.shap_storage --rows 20000 --features 60
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+
+import numpy as np
+import shap_storage
+from basemodels import CausalityAssessmentLevelEnum
+from migrations import drop_legacy_shap_columns
+from models import Base
+from sqlalchemy import create_engine, text
+
+
+def populate(engine, row_count: int, feature_count: int, class_count: int) -> list:
+    feature_names = [
+        f"onehot__criteria_for_seriousness_feature_{i:03d}"
+        for i in range(feature_count)
+    ]
+    ids = [str(uuid.uuid4()) for _ in range(row_count)]
+
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "ALTER TABLE causality_assessment_level ADD COLUMN shap_values_matrix JSON"
+            )
+        )
+        connection.execute(
+            text("ALTER TABLE causality_assessment_level ADD COLUMN feature_names JSON")
+        )
+        connection.execute(
+            text("""
+            INSERT INTO causality_assessment_level (
+                id, adr_id, ml_model_id, causality_assessment_level_value,
+                base_values, shap_values_matrix, feature_names, approved_count,
+                unapproved_count
+            )
+            VALUES (
+                :id, :id, 'final_ml_model@champion', :value, :base_values,
+                :shap_values_matrix, :feature_names, 0, 0
+            )
+            """),
+            [
+                {
+                    "id": id,
+                    "value": CausalityAssessmentLevelEnum.certain.name,
+                    "base_values": json.dumps(np.random.rand(class_count).tolist()),
+                    "shap_values_matrix": json.dumps(
+                        (np.random.randn(feature_count, class_count) / 100).tolist()
+                    ),
+                    "feature_names": json.dumps(feature_names),
+                }
+                for id in ids
+            ],
+        )
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM"))
+
+    return ids
+
+
+def read_legacy(engine, ids: list) -> float:
+    with engine.connect() as connection:
+        started_at = time.perf_counter()
+        for id in ids:
+            row = connection.execute(
+                text("""
+                SELECT base_values, shap_values_matrix, feature_names
+                FROM causality_assessment_level WHERE id = :id
+                """),
+                {"id": id},
+            ).one()
+            json.loads(row.shap_values_matrix)
+            json.loads(row.feature_names)
+        return time.perf_counter() - started_at
+
+
+def read_binary(engine, ids: list) -> float:
+    shap_storage.feature_names_by_set_id.clear()
+
+    with engine.connect() as connection:
+        started_at = time.perf_counter()
+        for id in ids:
+            row = connection.execute(
+                text("""
+                SELECT base_values, shap_values_blob, feature_name_set_id
+                FROM causality_assessment_level WHERE id = :id
+                """),
+                {"id": id},
+            ).one()
+            shap_storage.decode_shap_values_matrix(
+                row.shap_values_blob, len(json.loads(row.base_values))
+            )
+            shap_storage.get_feature_names(connection, row.feature_name_set_id)
+        return time.perf_counter() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--features", type=int, default=60)
+    parser.add_argument("--classes", type=int, default=6)
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.sqlite")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(engine)
+
+        ids = populate(engine, args.rows, args.features, args.classes)
+        sample_ids = random.sample(ids, min(args.reads, len(ids)))
+
+        legacy_size = os.path.getsize(path)
+        legacy_seconds = read_legacy(engine, sample_ids)
+
+        started_at = time.perf_counter()
+        drop_legacy_shap_columns(engine)
+        migration_seconds = time.perf_counter() - started_at
+
+        binary_size = os.path.getsize(path)
+        binary_seconds = read_binary(engine, sample_ids)
+
+        for name, size, seconds in [
+            ("JSON", legacy_size, legacy_seconds),
+            ("float32 blob", binary_size, binary_seconds),
+        ]:
+            print(
+                f"{name:>12}: {size / 2**20:8.1f} MiB  "
+                f"{size / args.rows:8.0f} B/row  "
+                f"{seconds / len(sample_ids) * 1e6:8.1f} us/explanation"
+            )
+        print(f"   migration: {migration_seconds:8.2f} s for {args.rows} rows")
+
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
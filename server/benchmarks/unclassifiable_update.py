@@ -0,0 +1,128 @@
+"""
+Setting causality assessments to unclassifiable for many ADRs.
+
+Builds a throwaway SQLite database with one causality assessment per ADR and
+times the old per-ADR loop (one SELECT per id, then ORM flushes) against the
+chunked set-based update used by `update_causalities_to_unclassifiable`.
+
+    cd server && python -m benchmarks.unclassifiable_update --adrs 50000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from basemodels import (
+    CausalityAssessmentLevelEnum,
+    CriteriaForSeriousnessEnum,
+    GenderEnum,
+    IsSeriousEnum,
+    KnownAllergyEnum,
+    PregnancyStatusEnum,
+)
+from bulk_updates import set_causality_assessment_level_values
+from models import ADRModel, Base, CausalityAssessmentLevelModel
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+
+def populate(engine, adr_count: int) -> list:
+    adr_ids = [str(uuid.uuid4()) for _ in range(adr_count)]
+
+    with Session(engine) as db:
+        db.execute(
+            insert(ADRModel),
+            [
+                {
+                    "id": adr_id,
+                    "medical_institution_id": "benchmark",
+                    "user_id": "benchmark",
+                    "patient_name": f"Patient {i}",
+                    "patient_gender": GenderEnum.female,
+                    "known_allergy": KnownAllergyEnum.no,
+                    "pregnancy_status": PregnancyStatusEnum.not_applicable,
+                    "is_serious": IsSeriousEnum.no,
+                    "criteria_for_seriousness": CriteriaForSeriousnessEnum.death,
+                }
+                for i, adr_id in enumerate(adr_ids)
+            ],
+        )
+        db.execute(
+            insert(CausalityAssessmentLevelModel),
+            [
+                {
+                    "adr_id": adr_id,
+                    "causality_assessment_level_value": CausalityAssessmentLevelEnum.certain,
+                }
+                for adr_id in adr_ids
+            ],
+        )
+        db.commit()
+
+    return adr_ids
+
+
+def reset(engine):
+    with Session(engine) as db:
+        db.query(CausalityAssessmentLevelModel).update(
+            {
+                CausalityAssessmentLevelModel.causality_assessment_level_value: CausalityAssessmentLevelEnum.certain
+            }
+        )
+        db.commit()
+
+
+def per_adr_loop(db: Session, adr_ids: list) -> int:
+    """The implementation this benchmark replaced."""
+    updated_count = 0
+
+    for adr_id in adr_ids:
+        cals = (
+            db.query(CausalityAssessmentLevelModel)
+            .filter(CausalityAssessmentLevelModel.adr_id == adr_id)
+            .all()
+        )
+
+        for cal in cals:
+            cal.causality_assessment_level_value = (
+                CausalityAssessmentLevelEnum.unclassifiable
+            )
+            updated_count += 1
+
+    return updated_count
+
+
+def set_based(db: Session, adr_ids: list) -> int:
+    return set_causality_assessment_level_values(
+        db, adr_ids, CausalityAssessmentLevelEnum.unclassifiable
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--adrs", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.sqlite')}")
+        Base.metadata.create_all(engine)
+        adr_ids = populate(engine, args.adrs)
+
+        for name, update in [("per-ADR loop", per_adr_loop), ("set-based", set_based)]:
+            reset(engine)
+
+            with Session(engine) as db:
+                started_at = time.perf_counter()
+                updated_count = update(db, adr_ids)
+                db.commit()
+                elapsed = time.perf_counter() - started_at
+
+            print(f"{name:>13}: {updated_count} rows in {elapsed:7.2f} s")
+
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from itertools import islice
+from typing import Iterable, List
+
+from basemodels import CausalityAssessmentLevelEnum
+from models import CausalityAssessmentLevelModel
+from sqlalchemy.orm import Session
+
+# Stay well below SQLite's limit on bound parameters per statement
+SQLITE_CHUNK_SIZE = 500
+
+
+def chunked(values: Iterable, size: int = SQLITE_CHUNK_SIZE):
+    iterator = iter(values)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def set_causality_assessment_level_values(
+    db: Session,
+    adr_ids: List[str],
+    causality_assessment_level_value: CausalityAssessmentLevelEnum,
+) -> int:
+    """
+    Set the causality assessment level of every assessment of the given ADRs
+    with one UPDATE per chunk of ids. Returns the number of updated rows.
+    """
+    updated_count = 0
+
+    for adr_ids_chunk in chunked(dict.fromkeys(adr_ids)):
+        updated_count += (
+            db.query(CausalityAssessmentLevelModel)
+            .filter(CausalityAssessmentLevelModel.adr_id.in_(adr_ids_chunk))
+            .update(
+                {
+                    CausalityAssessmentLevelModel.causality_assessment_level_value: causality_assessment_level_value
+                },
+                synchronize_session=False,
+            )
+        )
+
+    return updated_count
@@ -17,6 +17,10 @@ class Settings(BaseSettings):
     mlflow_model_name: str
     mlflow_model_alias: str
     mlflow_model_artifacts_path: str
+    # "onnxruntime" predicts with model/model.onnx, see onnx_export.py
+    ml_model_backend: str = "sklearn"
+    # Build the explainer on import, for `gunicorn app:app --preload`
+    preload_explainer: bool = False
     minio_host: str
     minio_api_port: str
     minio_access_key: str
@@ -24,6 +28,35 @@ class Settings(BaseSettings):
     aws_region: str
     africas_talking_username: str
     africas_talking_api_key: str
+    institution_directory_max_age_seconds: int = 300
+    principal_cache_ttl_seconds: int = 60
+    bcrypt_rounds: int = 12
+    password_hashing_workers: int = 4
+    revoked_token_families_max_age_seconds: int = 30
+    sms_provider: str = "africastalking"
+    sms_dispatch_concurrency: int = 4
+    sms_dispatch_batch_size: int = 20
+    sms_dispatch_poll_seconds: float = 5.0
+    sms_dispatch_max_attempts: int = 6
+    sms_dispatch_backoff_base_seconds: float = 10.0
+    sms_dispatch_backoff_max_seconds: float = 900.0
+    sms_dispatch_claim_timeout_seconds: float = 120.0
+    delivery_report_flush_seconds: float = 1.0
+    delivery_report_max_buffered: int = 1000
+    # The delivery report callback URL must carry ?token=<value>, reports are
+    # refused while this is unset
+    delivery_report_token: str | None = None
+    # Strongest positive and negative SHAP contributions kept per class
+    shap_top_k: int = 5
+    shap_importance_max_age_seconds: int = 3600
+    # Candidate model bundle scored in shadow mode, off when unset
+    shadow_model_artifacts_path: str | None = None
+    shadow_ml_model_id: str = "final_ml_model@challenger"
+    shadow_scoring_workers: int = 1
+    shadow_scoring_max_pending: int = 100
+    # Requests at least this slow have their SQL logged, profiling is off when unset
+    slow_request_threshold_ms: float | None = None
+    slow_request_log_size: int = 50
     model_config = SettingsConfigDict(env_file="../.env", extra="allow")
 
     # model_config = SettingsConfigDict(env_file=".env")
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import threading
+from typing import Dict, Tuple
+
+from bulk_updates import chunked
+from config import settings
+from models import SMSMessageModel
+from sessions import Session as SessionLocal
+
+# Africa's Talking reports a message on the handset as "Success", which the
+# dashboards count as "Delivered"
+DELIVERY_STATUSES = {"Success": "Delivered"}
+
+# Once a message reaches one of these, later reports do not change it
+FINAL_STATUSES = ("Delivered", "Failed", "Rejected")
+
+
+class DeliveryReportBuffer:
+    """
+    Collects SMS delivery reports in memory and writes them in batches.
+
+    Only the latest report per message is kept, and reports sharing a status
+    are applied with one `UPDATE ... WHERE message_id IN (...)`. A message
+    with a final status keeps it. Reports still
+    buffered when the process dies are lost, so the flush interval is short.
+    """
+
+    def __init__(self, flush_seconds: float = 1.0, max_buffered: int = 1000):
+        self.flush_seconds = flush_seconds
+        self.max_buffered = max_buffered
+        self.reports: Dict[str, Tuple[str, str | None]] = {}
+        self._lock = threading.Lock()
+        self._flush_event = None
+        self._loop = None
+        self._task = None
+
+    def add(self, message_id: str, status: str, failure_reason: str | None = None):
+        status = DELIVERY_STATUSES.get(status, status)
+
+        with self._lock:
+            buffered_report = self.reports.get(message_id)
+
+            if buffered_report is None or buffered_report[0] not in FINAL_STATUSES:
+                self.reports[message_id] = (status, failure_reason or None)
+
+            buffered = len(self.reports)
+
+        if buffered >= self.max_buffered and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._flush_event.set)
+
+    def flush(self) -> int:
+        """Write the buffered reports. Returns the number of updated messages."""
+        with self._lock:
+            reports, self.reports = self.reports, {}
+
+        if not reports:
+            return 0
+
+        message_ids_by_report = {}
+        for message_id, report in reports.items():
+            message_ids_by_report.setdefault(report, []).append(message_id)
+
+        updated_count = 0
+
+        try:
+            with SessionLocal() as db:
+                for report, message_ids in message_ids_by_report.items():
+                    status, failure_reason = report
+
+                    for message_ids_chunk in chunked(message_ids):
+                        query = db.query(SMSMessageModel).filter(
+                            SMSMessageModel.message_id.in_(message_ids_chunk),
+                            SMSMessageModel.status.not_in(FINAL_STATUSES),
+                        )
+
+                        updated_count += query.update(
+                            {
+                                SMSMessageModel.status: status,
+                                SMSMessageModel.failure_reason: failure_reason,
+                            },
+                            synchronize_session=False,
+                        )
+
+                db.commit()
+        except Exception:
+            # Put the reports back unless newer ones arrived meanwhile
+            with self._lock:
+                for message_id, report in reports.items():
+                    self.reports.setdefault(message_id, report)
+            raise
+
+        return updated_count
+
+    def start(self):
+        self._flush_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._loop = None
+
+        await asyncio.to_thread(self.flush)
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                logging.exception("Applying SMS delivery reports failed")
+
+
+delivery_report_buffer = DeliveryReportBuffer(
+    flush_seconds=settings.delivery_report_flush_seconds,
+    max_buffered=settings.delivery_report_max_buffered,
+)
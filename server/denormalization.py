@@ -0,0 +1,238 @@
+import argparse
+import datetime
+import json
+import logging
+import uuid
+
+from models import ADRModel, CausalityAssessmentLevelModel, ShapContributionModel
+from sessions import Session as SessionLocal
+from shap_storage import (
+    decode_shap_values,
+    get_feature_names,
+    get_top_shap_contributions,
+)
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+
+def set_current_causality_assessment_level(
+    db: Session, adr_id: str, causality_assessment_level_id: str
+):
+    """Point an ADR at a newly written causality assessment if it has none yet."""
+    db.query(ADRModel).filter(
+        ADRModel.id == adr_id,
+        ADRModel.current_causality_assessment_level_id.is_(None),
+    ).update(
+        {
+            ADRModel.current_causality_assessment_level_id: causality_assessment_level_id
+        },
+        synchronize_session=False,
+    )
+
+
+def refresh_current_causality_assessment_level(db: Session, adr_id: str):
+    """Re-point an ADR at its earliest remaining causality assessment."""
+    first_causality_assessment_level_id = (
+        db.query(CausalityAssessmentLevelModel.id)
+        .filter(CausalityAssessmentLevelModel.adr_id == adr_id)
+        .order_by(CausalityAssessmentLevelModel.created_at.asc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+    db.query(ADRModel).filter(ADRModel.id == adr_id).update(
+        {
+            ADRModel.current_causality_assessment_level_id: first_causality_assessment_level_id
+        },
+        synchronize_session=False,
+    )
+
+
+def backfill_current_causality_assessment_levels(db: Session):
+    """
+    Point every ADR at its first causality assessment, whether its pointer is
+    missing or was moved to a later assessment by an older rescoring run.
+    """
+    db.execute(
+        text("""
+        UPDATE adr
+        SET current_causality_assessment_level_id = (
+            SELECT cal.id
+            FROM causality_assessment_level cal
+            WHERE cal.adr_id = adr.id
+            ORDER BY cal.created_at ASC
+            LIMIT 1
+        )
+        WHERE current_causality_assessment_level_id IS NOT (
+            SELECT cal.id
+            FROM causality_assessment_level cal
+            WHERE cal.adr_id = adr.id
+            ORDER BY cal.created_at ASC
+            LIMIT 1
+        )
+        """)
+    )
+
+
+def adjust_review_counts(
+    db: Session, causality_assessment_level_id: str, approved: bool, delta: int
+):
+    """Add `delta` to the approved or unapproved tally of a causality assessment."""
+    column = (
+        CausalityAssessmentLevelModel.approved_count
+        if approved
+        else CausalityAssessmentLevelModel.unapproved_count
+    )
+
+    db.query(CausalityAssessmentLevelModel).filter(
+        CausalityAssessmentLevelModel.id == causality_assessment_level_id
+    ).update({column: column + delta}, synchronize_session=False)
+
+
+def adjust_review_counts_batch(db: Session, reviews: list[dict]):
+    """
+    Count a batch of new reviews into their causality assessments with a
+    single executemany update, one parameter set per assessment.
+    """
+    deltas = {}
+    for review in reviews:
+        approved_delta, unapproved_delta = deltas.get(
+            review["causality_assessment_level_id"], (0, 0)
+        )
+        deltas[review["causality_assessment_level_id"]] = (
+            (approved_delta + 1, unapproved_delta)
+            if review["approved"]
+            else (approved_delta, unapproved_delta + 1)
+        )
+
+    if not deltas:
+        return
+
+    db.execute(
+        text("""
+        UPDATE causality_assessment_level
+        SET approved_count = approved_count + :approved_delta,
+            unapproved_count = unapproved_count + :unapproved_delta
+        WHERE id = :id
+        """),
+        [
+            {"id": cal_id, "approved_delta": approved, "unapproved_delta": unapproved}
+            for cal_id, (approved, unapproved) in deltas.items()
+        ],
+    )
+
+
+def reconcile_review_counts(db: Session) -> int:
+    """
+    Compare the review tallies of every causality assessment against `review`
+    and repair the ones that drifted. Returns the number of repaired rows.
+    """
+    drifted_rows = db.execute(
+        text("""
+        SELECT
+            cal.id AS id,
+            COALESCE(SUM(CASE WHEN r.approved = 1 THEN 1 ELSE 0 END), 0) AS approved_count,
+            COALESCE(SUM(CASE WHEN r.approved = 0 THEN 1 ELSE 0 END), 0) AS unapproved_count
+        FROM causality_assessment_level cal
+        LEFT JOIN review r ON r.causality_assessment_level_id = cal.id
+        GROUP BY cal.id, cal.approved_count, cal.unapproved_count
+        HAVING cal.approved_count != COALESCE(SUM(CASE WHEN r.approved = 1 THEN 1 ELSE 0 END), 0)
+            OR cal.unapproved_count != COALESCE(SUM(CASE WHEN r.approved = 0 THEN 1 ELSE 0 END), 0)
+        """)
+    ).fetchall()
+
+    if drifted_rows:
+        db.execute(
+            text("""
+            UPDATE causality_assessment_level
+            SET approved_count = :approved_count, unapproved_count = :unapproved_count
+            WHERE id = :id
+            """),
+            [dict(row._mapping) for row in drifted_rows],
+        )
+
+    return len(drifted_rows)
+
+
+def backfill_shap_contributions(
+    db: Session, class_values: list, top_k: int, batch_size: int = 500
+) -> int:
+    """
+    Store the top SHAP contributions of every causality assessment that has a
+    matrix but none yet, naming the matrix columns with `class_values`.
+    Returns the number of backfilled assessments.
+    """
+    backfilled_count = 0
+    last_id = ""
+
+    while True:
+        rows = db.execute(
+            text("""
+            SELECT cal.id, cal.base_values, cal.shap_values_blob, cal.feature_name_set_id
+            FROM causality_assessment_level cal
+            WHERE cal.id > :last_id
+                AND cal.shap_values_blob IS NOT NULL
+                AND NOT EXISTS (
+                    SELECT 1 FROM shap_contribution c
+                    WHERE c.causality_assessment_level_id = cal.id
+                )
+            ORDER BY cal.id
+            LIMIT :batch_size
+            """),
+            {"last_id": last_id, "batch_size": batch_size},
+        ).fetchall()
+
+        if not rows:
+            return backfilled_count
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        contribution_rows = []
+
+        for row in rows:
+            shap_values = decode_shap_values(
+                row.shap_values_blob, len(json.loads(row.base_values or "[]"))
+            )
+            feature_names = get_feature_names(db, row.feature_name_set_id)
+
+            if shap_values is None or feature_names is None:
+                continue
+
+            contribution_rows.extend(
+                {
+                    "id": str(uuid.uuid4()),
+                    "causality_assessment_level_id": row.id,
+                    "created_at": now,
+                    "updated_at": now,
+                    **contribution,
+                }
+                for contribution in get_top_shap_contributions(
+                    shap_values, feature_names, class_values, top_k
+                )
+            )
+            backfilled_count += 1
+
+        if contribution_rows:
+            db.execute(insert(ShapContributionModel.__table__), contribution_rows)
+
+        last_id = rows[-1].id
+
+
+def main():
+    """
+    Repair drifted review tallies without waiting for the next server start.
+
+        cd server && python -m denormalization
+    """
+    argparse.ArgumentParser(description="Repair drifted review tallies").parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    with SessionLocal() as db:
+        repaired_review_counts = reconcile_review_counts(db)
+        db.commit()
+
+    logging.info(f"Review counts reconciled ({repaired_review_counts} repaired)")
+
+
+if __name__ == "__main__":
+    main()
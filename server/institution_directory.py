@@ -0,0 +1,148 @@
+import heapq
+import logging
+import re
+import threading
+import time
+
+from config import settings
+from models import MedicalInstitutionModel
+from sessions import Session as SessionLocal
+from sqlalchemy.orm import Session, selectinload
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(value: str | None) -> list[str]:
+    return TOKEN_PATTERN.findall(str(value).lower()) if value is not None else []
+
+
+class InstitutionTrie:
+    """Prefix trie mapping name words and MFL codes to institution ids."""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, token: str, institution_id: str):
+        node = self.root
+        for character in token:
+            node = node.setdefault(character, {})
+            node.setdefault("_ids", set()).add(institution_id)
+
+    def search(self, prefix: str) -> set[str]:
+        node = self.root
+        for character in prefix:
+            node = node.get(character)
+            if node is None:
+                return set()
+        return node.get("_ids", set())
+
+
+class InstitutionDirectory:
+    """
+    In-process copy of the medical institutions and their telephones.
+
+    The directory is rebuilt from the database after institution or telephone
+    writes, and whenever it is older than `max_age_seconds` so that workers
+    which did not handle a write eventually catch up. Rebuilds requested by
+    request handlers run in a background thread, one at a time.
+    """
+
+    def __init__(self, max_age_seconds: int = 300):
+        self.max_age_seconds = max_age_seconds
+        self.institutions = {}
+        self.trie = InstitutionTrie()
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._refresh_again = False
+
+    def refresh(self, db: Session):
+        db_institutions = (
+            db.query(MedicalInstitutionModel)
+            .options(selectinload(MedicalInstitutionModel.telephones))
+            .all()
+        )
+
+        institutions = {}
+        trie = InstitutionTrie()
+
+        for institution in db_institutions:
+            institutions[institution.id] = {
+                "id": institution.id,
+                "name": institution.name,
+                "mfl_code": institution.mfl_code,
+                "county": institution.county,
+                "sub_county": institution.sub_county,
+                "telephones": [t.telephone for t in institution.telephones],
+            }
+
+            for token in tokenize(institution.name) + tokenize(institution.mfl_code):
+                trie.insert(token, institution.id)
+
+        # Swap in the new state at once so readers never see a partial build
+        with self._lock:
+            self.institutions = institutions
+            self.trie = trie
+            self.refreshed_at = time.monotonic()
+
+    def refresh_in_background(self, rerun_if_running: bool = False):
+        """
+        Rebuild in a thread unless a rebuild is already running. After a
+        write, pass `rerun_if_running` so a running rebuild that may have
+        missed it is followed by one more.
+        """
+        with self._lock:
+            if self._refreshing:
+                self._refresh_again = self._refresh_again or rerun_if_running
+                return
+            self._refreshing = True
+
+        threading.Thread(target=self._refresh_until_current, daemon=True).start()
+
+    def _refresh_until_current(self):
+        while True:
+            try:
+                with SessionLocal() as db:
+                    self.refresh(db)
+            except Exception:
+                logging.exception("Refreshing the institution directory failed")
+
+            with self._lock:
+                if not self._refresh_again:
+                    self._refreshing = False
+                    return
+                self._refresh_again = False
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.refreshed_at > self.max_age_seconds
+
+    def autocomplete(self, query: str, limit: int = 10) -> list[dict]:
+        """Return institutions matching every word of the query as a prefix."""
+        tokens = tokenize(query)
+
+        if not tokens:
+            return []
+
+        with self._lock:
+            institutions = self.institutions
+            trie = self.trie
+
+        matching_ids = None
+        for token in tokens:
+            token_ids = trie.search(token)
+            matching_ids = (
+                set(token_ids) if matching_ids is None else matching_ids & token_ids
+            )
+            if not matching_ids:
+                return []
+
+        return heapq.nsmallest(
+            limit,
+            (institutions[institution_id] for institution_id in matching_ids),
+            key=lambda institution: institution["name"],
+        )
+
+
+institution_directory = InstitutionDirectory(
+    max_age_seconds=settings.institution_directory_max_age_seconds
+)
@@ -0,0 +1,161 @@
+"""
+Prometheus metrics served at `/metrics`.
+
+Every worker process keeps its own counters. When running several workers,
+set `PROMETHEUS_MULTIPROC_DIR` to an empty directory before starting them so
+`/metrics` reports the sum over all of them, whichever worker answers.
+"""
+
+import contextvars
+import os
+import time
+from dataclasses import dataclass
+
+from engines import engine
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time to answer a request, by route template",
+    ["method", "route", "status_code"],
+    buckets=LATENCY_BUCKETS,
+)
+db_queries_per_request = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed while answering a request",
+    ["method", "route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+db_query_duration_per_request_seconds = Histogram(
+    "db_query_duration_per_request_seconds",
+    "Time spent in SQL statements while answering a request",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+db_query_duration_seconds = Histogram(
+    "db_query_duration_seconds",
+    "Time to execute one SQL statement, background work included",
+    buckets=LATENCY_BUCKETS,
+)
+inference_duration_seconds = Histogram(
+    "inference_duration_seconds",
+    "Time to assess one ADR, by stage: feature_preparation, prediction or shap",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+sms_provider_duration_seconds = Histogram(
+    "sms_provider_duration_seconds",
+    "Time for the SMS provider to answer a send, by outcome",
+    ["provider", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+# Hit rate: rate(cache_requests_total{result="hit"}) / rate(cache_requests_total)
+cache_requests_total = Counter(
+    "cache_requests_total",
+    "Lookups of in-process caches, by cache and whether they were served from it",
+    ["cache", "result"],
+)
+
+
+@dataclass
+class RequestQueryStats:
+    count: int = 0
+    duration_seconds: float = 0.0
+
+
+# Set for the duration of each request by `record_request_metrics`. Endpoints
+# run in a copy of the request's context, so they share the same stats object
+request_query_stats: contextvars.ContextVar[RequestQueryStats | None] = (
+    contextvars.ContextVar("request_query_stats", default=None)
+)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration_seconds = time.perf_counter() - conn.info["query_started_at"].pop()
+    db_query_duration_seconds.observe(duration_seconds)
+
+    stats = request_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration_seconds += duration_seconds
+
+
+@event.listens_for(engine, "handle_error")
+def handle_error(exception_context):
+    # A failed statement never reaches `after_cursor_execute`
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started_at"):
+        connection.info["query_started_at"].pop()
+
+
+async def record_request_metrics(request, call_next):
+    """HTTP middleware timing each request and counting its SQL statements."""
+    stats = RequestQueryStats()
+    token = request_query_stats.set(stats)
+    started_at = time.perf_counter()
+    status_code = 500
+
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        duration_seconds = time.perf_counter() - started_at
+        request_query_stats.reset(token)
+
+        # The template, not the path, so ids do not create new series
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+
+        http_request_duration_seconds.labels(
+            request.method, route_path, status_code
+        ).observe(duration_seconds)
+        db_queries_per_request.labels(request.method, route_path).observe(stats.count)
+        db_query_duration_per_request_seconds.labels(
+            request.method, route_path
+        ).observe(stats.duration_seconds)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    cache_requests_total.labels(cache, "hit" if hit else "miss").inc()
+
+
+def generate_metrics() -> tuple[bytes, str]:
+    """The exposition text and its content type."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,230 @@
+import argparse
+import json
+import logging
+import sqlite3
+
+import engines
+from shap_storage import encode_shap_values_matrix, save_feature_name_set
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateColumn, CreateIndex, MetaData
+
+# Indexes replaced by ones under a new name, dropped from older databases
+OBSOLETE_INDEXES = ["ix_adr_is_serious_created_at"]
+
+
+def add_missing_columns(engine: Engine, metadata: MetaData):
+    """
+    Bring tables created by an older version of the models up to date.
+
+    `create_all` only creates missing tables, so new columns and indexes on
+    existing tables are added here, and `OBSOLETE_INDEXES` are dropped.
+    Returns the added columns as `table.column` names so callers can
+    backfill them.
+
+    A unique index that existing rows violate is skipped with an error
+    instead of stopping startup.
+    """
+    inspector = inspect(engine)
+    existing_tables = inspector.get_table_names()
+    added_columns = []
+
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_columns = {
+                column["name"] for column in inspector.get_columns(table.name)
+            }
+
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                connection.execute(
+                    text(f'ALTER TABLE "{table.name}" ADD COLUMN {column_ddl}')
+                )
+                added_columns.append(f"{table.name}.{column.name}")
+                logging.info(f"Added column {table.name}.{column.name}")
+
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        for index in table.indexes:
+            try:
+                # IF NOT EXISTS, as reflection skips expression indexes
+                with engine.begin() as connection:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+            except IntegrityError as e:
+                logging.error(f"Could not create unique index {index.name}: {e.orig}")
+
+    with engine.begin() as connection:
+        for index_name in OBSOLETE_INDEXES:
+            connection.execute(text(f'DROP INDEX IF EXISTS "{index_name}"'))
+
+    return added_columns
+
+
+LEGACY_SHAP_COLUMNS = ("shap_values_matrix", "feature_names")
+
+
+def get_legacy_shap_columns(engine: Engine) -> list:
+    existing_columns = {
+        column["name"]
+        for column in inspect(engine).get_columns("causality_assessment_level")
+    }
+    return [column for column in LEGACY_SHAP_COLUMNS if column in existing_columns]
+
+
+def migrate_legacy_shap_columns(engine: Engine, batch_size: int = 500) -> int:
+    """
+    Copy SHAP values stored by older versions as JSON `shap_values_matrix` and
+    `feature_names` columns into `shap_values_blob` and `feature_name_set`.
+    Rows already converted are skipped and the JSON columns are kept, see
+    `drop_legacy_shap_columns`. Returns the number of converted rows.
+    """
+    legacy_columns = get_legacy_shap_columns(engine)
+
+    if not legacy_columns:
+        return 0
+
+    select_sql = text(f"""
+        SELECT id, ml_model_id, {", ".join(legacy_columns)}
+        FROM causality_assessment_level
+        WHERE id > :after_id
+            AND shap_values_blob IS NULL
+            AND feature_name_set_id IS NULL
+            AND ({" OR ".join(f"{column} IS NOT NULL" for column in legacy_columns)})
+        ORDER BY id
+        LIMIT :limit
+    """)
+    update_sql = text("""
+        UPDATE causality_assessment_level
+        SET shap_values_blob = :shap_values_blob,
+            feature_name_set_id = :feature_name_set_id
+        WHERE id = :id
+    """)
+
+    converted_count = 0
+    feature_name_set_ids = {}
+    after_id = ""
+
+    with engine.begin() as connection:
+        while True:
+            rows = connection.execute(
+                select_sql, {"after_id": after_id, "limit": batch_size}
+            ).fetchall()
+
+            if not rows:
+                break
+
+            updates = []
+            for row in rows:
+                shap_values_matrix = json.loads(
+                    row._mapping.get("shap_values_matrix") or "null"
+                )
+                feature_names_json = row._mapping.get("feature_names") or "null"
+                feature_names = json.loads(feature_names_json)
+
+                feature_name_set_id = None
+                if feature_names is not None:
+                    set_key = (row.ml_model_id, feature_names_json)
+                    if set_key not in feature_name_set_ids:
+                        feature_name_set_ids[set_key] = save_feature_name_set(
+                            connection, row.ml_model_id, feature_names
+                        )
+                    feature_name_set_id = feature_name_set_ids[set_key]
+
+                updates.append(
+                    {
+                        "id": row.id,
+                        "shap_values_blob": encode_shap_values_matrix(
+                            shap_values_matrix
+                        ),
+                        "feature_name_set_id": feature_name_set_id,
+                    }
+                )
+
+            connection.execute(update_sql, updates)
+            converted_count += len(updates)
+            after_id = rows[-1].id
+
+    if converted_count:
+        logging.info(
+            f"Converted SHAP values of {converted_count} causality assessments to "
+            f"binary storage"
+        )
+
+    return converted_count
+
+
+def drop_legacy_shap_columns(engine: Engine, backup_path: str | None = None) -> list:
+    """
+    Convert any remaining legacy SHAP values, then drop the JSON columns and
+    rebuild the file to reclaim their space. Copies the database to
+    `backup_path` first when given. Returns the dropped columns.
+    """
+    legacy_columns = get_legacy_shap_columns(engine)
+
+    if not legacy_columns:
+        return []
+
+    if backup_path is not None:
+        raw_connection = engine.raw_connection()
+        try:
+            with sqlite3.connect(backup_path) as backup_connection:
+                raw_connection.driver_connection.backup(backup_connection)
+        finally:
+            raw_connection.close()
+        logging.info(f"Database backed up to {backup_path}")
+
+    migrate_legacy_shap_columns(engine)
+
+    with engine.begin() as connection:
+        for column in legacy_columns:
+            connection.execute(
+                text(f"ALTER TABLE causality_assessment_level DROP COLUMN {column}")
+            )
+
+    # Dropping columns leaves free pages behind until the file is rebuilt
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM"))
+
+    logging.info(f"Dropped {', '.join(legacy_columns)} from causality_assessment_level")
+
+    return legacy_columns
+
+
+def main():
+    """
+    One-off schema changes that are not safe to run on every start.
+
+        cd server && python -m migrations drop-legacy-shap-columns --backup db.sqlite.bak
+    """
+    parser = argparse.ArgumentParser(description="One-off database migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    drop_parser = subparsers.add_parser(
+        "drop-legacy-shap-columns",
+        help="Drop the JSON SHAP columns once every row has been converted",
+    )
+    drop_parser.add_argument(
+        "--backup", help="Copy the database to this path before dropping"
+    )
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "drop-legacy-shap-columns":
+        dropped_columns = drop_legacy_shap_columns(engines.engine, args.backup)
+        if not dropped_columns:
+            logging.info("No legacy SHAP columns left")
+
+
+if __name__ == "__main__":
+    main()
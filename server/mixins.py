@@ -4,11 +4,15 @@ import uuid
 from sqlalchemy import Column, DateTime, String
 
 
+def utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
 class TimestampMixin:
-    created_at = Column(
-        DateTime, default=datetime.datetime.now(datetime.timezone.utc)
-    )  # Set at creation
-    updated_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
+    # Callables, so each row gets the time it was written rather than the
+    # time this module was imported
+    created_at = Column(DateTime, default=utc_now)  # Set at creation
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
 
 
 class IDMixin:
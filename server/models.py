@@ -13,11 +13,18 @@ from basemodels import (
     OutcomeEnum,
     PregnancyStatusEnum,
     RechallengeEnum,
+    RescoringJobStatusEnum,
     ReviewEnum,
     SeverityEnum,
     SMSMessageTypeEnum,
+    SMSOutboxStatusEnum,
 )
 from mixins import IDMixin, TimestampMixin
+from shap_storage import (
+    decode_shap_values_matrix,
+    encode_shap_values_matrix,
+    get_feature_names,
+)
 from sqlalchemy import (
     JSON,
     Boolean,
@@ -26,16 +33,20 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     LargeBinary,
     String,
     Uuid,
+    text,
 )
 from sqlalchemy import Enum as SQLAlchemyEnum
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.orm import declarative_base, deferred, object_session, relationship
 
 Base = declarative_base()
 
+DEFAULT_ML_MODEL_ID = "final_ml_model@champion"
+
 
 class MedicalInstitutionModel(Base, IDMixin, TimestampMixin):
     __tablename__ = "medical_institution"
@@ -71,7 +82,7 @@ class MedicalInstitutionTelephoneModel(Base, IDMixin, TimestampMixin):
 class SMSMessageModel(Base, IDMixin, TimestampMixin):
     __tablename__ = "sms_message"
 
-    message_id = Column(String, nullable=True)
+    message_id = Column(String, nullable=True, index=True)
     sms_type = Column(SQLAlchemyEnum(SMSMessageTypeEnum), nullable=False)
     number = Column(String, nullable=False)
     content = Column(String, nullable=False)
@@ -79,13 +90,56 @@ class SMSMessageModel(Base, IDMixin, TimestampMixin):
     message_parts = Column(Integer, nullable=True)
     status = Column(String, nullable=False)
     status_code = Column(Integer, nullable=False)
+    failure_reason = Column(String, nullable=True)
 
     adr_id = Column(String, ForeignKey("adr.id"), nullable=True)
     adr = relationship("ADRModel", back_populates="sms_messages")
+    # The outbox job that sent this message, none for messages sent directly
+    sms_outbox_id = Column(
+        String, ForeignKey("sms_outbox.id"), nullable=True, index=True
+    )
+
+
+class SMSOutboxModel(Base, IDMixin, TimestampMixin):
+    """An SMS waiting to be sent, or already sent, by the SMS dispatcher."""
+
+    __tablename__ = "sms_outbox"
+    __table_args__ = (
+        Index("ix_sms_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    # One job per ADR and message type, so repeated requests do not resend
+    idempotency_key = Column(String, nullable=False, unique=True)
+    sms_type = Column(SQLAlchemyEnum(SMSMessageTypeEnum), nullable=False)
+    recipients = Column(JSON, nullable=False)
+    content = Column(String, nullable=False)
+
+    status = Column(
+        SQLAlchemyEnum(SMSOutboxStatusEnum),
+        nullable=False,
+        default=SMSOutboxStatusEnum.pending,
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    claimed_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+
+    adr_id = Column(String, ForeignKey("adr.id"), nullable=True)
+    campaign_id = Column(String, nullable=True, index=True)
 
 
 class ADRModel(Base, IDMixin, TimestampMixin):
     __tablename__ = "adr"
+    __table_args__ = (
+        Index("ix_adr_created_at", "created_at"),
+        # Walked in order by the review queue: serious ADRs first, oldest first.
+        # The expression must match the queue's ORDER BY for SQLite to use it
+        Index(
+            "ix_adr_review_queue_order",
+            text("(CASE WHEN is_serious = 'yes' THEN 1 ELSE 0 END) DESC"),
+            "created_at",
+        ),
+    )
     # Institution Details
     medical_institution_id = Column(
         String, ForeignKey("medical_institution.id"), nullable=False
@@ -172,10 +226,28 @@ class ADRModel(Base, IDMixin, TimestampMixin):
     # )
     comments = Column(String, nullable=True)
 
+    # Denormalized pointer to the first causality assessment of the ADR
+    current_causality_assessment_level_id = Column(
+        String,
+        ForeignKey(
+            "causality_assessment_level.id",
+            use_alter=True,
+            name="fk_adr_current_causality_assessment_level_id",
+        ),
+        nullable=True,
+        index=True,
+    )
+    current_causality_assessment_level = relationship(
+        "CausalityAssessmentLevelModel",
+        foreign_keys=[current_causality_assessment_level_id],
+        post_update=True,
+    )
+
     # Relationships
     causality_assessment_levels = relationship(
         "CausalityAssessmentLevelModel",
         back_populates="adr",
+        foreign_keys="CausalityAssessmentLevelModel.adr_id",
         cascade="all, delete-orphan",
     )
 
@@ -195,28 +267,42 @@ class ADRModel(Base, IDMixin, TimestampMixin):
 class CausalityAssessmentLevelModel(Base, IDMixin, TimestampMixin):
     __tablename__ = "causality_assessment_level"
 
-    adr_id = Column(String, ForeignKey("adr.id"), nullable=False)
+    adr_id = Column(String, ForeignKey("adr.id"), nullable=False, index=True)
     adr = relationship(
         "ADRModel",
         back_populates="causality_assessment_levels",
+        foreign_keys=[adr_id],
     )
 
     ml_model_id = Column(
         String,
         nullable=False,
-        default="final_ml_model@champion",
+        default=DEFAULT_ML_MODEL_ID,
     )
 
     causality_assessment_level_value = Column(
         SQLAlchemyEnum(CausalityAssessmentLevelEnum), nullable=False
     )
 
-    base_values = Column(JSON, nullable=True)
-    shap_values_matrix = Column(JSON, nullable=True)
-    shap_values_sum_per_class = Column(JSON, nullable=True)
-    shap_values_and_base_values_sum_per_class = Column(JSON, nullable=True)
-    feature_names = Column(JSON, nullable=True)
-    feature_values = Column(JSON, nullable=True)
+    # Explanation columns are only read when first accessed, all in one
+    # SELECT, or up front with `undefer_group("explanation")`
+    base_values = deferred(Column(JSON, nullable=True), group="explanation")
+    # float32 n_features x n_classes, see `shap_storage`
+    shap_values_blob = deferred(Column(LargeBinary, nullable=True), group="explanation")
+    shap_values_sum_per_class = deferred(
+        Column(JSON, nullable=True), group="explanation"
+    )
+    shap_values_and_base_values_sum_per_class = deferred(
+        Column(JSON, nullable=True), group="explanation"
+    )
+    feature_name_set_id = Column(
+        String, ForeignKey("feature_name_set.id"), nullable=True, index=True
+    )
+    feature_values = deferred(Column(JSON, nullable=True), group="explanation")
+
+    # Denormalized review tallies
+    approved_count = Column(Integer, nullable=False, default=0, server_default="0")
+    unapproved_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     reviews = relationship(
         "ReviewModel",
@@ -224,15 +310,143 @@ class CausalityAssessmentLevelModel(Base, IDMixin, TimestampMixin):
         cascade="all, delete-orphan",
     )
 
+    shap_contributions = relationship(
+        "ShapContributionModel",
+        back_populates="causality_assessment_level",
+        cascade="all, delete-orphan",
+    )
+
+    # Decoded on access only, so rows loaded for lists pay nothing for them
+    @property
+    def shap_values_matrix(self):
+        return decode_shap_values_matrix(
+            self.shap_values_blob, len(self.base_values or [])
+        )
+
+    @shap_values_matrix.setter
+    def shap_values_matrix(self, shap_values_matrix):
+        self.shap_values_blob = encode_shap_values_matrix(shap_values_matrix)
+
+    @property
+    def feature_names(self):
+        return get_feature_names(object_session(self), self.feature_name_set_id)
+
+
+class ShapContributionModel(Base, IDMixin, TimestampMixin):
+    """
+    One of the strongest contributions of a feature towards a class, kept
+    alongside the full matrix so population questions are plain aggregations.
+    Positive and negative contributions are ranked separately, 1 strongest.
+    """
+
+    __tablename__ = "shap_contribution"
+    __table_args__ = (
+        Index(
+            "ix_shap_contribution_class_value_feature_name",
+            "class_value",
+            "feature_name",
+        ),
+    )
+
+    causality_assessment_level_id = Column(
+        String, ForeignKey("causality_assessment_level.id"), nullable=False, index=True
+    )
+    causality_assessment_level = relationship(
+        "CausalityAssessmentLevelModel", back_populates="shap_contributions"
+    )
+
+    class_value = Column(SQLAlchemyEnum(CausalityAssessmentLevelEnum), nullable=False)
+    feature_name = Column(String, nullable=False)
+    shap_value = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False)
+
+
+class FeatureNameSetModel(Base, TimestampMixin):
+    """Feature names of a model version, shared by its causality assessments."""
+
+    __tablename__ = "feature_name_set"
+
+    # Digest of the model id and names, see `shap_storage.get_feature_name_set_id`
+    id = Column(String, primary_key=True)
+    ml_model_id = Column(String, nullable=False)
+    feature_names = Column(JSON, nullable=False)
+
 
 # ml_model = relationship("MLModelModel", back_populates="causality_assessment_levels")
 
 
+class ShadowPredictionModel(Base, IDMixin, TimestampMixin):
+    """
+    A candidate model's prediction for an ADR next to the production one.
+    Latencies cover feature preparation and prediction, without SHAP.
+    """
+
+    __tablename__ = "shadow_prediction"
+
+    adr_id = Column(String, ForeignKey("adr.id"), nullable=False, index=True)
+    ml_model_id = Column(String, nullable=False, index=True)
+    production_ml_model_id = Column(String, nullable=False)
+
+    production_value = Column(
+        SQLAlchemyEnum(CausalityAssessmentLevelEnum), nullable=False
+    )
+    # Missing when the candidate failed, see `error`
+    candidate_value = Column(
+        SQLAlchemyEnum(CausalityAssessmentLevelEnum), nullable=True
+    )
+
+    production_latency_ms = Column(Float, nullable=False)
+    candidate_latency_ms = Column(Float, nullable=True)
+    error = Column(String, nullable=True)
+
+
+class RescoringJobModel(Base, IDMixin, TimestampMixin):
+    """
+    Progress of re-scoring every ADR with a model version. ADRs are walked in
+    id order and `last_adr_id` is committed with each chunk's assessments, so
+    a restarted job continues after the last completed chunk.
+    """
+
+    __tablename__ = "rescoring_job"
+
+    ml_model_id = Column(String, nullable=False, unique=True)
+    status = Column(SQLAlchemyEnum(RescoringJobStatusEnum), nullable=False)
+    last_adr_id = Column(String, nullable=False, default="")
+    total_count = Column(Integer, nullable=False, default=0)
+    processed_count = Column(Integer, nullable=False, default=0)
+    scored_count = Column(Integer, nullable=False, default=0)
+    # Time spent scoring, summed over runs so restarts do not skew throughput
+    elapsed_seconds = Column(Float, nullable=False, default=0.0)
+    last_error = Column(String, nullable=True)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    @property
+    def adrs_per_second(self) -> float | None:
+        if not self.elapsed_seconds:
+            return None
+
+        return self.processed_count / self.elapsed_seconds
+
+
 class ReviewModel(Base, IDMixin, TimestampMixin):
     __tablename__ = "review"
+    # One review per user per assessment. A unique index rather than a table
+    # constraint so that `add_missing_columns` can add it to existing tables
+    __table_args__ = (
+        Index(
+            "uq_review_user_id_causality_assessment_level_id",
+            "user_id",
+            "causality_assessment_level_id",
+            unique=True,
+        ),
+    )
 
     causality_assessment_level_id = Column(
-        String, ForeignKey("causality_assessment_level.id"), nullable=False
+        String,
+        ForeignKey("causality_assessment_level.id"),
+        nullable=False,
+        index=True,
     )
     causality_assessment_level = relationship(
         "CausalityAssessmentLevelModel",
@@ -259,11 +473,31 @@ class UserModel(Base, IDMixin, TimestampMixin):
     password = Column(String, nullable=False, unique=True)
     first_name = Column(String, nullable=True)
     last_name = Column(String, nullable=True)
+    disabled = Column(Boolean, nullable=False, default=False, server_default="0")
 
     reviews = relationship(
         "ReviewModel", back_populates="user", cascade="all, delete-orphan"
     )
     adrs = relationship("ADRModel", back_populates="user", cascade="all, delete-orphan")
+    refresh_token_families = relationship(
+        "RefreshTokenFamilyModel", back_populates="user", cascade="all, delete-orphan"
+    )
+
+
+class RefreshTokenFamilyModel(Base, IDMixin, TimestampMixin):
+    """
+    One login session. Every refresh rotates `current_jti`; presenting any
+    older refresh token of the family is treated as theft and revokes it.
+    """
+
+    __tablename__ = "refresh_token_family"
+
+    user_id = Column(String, ForeignKey("user.id"), nullable=False, index=True)
+    user = relationship("UserModel", back_populates="refresh_token_families")
+
+    current_jti = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True, index=True)
 
 
 # class MLModelModel(Base, IDMixin, TimestampMixin):
@@ -0,0 +1,122 @@
+"""
+Export the model in `settings.mlflow_model_artifacts_path` to ONNX.
+
+Writes `model/model.onnx` next to `model/model.pkl`, then checks that ONNX
+Runtime predicts the same as scikit-learn over `data.csv` and removes the
+export if it does not. With `--run-id` the export is also logged to that
+MLflow run, so servers downloading its artifacts get it.
+
+    cd server && python -m onnx_export --run-id <run id>
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from config import settings
+from prediction import (
+    OnnxModel,
+    get_mlflow_client,
+    get_sklearn_ml_model,
+    input_to_prediction_format,
+)
+
+# Probabilities are computed in float32 by ONNX Runtime
+PROBABILITY_TOLERANCE = 1e-5
+
+
+def get_onnx_model_path(artifacts_path: str | None = None) -> str:
+    artifacts_path = artifacts_path or settings.mlflow_model_artifacts_path
+    return f"{artifacts_path}/model/model.onnx"
+
+
+def export_onnx(ml_model, sample_input: pd.DataFrame, onnx_model_path: str):
+    # Only needed to export, not to serve
+    from skl2onnx import to_onnx
+
+    onnx_model = to_onnx(
+        ml_model,
+        sample_input.to_numpy(dtype=np.float32),
+        # Plain probability tensor instead of a list of {class: probability}
+        options={id(ml_model): {"zipmap": False}},
+    )
+
+    # `OnnxModel.predict` maps probabilities back to these labels
+    classes = onnx_model.metadata_props.add()
+    classes.key = "classes"
+    classes.value = json.dumps(ml_model.classes_.tolist())
+
+    with open(onnx_model_path, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+
+
+def check_parity(
+    ml_model, onnx_model: OnnxModel, prediction_input: pd.DataFrame
+) -> dict:
+    """Compare the predictions of the two backends on the same inputs."""
+    mismatched_rows = np.flatnonzero(
+        ml_model.predict(prediction_input) != onnx_model.predict(prediction_input)
+    )
+    max_probability_difference = float(
+        np.abs(
+            ml_model.predict_proba(prediction_input)
+            - onnx_model.predict_proba(prediction_input)
+        ).max()
+    )
+
+    return {
+        "row_count": len(prediction_input),
+        "mismatched_rows": mismatched_rows.tolist(),
+        "max_probability_difference": max_probability_difference,
+        "passed": len(mismatched_rows) == 0
+        and max_probability_difference <= PROBABILITY_TOLERANCE,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--artifacts-path", default=None)
+    parser.add_argument("--data", default="data.csv")
+    parser.add_argument("--run-id", default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    ml_model = get_sklearn_ml_model(args.artifacts_path)
+    prediction_input = input_to_prediction_format(
+        pd.read_csv(args.data), artifacts_path=args.artifacts_path
+    )
+    onnx_model_path = get_onnx_model_path(args.artifacts_path)
+
+    export_onnx(ml_model, prediction_input.iloc[:1], onnx_model_path)
+
+    parity = check_parity(ml_model, OnnxModel(onnx_model_path), prediction_input)
+    logging.info(
+        f"Parity over {parity['row_count']} rows: "
+        f"{len(parity['mismatched_rows'])} mismatched predictions, "
+        f"max probability difference {parity['max_probability_difference']:.2e}"
+    )
+
+    if not parity["passed"]:
+        os.remove(onnx_model_path)
+        logging.error(
+            f"ONNX export does not match scikit-learn, removed {onnx_model_path}. "
+            f"Mismatched rows: {parity['mismatched_rows'][:20]}"
+        )
+        sys.exit(1)
+
+    logging.info(f"Exported {onnx_model_path}")
+
+    if args.run_id:
+        get_mlflow_client().log_artifact(
+            args.run_id, onnx_model_path, artifact_path="model"
+        )
+        logging.info(f"Logged model/model.onnx to run {args.run_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+import fcntl
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import List, Tuple
+
+import boto3
+import joblib
+import mlflow
+import numpy as np
+import pandas as pd
+import shap
+from basemodels import DechallengeEnum, RechallengeEnum
+from config import settings
+from mlflow.tracking import MlflowClient
+from models import DEFAULT_ML_MODEL_ID
+from shap import Explainer, KernelExplainer
+from shap.utils._legacy import DenseData
+from sklearn.base import BaseEstimator
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
+
+# Clusters summarising the reference data that SHAP integrates over
+EXPLAINER_BACKGROUND_SIZE = 10
+
+# Written into a bundle when it is downloaded, holds `<model name>/<version>`
+ML_MODEL_ID_FILENAME = "ml_model_id.txt"
+
+
+def get_mlflow_client() -> MlflowClient:
+    # Tracking URI
+    mlflow.set_tracking_uri(
+        f"http://{settings.mlflow_tracking_server_host}:{settings.mlflow_tracking_server_port}"
+    )
+
+    # Credentials
+    # Set MinIO Credentials
+    os.environ["AWS_ACCESS_KEY_ID"] = settings.minio_access_key
+    os.environ["AWS_SECRET_ACCESS_KEY"] = settings.minio_secret_access_key
+    os.environ["AWS_DEFAULT_REGION"] = settings.aws_region
+
+    os.environ["MLFLOW_S3_ENDPOINT_URL"] = (
+        f"http://{settings.minio_host}:{settings.minio_api_port}"
+    )
+
+    # Test if credentials are set correctly
+    boto3.client(
+        "s3",
+        endpoint_url=os.getenv("MLFLOW_S3_ENDPOINT_URL"),
+    )
+
+    return MlflowClient()
+
+
+class OnnxModel:
+    """
+    The exported model run by ONNX Runtime, with the `predict` and
+    `predict_proba` of the scikit-learn model it was converted from.
+    """
+
+    def __init__(self, model_path: str):
+        # Optional dependency, only needed with `ml_model_backend="onnxruntime"`
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        # Inputs are a handful of rows, more threads only add start-up cost
+        session_options.intra_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            model_path, session_options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.probabilities_name = self.session.get_outputs()[1].name
+        self.classes_ = np.array(
+            json.loads(self.session.get_modelmeta().custom_metadata_map["classes"])
+        )
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.session.run(
+            [self.probabilities_name],
+            {self.input_name: np.asarray(X, dtype=np.float32)},
+        )[0]
+
+    def predict(self, X) -> np.ndarray:
+        # As scikit-learn classifiers do, so labels keep the type they had
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+# Every loader reads the production bundle unless given the directory of
+# another one, e.g. a candidate model scored in shadow mode
+
+
+def get_sklearn_ml_model(artifacts_path: str | None = None) -> BaseEstimator:
+    """Load the trained ML model."""
+    artifacts_path = artifacts_path or settings.mlflow_model_artifacts_path
+    model_path = f"{artifacts_path}/model/model.pkl"
+    return joblib.load(model_path)
+
+
+@lru_cache(maxsize=4)
+def get_ml_model(artifacts_path: str | None = None) -> BaseEstimator | OnnxModel:
+    """
+    The model to predict with, loaded once per bundle. `ml_model_backend`
+    picks the scikit-learn model or its ONNX export, see `onnx_export.py`.
+    """
+    if settings.ml_model_backend == "onnxruntime":
+        artifacts_path = artifacts_path or settings.mlflow_model_artifacts_path
+        return OnnxModel(f"{artifacts_path}/model/model.onnx")
+
+    return get_sklearn_ml_model(artifacts_path)
+
+
+def get_scalers(artifacts_path: str | None = None) -> BaseEstimator:
+    """Load the trained ML model."""
+    artifacts_path = artifacts_path or settings.mlflow_model_artifacts_path
+    minmax_scaler_path = f"{artifacts_path}/scalers/minmax_scaler.pkl"
+    return joblib.load(minmax_scaler_path)
+
+
+def get_encoders(
+    artifacts_path: str | None = None,
+) -> Tuple[OneHotEncoder, OrdinalEncoder]:
+    """Load the one-hot and ordinal encoders."""
+    artifacts_path = artifacts_path or settings.mlflow_model_artifacts_path
+    encoders_path = f"{artifacts_path}/encoders"
+    one_hot_encoder = joblib.load(f"{encoders_path}/one_hot_encoder.pkl")
+    ordinal_encoder = joblib.load(f"{encoders_path}/ordinal_encoder.pkl")
+    return one_hot_encoder, ordinal_encoder
+
+
+def get_column_metadata(artifacts_path: str | None = None) -> dict:
+    """Return list of categorical fields used for encoding."""
+    """Load the one-hot and ordinal encoders."""
+    artifacts_path = artifacts_path or settings.mlflow_model_artifacts_path
+    column_metadata_path = f"{artifacts_path}/metadata/model_columns.json"
+    with open(column_metadata_path, "r") as f:
+        column_metadata = json.load(f)
+
+    categorical_columns = column_metadata["categorical_columns"]
+    numerical_columns = column_metadata["numerical_columns"]
+    date_columns = column_metadata["date_columns"]
+    boolean_columns = column_metadata["boolean_columns"]
+    prediction_columns = column_metadata["prediction_columns"]
+    columns_to_drop = column_metadata["columns_to_drop"]
+
+    return {
+        "categorical_columns": categorical_columns,
+        "numerical_columns": numerical_columns,
+        "date_columns": date_columns,
+        "boolean_columns": boolean_columns,
+        "prediction_columns": prediction_columns,
+        "columns_to_drop": columns_to_drop,
+    }
+
+
+def get_served_ml_model_id(artifacts_path: str | None = None) -> str:
+    """
+    The id assessments made with the bundle are tagged with, the version it
+    was downloaded as. Bundles downloaded before it was recorded fall back to
+    `DEFAULT_ML_MODEL_ID`.
+    """
+    artifacts_path = artifacts_path or settings.mlflow_model_artifacts_path
+    try:
+        with open(f"{artifacts_path}/{ML_MODEL_ID_FILENAME}", "r") as f:
+            return f.read().strip() or DEFAULT_ML_MODEL_ID
+    except FileNotFoundError:
+        return DEFAULT_ML_MODEL_ID
+
+
+def is_scorable(adr) -> bool:
+    """
+    Whether the model can assess an ADR. It needs a suspected drug and a
+    known rechallenge or dechallenge, otherwise the ADR is unclassified.
+    """
+    return not (
+        (
+            adr.rifampicin_suspected is None
+            and adr.isoniazid_suspected is None
+            and adr.pyrazinamide_suspected is None
+            and adr.ethambutol_suspected is None
+        )
+        or (
+            adr.rechallenge is RechallengeEnum.unknown
+            and adr.dechallenge is DechallengeEnum.unknown
+        )
+    )
+
+
+def get_explainer_background(
+    artifacts_path: str | None = None, data_path: str = "data.csv"
+) -> DenseData:
+    """
+    The reference data summarised into `EXPLAINER_BACKGROUND_SIZE` clusters.
+
+    The summary is saved in the bundle, so only the first process to start
+    prepares and clusters the reference data, the others wait for it and
+    load it. It is rebuilt when the reference data changes.
+    """
+    artifacts_path = artifacts_path or settings.mlflow_model_artifacts_path
+    background_path = f"{artifacts_path}/explainer/background.npz"
+
+    with open(data_path, "rb") as f:
+        data_digest = hashlib.sha256(f.read()).hexdigest()
+
+    os.makedirs(os.path.dirname(background_path), exist_ok=True)
+
+    with open(f"{background_path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        if os.path.exists(background_path):
+            with np.load(background_path) as background:
+                if str(background["data_digest"]) == data_digest:
+                    return DenseData(
+                        background["data"],
+                        background["feature_names"].tolist(),
+                        None,
+                        background["weights"],
+                    )
+
+        final_input_df = input_to_prediction_format(
+            pd.read_csv(data_path), artifacts_path=artifacts_path
+        )
+        background = shap.kmeans(final_input_df, EXPLAINER_BACKGROUND_SIZE)
+
+        # Written aside and renamed so a crash never leaves a partial file
+        with open(f"{background_path}.tmp", "wb") as f:
+            np.savez(
+                f,
+                data=background.data,
+                weights=background.weights,
+                feature_names=np.array(final_input_df.columns, dtype=str),
+                data_digest=data_digest,
+            )
+        os.replace(f"{background_path}.tmp", background_path)
+
+        return background
+
+
+def build_explainer(
+    ml_model: BaseEstimator, artifacts_path: str | None = None
+) -> KernelExplainer:
+    """SHAP explainer over the summarised reference data."""
+    return shap.KernelExplainer(
+        ml_model.predict_proba, get_explainer_background(artifacts_path)
+    )
+
+
+def input_to_prediction_format(
+    input_df: pd.DataFrame,
+    impute_missing_age: bool = True,
+    artifacts_path: str | None = None,
+) -> pd.DataFrame:
+    """
+    This function returns for a proper dataframe for the ML model and SHAP model
+
+    With `impute_missing_age` unknown ages take the median age of the batch.
+    Batches of unrelated ADRs pass False so that each ADR is prepared as it
+    would be on its own, where a missing age is filled with -1.
+    """
+
+    column_metadata = get_column_metadata(artifacts_path)
+
+    categorical_columns = column_metadata["categorical_columns"]
+    numerical_columns = column_metadata["numerical_columns"]
+    date_columns = column_metadata["date_columns"]
+    boolean_columns = column_metadata["boolean_columns"]
+    prediction_columns = column_metadata["prediction_columns"]
+    columns_to_drop = column_metadata["columns_to_drop"]
+
+    # Create all the columns not originally in dataset
+    ## Num suspected drugs
+    input_df["num_suspected_drugs"] = input_df[boolean_columns].sum(axis=1)
+
+    for column in categorical_columns:
+        input_df[column] = input_df[column].astype("category")
+
+    ## Patient Age and Patient Date of Birth
+    date_columns_without_created_at = date_columns
+    date_columns_without_created_at.remove("created_at")
+
+    for column in date_columns:
+        input_df[column] = pd.to_datetime(input_df[column], errors="coerce")
+
+    today = pd.to_datetime("today")
+
+    missing_age_mask = (
+        input_df["patient_age"].isnull() & input_df["patient_date_of_birth"].notnull()
+    )
+
+    input_df.loc[missing_age_mask, "patient_age"] = (
+        today - input_df.loc[missing_age_mask, "patient_date_of_birth"]
+    ).dt.days // 365
+
+    if impute_missing_age:
+        input_df["patient_age"] = input_df["patient_age"].fillna(
+            input_df["patient_age"].median()
+        )
+
+    ## Patient BMI
+    input_df["patient_bmi"] = input_df["patient_weight_kg"] / (
+        input_df["patient_height_cm"] * input_df["patient_height_cm"]
+    )
+
+    ## Drug columns
+    drug_names = ["rifampicin", "isoniazid", "pyrazinamide", "ethambutol"]
+
+    for drug in drug_names:
+        start_col = f"{drug}_start_to_onset_days"
+        stop_col = f"{drug}_stop_to_onset_days"
+        start_stop_col = f"{drug}_start_stop_difference"
+
+        input_df[start_col] = (
+            input_df["date_of_onset_of_reaction"] - input_df[f"{drug}_start_date"]
+        ).dt.days
+        input_df[stop_col] = (
+            input_df["date_of_onset_of_reaction"] - input_df[f"{drug}_stop_date"]
+        ).dt.days
+        input_df[start_stop_col] = (
+            input_df[f"{drug}_stop_date"] - input_df[f"{drug}_start_date"]
+        ).dt.days
+
+    # Drop date columns
+    input_df = input_df.drop(columns=date_columns)
+
+    input_df = input_df.drop(columns=columns_to_drop)
+
+    # Fill null valuea
+    input_df[numerical_columns] = input_df[numerical_columns].fillna(-1)
+
+    # Scale numerical columns
+    minmax_scaler = get_scalers(artifacts_path)
+    scaled_numericals = minmax_scaler.transform(input_df[numerical_columns])
+    scaled_numericals_df = pd.DataFrame(scaled_numericals, columns=numerical_columns)
+
+    # Encode categorical columns
+
+    one_hot_encoder, _ = get_encoders(artifacts_path)
+
+    cat_encoded = one_hot_encoder.transform(input_df[categorical_columns])
+    cat_encoded_df = pd.DataFrame(
+        cat_encoded, columns=one_hot_encoder.get_feature_names_out(categorical_columns)
+    )
+
+    # Merge all features
+    final_input_df = pd.concat(
+        [
+            cat_encoded_df,
+            input_df[boolean_columns].reset_index(drop=True),
+            scaled_numericals_df,
+        ],
+        axis=1,
+    )
+
+    # Reorder to match training time
+    final_input_df = final_input_df[prediction_columns]
+
+    return final_input_df
+
+
+def get_shap_values(shap_values: Explainer):
+    base_values = list(shap_values.base_values[0])
+    shap_values_matrix = shap_values.values[0].tolist()
+    shap_values_sum_per_class = np.sum(shap_values.values[0], axis=0).tolist()
+    shap_values_and_base_values_sum_per_class = list(
+        np.sum(shap_values.values[0], axis=0) + shap_values.base_values[0]
+    )
+
+    return {
+        "base_values": base_values,
+        "shap_values_matrix": shap_values_matrix,
+        "shap_values_sum_per_class": shap_values_sum_per_class,
+        "shap_values_and_base_values_sum_per_class": shap_values_and_base_values_sum_per_class,
+    }
+
+
+def get_feature_value_scaling(
+    prediction_columns: Tuple[str, ...], artifacts_path: str | None = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Where each prediction column sits in the min-max scaler, which only covers
+    the numerical columns. Returns the columns' `min_` and `scale_` (NaN for
+    columns that are not scaled) and the mask of scaled columns.
+
+    Cached per bundle and per modification time of its scaler and column
+    metadata, so a bundle downloaded again over the old one is picked up.
+    """
+    artifacts_path = artifacts_path or settings.mlflow_model_artifacts_path
+
+    return load_feature_value_scaling(
+        prediction_columns,
+        artifacts_path,
+        os.path.getmtime(f"{artifacts_path}/scalers/minmax_scaler.pkl"),
+        os.path.getmtime(f"{artifacts_path}/metadata/model_columns.json"),
+    )
+
+
+@lru_cache(maxsize=8)
+def load_feature_value_scaling(
+    prediction_columns: Tuple[str, ...],
+    artifacts_path: str,
+    scaler_mtime: float,
+    column_metadata_mtime: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    minmax_scaler = get_scalers(artifacts_path)
+    numerical_columns = get_column_metadata(artifacts_path)["numerical_columns"]
+    scaler_indices = {column: i for i, column in enumerate(numerical_columns)}
+
+    scaled_mask = np.array([column in scaler_indices for column in prediction_columns])
+    scaler_min = np.full(len(prediction_columns), np.nan)
+    scaler_scale = np.full(len(prediction_columns), np.nan)
+
+    for i, column in enumerate(prediction_columns):
+        if column in scaler_indices:
+            scaler_min[i] = minmax_scaler.min_[scaler_indices[column]]
+            scaler_scale[i] = minmax_scaler.scale_[scaler_indices[column]]
+
+    return scaler_min, scaler_scale, scaled_mask
+
+
+def format_feature_values_batch(prediction_input: pd.DataFrame) -> List[List[any]]:
+    """
+    Readable values of a batch of model inputs, one list per row: scaled
+    numerical columns are unscaled and rounded, with the -1 fill value as None,
+    and 0/1 in the other columns become False/True.
+    """
+    scaler_min, scaler_scale, scaled_mask = get_feature_value_scaling(
+        tuple(prediction_input.columns)
+    )
+    values = prediction_input.to_numpy()
+    formatted_values = values.astype(object)
+
+    # Logical encoding of the one-hot and boolean columns
+    logical_values = values[:, ~scaled_mask]
+    formatted_logical_values = formatted_values[:, ~scaled_mask]
+    formatted_logical_values[logical_values == 0] = False
+    formatted_logical_values[logical_values == 1] = True
+    formatted_values[:, ~scaled_mask] = formatted_logical_values
+
+    # Inverse of MinMaxScaler.transform, X = (X_scaled - min_) / scale_
+    unscaled_values = np.rint(
+        (values[:, scaled_mask].astype(np.float64) - scaler_min[scaled_mask])
+        / scaler_scale[scaled_mask]
+    )
+    unscaled_value_is_missing = (unscaled_values == -1) | ~np.isfinite(unscaled_values)
+    unscaled_integers = np.where(unscaled_value_is_missing, 0, unscaled_values)
+    formatted_unscaled_values = np.array(
+        unscaled_integers.astype(np.int64).tolist(), dtype=object
+    ).reshape(unscaled_values.shape)
+    formatted_unscaled_values[unscaled_value_is_missing] = None
+    formatted_values[:, scaled_mask] = formatted_unscaled_values
+
+    return formatted_values.tolist()
+
+
+def format_feature_values(prediction_input: pd.DataFrame) -> List[any]:
+    """Readable values of a single model input."""
+    return format_feature_values_batch(prediction_input.iloc[:1])[0]
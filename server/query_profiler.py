@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import datetime
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+from config import settings
+from engines import engine
+from sqlalchemy import event
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Statements of the current request, set by `profile_slow_requests`
+request_statements: contextvars.ContextVar[List[Dict] | None] = contextvars.ContextVar(
+    "request_statements", default=None
+)
+
+
+def get_parameters_shape(parameters, executemany: bool) -> List[int]:
+    """[rows, parameters per row] for executemany, else [parameters]."""
+    if executemany:
+        return [len(parameters), len(parameters[0]) if parameters else 0]
+    return [len(parameters) if parameters else 0]
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if request_statements.get() is not None:
+        conn.info.setdefault("profiled_query_started_at", []).append(
+            time.perf_counter()
+        )
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements = request_statements.get()
+    if statements is None or not conn.info.get("profiled_query_started_at"):
+        return
+
+    duration_ms = (
+        time.perf_counter() - conn.info["profiled_query_started_at"].pop()
+    ) * 1000
+
+    statements.append(
+        {
+            "statement": WHITESPACE_PATTERN.sub(" ", statement).strip(),
+            "duration_ms": duration_ms,
+            "parameters_shape": get_parameters_shape(parameters, executemany),
+            # SQLite only reports rows written, SELECTs report -1
+            "row_count": cursor.rowcount if cursor.rowcount >= 0 else None,
+            # Kept to explain the slowest statement, never logged or returned
+            "parameters": parameters[0] if executemany and parameters else parameters,
+        }
+    )
+
+
+def handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("profiled_query_started_at"):
+        connection.info["profiled_query_started_at"].pop()
+
+
+def explain_query_plan(statement: str, parameters) -> List[str]:
+    with engine.connect() as connection:
+        return [
+            row.detail
+            for row in connection.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            )
+        ]
+
+
+class SlowRequestLog:
+    """
+    The most recent requests slower than `threshold_ms`, with every SQL
+    statement they executed and the query plan of the slowest one.
+    """
+
+    def __init__(self, threshold_ms: float | None = None, max_entries: int = 50):
+        self.threshold_ms = threshold_ms
+        self.entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms is not None
+
+    def add(self, entry: Dict):
+        with self._lock:
+            self.entries.append(entry)
+
+    def to_list(self) -> List[Dict]:
+        """Most recent first."""
+        with self._lock:
+            return list(reversed(self.entries))
+
+
+slow_request_log = SlowRequestLog(
+    settings.slow_request_threshold_ms, settings.slow_request_log_size
+)
+
+
+async def profile_slow_requests(request, call_next):
+    """HTTP middleware recording the SQL of requests over the threshold."""
+    statements = []
+    token = request_statements.set(statements)
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    started_perf_counter = time.perf_counter()
+    status_code = 500
+
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        duration_ms = (time.perf_counter() - started_perf_counter) * 1000
+        request_statements.reset(token)
+
+        if duration_ms >= slow_request_log.threshold_ms:
+            await record_slow_request(
+                request, status_code, started_at, duration_ms, list(statements)
+            )
+
+
+async def record_slow_request(
+    request,
+    status_code: int,
+    started_at: datetime.datetime,
+    duration_ms: float,
+    statements: List[Dict],
+):
+    route = request.scope.get("route")
+    slowest_statement_index = max(
+        range(len(statements)),
+        key=lambda i: statements[i]["duration_ms"],
+        default=None,
+    )
+
+    query_plan = None
+    if slowest_statement_index is not None:
+        slowest_statement = statements[slowest_statement_index]
+        try:
+            query_plan = await asyncio.to_thread(
+                explain_query_plan,
+                slowest_statement["statement"],
+                slowest_statement["parameters"],
+            )
+        except Exception as e:
+            query_plan = [f"EXPLAIN QUERY PLAN failed: {e}"]
+
+    statements = [
+        {key: value for key, value in statement.items() if key != "parameters"}
+        for statement in statements
+    ]
+
+    entry = {
+        "method": request.method,
+        "path": request.url.path,
+        "route": route.path if route is not None else None,
+        "status_code": status_code,
+        "started_at": started_at,
+        "duration_ms": duration_ms,
+        "statement_count": len(statements),
+        "statement_duration_ms": sum(
+            statement["duration_ms"] for statement in statements
+        ),
+        "statements": statements,
+        "slowest_statement_index": slowest_statement_index,
+        "slowest_statement_query_plan": query_plan,
+    }
+    slow_request_log.add(entry)
+
+    logging.warning(
+        f"Slow request {entry['method']} {entry['path']} took "
+        f"{duration_ms:.0f} ms, {entry['statement_count']} SQL statements in "
+        f"{entry['statement_duration_ms']:.0f} ms"
+        + "".join(
+            f"\n  {statement['duration_ms']:8.2f} ms "
+            f"params {statement['parameters_shape']} "
+            f"rows {statement['row_count']}: {statement['statement']}"
+            for statement in statements
+        )
+        + (
+            "\n  Query plan of the slowest statement:\n    " + "\n    ".join(query_plan)
+            if query_plan
+            else ""
+        )
+    )
+
+
+if slow_request_log.enabled:
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
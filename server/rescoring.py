@@ -0,0 +1,310 @@
+"""
+Re-score every ADR with the model whose artifacts are in
+`settings.mlflow_model_artifacts_path`, e.g. after promoting a new version.
+
+Each ADR gets a new causality assessment tagged with `--ml-model-id`, found
+through that id. The ADR's current assessment, its first one, and the review
+tallies on it are left as they are. Feature preparation, prediction and SHAP run
+on whole batches across a process pool. Progress is stored in
+`rescoring_job`, so running the same command again after a crash resumes
+after the last completed chunk.
+
+    cd server && python -m rescoring --ml-model-id final_ml_model/7 --workers 4
+"""
+
+import argparse
+import datetime
+import logging
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from basemodels import (
+    ADRDetailResponse,
+    CausalityAssessmentLevelEnum,
+    RescoringJobStatusEnum,
+)
+from config import settings
+from engines import engine
+from models import (
+    ADRModel,
+    Base,
+    CausalityAssessmentLevelModel,
+    RescoringJobModel,
+    ShapContributionModel,
+)
+from prediction import (
+    build_explainer,
+    format_feature_values_batch,
+    get_encoders,
+    get_ml_model,
+    get_served_ml_model_id,
+    input_to_prediction_format,
+    is_scorable,
+)
+from sessions import Session as SessionLocal
+from shap_storage import (
+    encode_shap_values_matrix,
+    get_class_values,
+    get_top_shap_contributions,
+    save_feature_name_set,
+)
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+# Loaded once per worker process by `init_scoring_worker`
+worker_ml_model = None
+worker_ordinal_encoder = None
+worker_explainer = None
+
+
+def init_scoring_worker():
+    global worker_ml_model, worker_ordinal_encoder, worker_explainer
+
+    worker_ml_model = get_ml_model()
+    _, worker_ordinal_encoder = get_encoders()
+    worker_explainer = build_explainer(worker_ml_model)
+
+
+def score_adrs(adr_records: List[Dict]) -> Dict:
+    """Predict and explain a batch of ADRs in one pass, in a worker process."""
+    prediction_input = input_to_prediction_format(
+        pd.DataFrame(adr_records), impute_missing_age=False
+    )
+
+    prediction = worker_ml_model.predict(prediction_input)
+    decoded_predictions = worker_ordinal_encoder.inverse_transform(
+        prediction.reshape(-1, 1)
+    )[:, 0]
+
+    shap_values = worker_explainer(prediction_input)
+
+    return {
+        "causality_assessment_level_values": decoded_predictions.tolist(),
+        "base_values": np.asarray(shap_values.base_values),
+        "shap_values": np.asarray(shap_values.values),
+        "feature_names": prediction_input.columns.tolist(),
+        "feature_values": format_feature_values_batch(prediction_input),
+        "class_values": get_class_values(worker_ordinal_encoder),
+    }
+
+
+def score_chunk(
+    db: Session,
+    executor: Executor,
+    workers: int,
+    adrs: List[ADRModel],
+    ml_model_id: str,
+) -> tuple[List[Dict], List[Dict]]:
+    """
+    New `causality_assessment_level` and `shap_contribution` rows for a chunk
+    of ADRs, split into one batch per worker.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    causality_rows = []
+    contribution_rows = []
+
+    def add_causality_row(adr_id: str, value: CausalityAssessmentLevelEnum, **fields):
+        causality_rows.append(
+            {
+                "id": str(uuid.uuid4()),
+                "adr_id": adr_id,
+                "ml_model_id": ml_model_id,
+                "causality_assessment_level_value": value,
+                "base_values": None,
+                "shap_values_blob": None,
+                "shap_values_sum_per_class": None,
+                "shap_values_and_base_values_sum_per_class": None,
+                "feature_name_set_id": None,
+                "feature_values": None,
+                "approved_count": 0,
+                "unapproved_count": 0,
+                "created_at": now,
+                "updated_at": now,
+                **fields,
+            }
+        )
+
+    scorable_adrs = []
+    for adr in adrs:
+        if is_scorable(adr):
+            scorable_adrs.append(adr)
+        else:
+            add_causality_row(adr.id, CausalityAssessmentLevelEnum.unclassified)
+
+    adr_batches = [
+        batch for batch in (scorable_adrs[i::workers] for i in range(workers)) if batch
+    ]
+    adr_record_batches = [
+        [ADRDetailResponse.model_validate(adr).model_dump() for adr in batch]
+        for batch in adr_batches
+    ]
+
+    for batch, scores in zip(adr_batches, executor.map(score_adrs, adr_record_batches)):
+        feature_names = scores["feature_names"]
+        feature_name_set_id = save_feature_name_set(db, ml_model_id, feature_names)
+
+        for i, adr in enumerate(batch):
+            base_values = scores["base_values"][i]
+            shap_values = scores["shap_values"][i]
+            shap_values_sum_per_class = shap_values.sum(axis=0)
+
+            add_causality_row(
+                adr.id,
+                CausalityAssessmentLevelEnum(
+                    scores["causality_assessment_level_values"][i]
+                ),
+                base_values=base_values.tolist(),
+                shap_values_blob=encode_shap_values_matrix(shap_values),
+                shap_values_sum_per_class=shap_values_sum_per_class.tolist(),
+                shap_values_and_base_values_sum_per_class=(
+                    shap_values_sum_per_class + base_values
+                ).tolist(),
+                feature_name_set_id=feature_name_set_id,
+                feature_values=scores["feature_values"][i],
+            )
+
+            contribution_rows.extend(
+                {
+                    "id": str(uuid.uuid4()),
+                    "causality_assessment_level_id": causality_rows[-1]["id"],
+                    "created_at": now,
+                    "updated_at": now,
+                    **contribution,
+                }
+                for contribution in get_top_shap_contributions(
+                    shap_values,
+                    feature_names,
+                    scores["class_values"],
+                    settings.shap_top_k,
+                )
+            )
+
+    return causality_rows, contribution_rows
+
+
+def run_rescoring_job(ml_model_id: str, chunk_size: int = 200, workers: int = 2):
+    with SessionLocal() as db:
+        job = (
+            db.query(RescoringJobModel)
+            .filter(RescoringJobModel.ml_model_id == ml_model_id)
+            .first()
+        )
+
+        if job is None:
+            job = RescoringJobModel(ml_model_id=ml_model_id, last_adr_id="")
+            db.add(job)
+        elif job.status == RescoringJobStatusEnum.completed:
+            logging.info(f"Re-scoring with {ml_model_id} already completed")
+            return
+
+        job.status = RescoringJobStatusEnum.running
+        job.started_at = datetime.datetime.now(datetime.timezone.utc)
+        job.finished_at = None
+        job.last_error = None
+        job.total_count = db.query(ADRModel).count()
+        db.commit()
+
+        logging.info(
+            f"Re-scoring {job.total_count} ADRs with {ml_model_id}, "
+            f"{job.processed_count} done"
+        )
+
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=init_scoring_worker
+            ) as executor:
+                while True:
+                    started_at = time.perf_counter()
+
+                    adrs = (
+                        db.query(ADRModel)
+                        .filter(ADRModel.id > job.last_adr_id)
+                        .order_by(ADRModel.id)
+                        .limit(chunk_size)
+                        .all()
+                    )
+
+                    if not adrs:
+                        break
+
+                    # ADRs already scored by this model, e.g. by an earlier
+                    # run of a job that was deleted
+                    scored_adr_ids = {
+                        adr_id
+                        for (adr_id,) in db.query(
+                            CausalityAssessmentLevelModel.adr_id
+                        ).filter(
+                            CausalityAssessmentLevelModel.ml_model_id == ml_model_id,
+                            CausalityAssessmentLevelModel.adr_id.in_(
+                                [adr.id for adr in adrs]
+                            ),
+                        )
+                    }
+
+                    causality_rows, contribution_rows = score_chunk(
+                        db,
+                        executor,
+                        workers,
+                        [adr for adr in adrs if adr.id not in scored_adr_ids],
+                        ml_model_id,
+                    )
+
+                    # The chunk's assessments and the job's position are
+                    # committed together, a crash loses at most this chunk
+                    if causality_rows:
+                        db.execute(
+                            insert(CausalityAssessmentLevelModel.__table__),
+                            causality_rows,
+                        )
+                    if contribution_rows:
+                        db.execute(
+                            insert(ShapContributionModel.__table__), contribution_rows
+                        )
+
+                    job.last_adr_id = adrs[-1].id
+                    job.processed_count += len(adrs)
+                    job.scored_count += len(causality_rows)
+                    job.elapsed_seconds += time.perf_counter() - started_at
+                    db.commit()
+
+                    logging.info(
+                        f"Re-scored {job.processed_count}/{job.total_count} ADRs "
+                        f"({job.adrs_per_second:.1f} ADRs/s)"
+                    )
+        except Exception as e:
+            db.rollback()
+            job.status = RescoringJobStatusEnum.failed
+            job.last_error = str(e)
+            db.commit()
+            raise
+
+        job.status = RescoringJobStatusEnum.completed
+        job.finished_at = datetime.datetime.now(datetime.timezone.utc)
+        db.commit()
+
+        logging.info(
+            f"Re-scoring with {ml_model_id} completed: {job.scored_count} new "
+            f"assessments in {job.elapsed_seconds:.1f} s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    # Defaults to the version the bundle was downloaded as
+    parser.add_argument("--ml-model-id", default=get_served_ml_model_id())
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(engine)
+
+    run_rescoring_job(args.ml_model_id, args.chunk_size, args.workers)
+
+
+if __name__ == "__main__":
+    main()
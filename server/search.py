@@ -0,0 +1,196 @@
+import json
+import logging
+
+from sqlalchemy import column, inspect, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Trigram tokens need at least 3 characters to match anything
+MIN_TRIGRAM_LENGTH = 3
+
+SEARCH_INDEXES = {
+    "adr_search": {
+        "content_table": "adr",
+        "columns": [
+            "patient_name",
+            "inpatient_or_outpatient_number",
+            "patient_address",
+            "ward_or_clinic",
+        ],
+    },
+    "medical_institution_search": {
+        "content_table": "medical_institution",
+        "columns": ["name", "mfl_code", "county", "sub_county"],
+    },
+}
+
+adr_search = table("adr_search", column("rowid"), column("rank"))
+medical_institution_search = table(
+    "medical_institution_search", column("rowid"), column("rank")
+)
+
+
+def create_search_indexes(engine: Engine):
+    """
+    Create the FTS5 trigram indexes and the triggers that keep them in sync
+    with their content tables. Newly created indexes are built from the
+    existing rows.
+    """
+    existing_tables = inspect(engine).get_table_names()
+
+    with engine.begin() as connection:
+        for search_table, index in SEARCH_INDEXES.items():
+            content_table = index["content_table"]
+            columns = ", ".join(index["columns"])
+            new_columns = ", ".join(f"new.{c}" for c in index["columns"])
+            old_columns = ", ".join(f"old.{c}" for c in index["columns"])
+
+            connection.execute(
+                text(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {search_table} USING fts5(
+                    {columns},
+                    content='{content_table}',
+                    content_rowid='rowid',
+                    tokenize='trigram'
+                )
+                """)
+            )
+
+            connection.execute(
+                text(f"""
+                CREATE TRIGGER IF NOT EXISTS {search_table}_insert
+                AFTER INSERT ON {content_table} BEGIN
+                    INSERT INTO {search_table}(rowid, {columns})
+                    VALUES (new.rowid, {new_columns});
+                END
+                """)
+            )
+
+            connection.execute(
+                text(f"""
+                CREATE TRIGGER IF NOT EXISTS {search_table}_delete
+                AFTER DELETE ON {content_table} BEGIN
+                    INSERT INTO {search_table}({search_table}, rowid, {columns})
+                    VALUES ('delete', old.rowid, {old_columns});
+                END
+                """)
+            )
+
+            connection.execute(
+                text(f"""
+                CREATE TRIGGER IF NOT EXISTS {search_table}_update
+                AFTER UPDATE ON {content_table} BEGIN
+                    INSERT INTO {search_table}({search_table}, rowid, {columns})
+                    VALUES ('delete', old.rowid, {old_columns});
+                    INSERT INTO {search_table}(rowid, {columns})
+                    VALUES (new.rowid, {new_columns});
+                END
+                """)
+            )
+
+            if search_table not in existing_tables:
+                connection.execute(
+                    text(
+                        f"INSERT INTO {search_table}({search_table}) VALUES ('rebuild')"
+                    )
+                )
+                logging.info(f"Built search index {search_table}")
+
+
+def _quote(token: str) -> str:
+    return '"' + token.replace('"', '""') + '"'
+
+
+def build_match_expression(query: str, fuzzy: bool = False) -> str | None:
+    """
+    Turn a user query into an FTS5 MATCH expression.
+
+    Strict expressions require every term as a substring (which covers prefix
+    matches). Fuzzy expressions match any trigram of the terms and rely on
+    bm25 ranking to put the closest rows first. Terms too short for the
+    trigram index are left out, see `get_short_terms`.
+    """
+    terms = [
+        term for term in query.lower().split() if len(term) >= MIN_TRIGRAM_LENGTH
+    ]
+
+    if not terms:
+        return None
+
+    if not fuzzy:
+        return " ".join(_quote(term) for term in terms)
+
+    trigrams = {
+        term[i : i + MIN_TRIGRAM_LENGTH]
+        for term in terms
+        for i in range(len(term) - MIN_TRIGRAM_LENGTH + 1)
+    }
+    return " OR ".join(_quote(trigram) for trigram in sorted(trigrams))
+
+
+def get_short_terms(query: str) -> str | None:
+    """
+    The terms too short for the trigram index, e.g. "ol" in "Ol Kalou", as a
+    JSON list of LIKE patterns for `get_short_terms_condition`.
+    """
+    terms = [
+        term for term in query.lower().split() if len(term) < MIN_TRIGRAM_LENGTH
+    ]
+
+    if not terms:
+        return None
+
+    return json.dumps(
+        [
+            "%"
+            + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            + "%"
+            for term in terms
+        ]
+    )
+
+
+def get_short_terms_condition(search_table: str, alias: str) -> str:
+    """
+    SQL condition on the rows of `alias` for the `search_short_terms`
+    parameter: every short term is a substring of one of the columns
+    `search_table` indexes. These terms cannot use the index, so the condition
+    scans the rows the rest of the query selects.
+    """
+    columns = " || ' ' || ".join(
+        f"COALESCE({alias}.{column}, '')"
+        for column in SEARCH_INDEXES[search_table]["columns"]
+    )
+
+    return f"""(:search_short_terms IS NULL OR NOT EXISTS (
+        SELECT 1 FROM json_each(:search_short_terms) short_term
+        WHERE {columns} NOT LIKE short_term.value ESCAPE '\\'
+    ))"""
+
+
+def get_search_params(db: Session, search_table: str, query: str) -> dict:
+    """
+    Resolve a search query into the `search` and `search_short_terms`
+    parameters used by the listing queries.
+
+    `search` is a strict MATCH expression, or a fuzzy one when the strict
+    expression finds nothing. Terms too short for the trigram index are kept
+    in `search_short_terms`, see `get_short_terms_condition`.
+    """
+    query = query.strip()
+    short_terms = get_short_terms(query)
+
+    match_expression = build_match_expression(query)
+
+    if match_expression is None:
+        return {"search": None, "search_short_terms": short_terms}
+
+    has_match = db.execute(
+        text(f"SELECT 1 FROM {search_table} WHERE {search_table} MATCH :search LIMIT 1"),
+        {"search": match_expression},
+    ).first()
+
+    if not has_match:
+        match_expression = build_match_expression(query, fuzzy=True)
+
+    return {"search": match_expression, "search_short_terms": short_terms}
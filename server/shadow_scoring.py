@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Dict
+
+import pandas as pd
+from basemodels import CausalityAssessmentLevelEnum
+from config import settings
+from models import ShadowPredictionModel
+from prediction import (
+    get_encoders,
+    get_ml_model,
+    get_served_ml_model_id,
+    input_to_prediction_format,
+)
+from sessions import Session as SessionLocal
+
+# Loaded once per worker process by `init_shadow_worker`
+worker_artifacts_path = None
+worker_ml_model = None
+worker_ordinal_encoder = None
+
+
+def init_shadow_worker(artifacts_path: str):
+    global worker_artifacts_path, worker_ml_model, worker_ordinal_encoder
+
+    worker_artifacts_path = artifacts_path
+    worker_ml_model = get_ml_model(artifacts_path)
+    _, worker_ordinal_encoder = get_encoders(artifacts_path)
+
+
+def score_adr(adr_record: Dict) -> tuple[str, float]:
+    """Candidate prediction for an ADR and its latency in ms, in a worker process."""
+    started_at = time.perf_counter()
+
+    prediction_input = input_to_prediction_format(
+        pd.DataFrame([adr_record]), artifacts_path=worker_artifacts_path
+    )
+    prediction = worker_ml_model.predict(prediction_input)
+    decoded_prediction = worker_ordinal_encoder.inverse_transform(
+        prediction.reshape(-1, 1)
+    )[0][0]
+
+    return decoded_prediction, (time.perf_counter() - started_at) * 1000
+
+
+class ShadowScorer:
+    """
+    Scores ADRs with a candidate model bundle next to production.
+
+    Candidates run in worker processes so they never compete with requests
+    for the GIL, and `submit` only queues the ADR. When `max_pending` ADRs
+    are waiting, new ones are dropped rather than queued without bound. If the
+    worker pool breaks, e.g. the candidate bundle cannot be loaded, shadow
+    scoring is disabled until the next restart.
+    """
+
+    def __init__(
+        self,
+        artifacts_path: str | None,
+        ml_model_id: str,
+        workers: int = 1,
+        max_pending: int = 100,
+    ):
+        self.artifacts_path = artifacts_path
+        self.ml_model_id = ml_model_id
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def start(self):
+        if self.artifacts_path is None:
+            return
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=init_shadow_worker,
+            initargs=(self.artifacts_path,),
+        )
+        # Workers start on demand, start them now rather than on a request
+        for _ in range(self.workers):
+            self._executor.submit(time.sleep, 0)
+        logging.info(f"Shadow scoring with {self.ml_model_id}")
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(
+        self,
+        adr_id: str,
+        adr_record: Dict,
+        production_value: CausalityAssessmentLevelEnum,
+        production_latency_ms: float,
+    ):
+        executor = self._executor
+        if executor is None:
+            return
+
+        with self._lock:
+            if self.pending >= self.max_pending:
+                logging.warning(f"Shadow scoring backlog full, skipping ADR {adr_id}")
+                return
+            self.pending += 1
+
+        try:
+            future = executor.submit(score_adr, adr_record)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            # The pool is broken, e.g. the candidate bundle failed to load in
+            # a worker, and would refuse every later ADR the same way
+            logging.exception(
+                f"Shadow scoring with {self.ml_model_id} failed, disabling it"
+            )
+            self.stop()
+            return
+
+        future.add_done_callback(
+            partial(self._record, adr_id, production_value, production_latency_ms)
+        )
+
+    def _record(
+        self,
+        adr_id: str,
+        production_value: CausalityAssessmentLevelEnum,
+        production_latency_ms: float,
+        future: Future,
+    ):
+        with self._lock:
+            self.pending -= 1
+
+        if future.cancelled():
+            return
+
+        shadow_prediction = ShadowPredictionModel(
+            adr_id=adr_id,
+            ml_model_id=self.ml_model_id,
+            production_ml_model_id=get_served_ml_model_id(),
+            production_value=production_value,
+            production_latency_ms=production_latency_ms,
+        )
+
+        try:
+            candidate_value, candidate_latency_ms = future.result()
+            shadow_prediction.candidate_value = CausalityAssessmentLevelEnum(
+                candidate_value
+            )
+            shadow_prediction.candidate_latency_ms = candidate_latency_ms
+        except Exception as e:
+            shadow_prediction.error = str(e) or type(e).__name__
+
+        try:
+            with SessionLocal() as db:
+                db.add(shadow_prediction)
+                db.commit()
+        except Exception:
+            logging.exception(f"Recording the shadow prediction of ADR {adr_id} failed")
+
+
+shadow_scorer = ShadowScorer(
+    settings.shadow_model_artifacts_path,
+    settings.shadow_ml_model_id,
+    workers=settings.shadow_scoring_workers,
+    max_pending=settings.shadow_scoring_max_pending,
+)
@@ -0,0 +1,269 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from basemodels import CausalityAssessmentLevelEnum
+from config import settings
+from metrics import record_cache_lookup
+from models import ADRModel, CausalityAssessmentLevelModel
+from shap_storage import SHAP_VALUES_DTYPE, get_feature_names
+from sqlalchemy import Select, func, literal_column, select
+from sqlalchemy.orm import Session
+
+# New assessments get a larger rowid, so it tells which ones a cached
+# aggregate has not seen yet. Assessments changed or deleted in place are
+# noticed through `updated_at` and the row count, see `ShapImportanceCache`
+CAUSALITY_ASSESSMENT_LEVEL_ROWID = literal_column("causality_assessment_level.rowid")
+
+
+class ShapImportanceAggregate:
+    """
+    Running sums of |SHAP| per feature and class, one matrix per feature name
+    set so assessments scored with different inputs are not mixed up.
+    """
+
+    def __init__(self):
+        self.abs_shap_sums: Dict[str, np.ndarray] = {}
+        self.assessment_counts: Dict[str, int] = {}
+        self.last_rowid = 0
+        # What the seen assessments looked like, to tell whether they changed
+        self.row_count = 0
+        self.last_updated_at = None
+        self.refreshed_at = time.monotonic()
+
+    def add(self, feature_name_set_id: str, shap_values: np.ndarray):
+        """Add a stack of n_assessments x n_features x n_classes matrices."""
+        abs_shap_sum = np.abs(shap_values).sum(axis=0, dtype=np.float64)
+
+        if feature_name_set_id in self.abs_shap_sums:
+            self.abs_shap_sums[feature_name_set_id] += abs_shap_sum
+        else:
+            self.abs_shap_sums[feature_name_set_id] = abs_shap_sum
+
+        self.assessment_counts[feature_name_set_id] = self.assessment_counts.get(
+            feature_name_set_id, 0
+        ) + len(shap_values)
+
+    def to_dict(
+        self,
+        db: Session,
+        class_values: List[CausalityAssessmentLevelEnum],
+        top_k: int | None = None,
+    ) -> Dict:
+        """
+        Mean |SHAP| per feature and class over every assessment, features
+        ordered by their mean over all classes, largest first. `class_values`
+        names the matrix columns, see `get_class_values`.
+        """
+        class_count = len(class_values)
+        abs_shap_sums_by_name: Dict[str, np.ndarray] = {}
+
+        for feature_name_set_id, abs_shap_sum in self.abs_shap_sums.items():
+            feature_names = get_feature_names(db, feature_name_set_id) or []
+
+            for feature_name, feature_abs_shap_sum in zip(feature_names, abs_shap_sum):
+                total = abs_shap_sums_by_name.setdefault(
+                    feature_name, np.zeros(class_count)
+                )
+                total[: len(feature_abs_shap_sum)] += feature_abs_shap_sum
+
+        assessment_count = sum(self.assessment_counts.values())
+        feature_names = list(abs_shap_sums_by_name)
+        mean_abs_shap_values = (
+            np.array([abs_shap_sums_by_name[name] for name in feature_names])
+            / assessment_count
+            if feature_names
+            else np.zeros((0, class_count))
+        )
+
+        overall_mean_abs_shap_values = mean_abs_shap_values.mean(axis=1)
+        feature_order = np.argsort(-overall_mean_abs_shap_values, kind="stable")[:top_k]
+
+        return {
+            "assessment_count": assessment_count,
+            "class_values": [value.value for value in class_values],
+            "feature_names": [feature_names[i] for i in feature_order],
+            "mean_abs_shap_values": mean_abs_shap_values[feature_order].tolist(),
+        }
+
+
+class ShapImportanceCache:
+    """
+    Population SHAP importance per filter, kept up to date incrementally.
+
+    A cached aggregate only reads the assessments added since it was last
+    used. Their sums cannot take back an assessment that was updated in place
+    or deleted, so the aggregate is rebuilt when the assessments it has seen
+    no longer have the same count and latest `updated_at`, whichever worker
+    wrote them. Writers in this process also `clear` the cache, and aggregates
+    older than `max_age_seconds` are rebuilt regardless.
+    """
+
+    def __init__(
+        self, max_age_seconds: int = 3600, max_entries: int = 64, chunk_size: int = 1000
+    ):
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self.chunk_size = chunk_size
+        self.aggregates: OrderedDict[Tuple, ShapImportanceAggregate] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        db: Session,
+        ml_model_id: str,
+        start_date=None,
+        end_date=None,
+        medical_institution_id: str | None = None,
+    ) -> ShapImportanceAggregate:
+        key = (ml_model_id, start_date, end_date, medical_institution_id)
+
+        with self._lock:
+            aggregate = self.aggregates.get(key)
+            if aggregate is not None:
+                self.aggregates.move_to_end(key)
+
+        hit = (
+            aggregate is not None
+            and time.monotonic() - aggregate.refreshed_at <= self.max_age_seconds
+            and not self._has_changed(db, aggregate, *key)
+        )
+        record_cache_lookup("shap_importance", hit)
+
+        if not hit:
+            aggregate = ShapImportanceAggregate()
+
+        # Work on a copy so concurrent readers never see a half-applied chunk
+        updated_aggregate = ShapImportanceAggregate()
+        updated_aggregate.abs_shap_sums = {
+            feature_name_set_id: abs_shap_sum.copy()
+            for feature_name_set_id, abs_shap_sum in aggregate.abs_shap_sums.items()
+        }
+        updated_aggregate.assessment_counts = dict(aggregate.assessment_counts)
+        updated_aggregate.last_rowid = aggregate.last_rowid
+        updated_aggregate.row_count = aggregate.row_count
+        updated_aggregate.last_updated_at = aggregate.last_updated_at
+        updated_aggregate.refreshed_at = aggregate.refreshed_at
+
+        self._accumulate(db, updated_aggregate, *key)
+
+        with self._lock:
+            self.aggregates[key] = updated_aggregate
+            self.aggregates.move_to_end(key)
+            while len(self.aggregates) > self.max_entries:
+                self.aggregates.popitem(last=False)
+
+        return updated_aggregate
+
+    def clear(self):
+        with self._lock:
+            self.aggregates.clear()
+
+    def _filter(
+        self,
+        statement: Select,
+        ml_model_id: str,
+        start_date,
+        end_date,
+        medical_institution_id: str | None,
+    ) -> Select:
+        """Restrict a statement to the assessments an aggregate covers."""
+        statement = statement.where(
+            CausalityAssessmentLevelModel.ml_model_id == ml_model_id,
+            CausalityAssessmentLevelModel.shap_values_blob.is_not(None),
+            CausalityAssessmentLevelModel.feature_name_set_id.is_not(None),
+        )
+
+        if start_date is not None:
+            statement = statement.where(
+                CausalityAssessmentLevelModel.created_at >= start_date
+            )
+        if end_date is not None:
+            statement = statement.where(
+                CausalityAssessmentLevelModel.created_at <= end_date
+            )
+        if medical_institution_id is not None:
+            statement = statement.join(
+                ADRModel, ADRModel.id == CausalityAssessmentLevelModel.adr_id
+            ).where(ADRModel.medical_institution_id == medical_institution_id)
+
+        return statement
+
+    def _has_changed(
+        self, db: Session, aggregate: ShapImportanceAggregate, *key
+    ) -> bool:
+        """Whether assessments the aggregate has seen were updated or deleted."""
+        row_count, last_updated_at = db.execute(
+            self._filter(
+                select(func.count(), func.max(CausalityAssessmentLevelModel.updated_at))
+                .select_from(CausalityAssessmentLevelModel)
+                .where(CAUSALITY_ASSESSMENT_LEVEL_ROWID <= aggregate.last_rowid),
+                *key,
+            )
+        ).one()
+
+        return (
+            row_count != aggregate.row_count
+            or last_updated_at != aggregate.last_updated_at
+        )
+
+    def _accumulate(
+        self,
+        db: Session,
+        aggregate: ShapImportanceAggregate,
+        ml_model_id: str,
+        start_date,
+        end_date,
+        medical_institution_id: str | None,
+    ):
+        """Stream the assessments the aggregate has not seen, a chunk at a time."""
+        statement = self._filter(
+            select(
+                CAUSALITY_ASSESSMENT_LEVEL_ROWID,
+                CausalityAssessmentLevelModel.updated_at,
+                CausalityAssessmentLevelModel.shap_values_blob,
+                CausalityAssessmentLevelModel.feature_name_set_id,
+            )
+            .where(CAUSALITY_ASSESSMENT_LEVEL_ROWID > aggregate.last_rowid)
+            .execution_options(yield_per=self.chunk_size),
+            ml_model_id,
+            start_date,
+            end_date,
+            medical_institution_id,
+        )
+
+        for rows in db.execute(statement).partitions():
+            blobs_by_feature_name_set_id: Dict[str, List[bytes]] = {}
+
+            for rowid, updated_at, shap_values_blob, feature_name_set_id in rows:
+                blobs_by_feature_name_set_id.setdefault(feature_name_set_id, []).append(
+                    shap_values_blob
+                )
+                aggregate.last_rowid = max(aggregate.last_rowid, rowid)
+                aggregate.row_count += 1
+                if updated_at is not None and (
+                    aggregate.last_updated_at is None
+                    or updated_at > aggregate.last_updated_at
+                ):
+                    aggregate.last_updated_at = updated_at
+
+            for feature_name_set_id, blobs in blobs_by_feature_name_set_id.items():
+                feature_count = len(get_feature_names(db, feature_name_set_id) or [])
+
+                if not feature_count:
+                    continue
+
+                # One decode for the whole chunk instead of one per assessment
+                aggregate.add(
+                    feature_name_set_id,
+                    np.frombuffer(b"".join(blobs), dtype=SHAP_VALUES_DTYPE).reshape(
+                        len(blobs), feature_count, -1
+                    ),
+                )
+
+
+shap_importance_cache = ShapImportanceCache(
+    max_age_seconds=settings.shap_importance_max_age_seconds
+)
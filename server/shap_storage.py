@@ -0,0 +1,157 @@
+import datetime
+import hashlib
+import json
+from typing import Dict, List
+
+import numpy as np
+from basemodels import CausalityAssessmentLevelEnum
+from sqlalchemy import DateTime, bindparam, text
+
+# Little-endian float32, row-major n_features x n_classes
+SHAP_VALUES_DTYPE = np.dtype("<f4")
+
+# A set id is a digest of its names, so the names cached for an id are never
+# stale and are kept for the life of the process
+feature_names_by_set_id: Dict[str, List[str]] = {}
+
+
+def encode_shap_values_matrix(shap_values_matrix) -> bytes | None:
+    if shap_values_matrix is None:
+        return None
+
+    return np.asarray(shap_values_matrix, dtype=SHAP_VALUES_DTYPE).tobytes()
+
+
+def decode_shap_values(
+    shap_values_blob: bytes | None, class_count: int
+) -> np.ndarray | None:
+    """Read-only n_features x n_classes view of a stored matrix."""
+    if shap_values_blob is None or not class_count:
+        return None
+
+    return np.frombuffer(shap_values_blob, dtype=SHAP_VALUES_DTYPE).reshape(
+        -1, class_count
+    )
+
+
+def decode_shap_values_matrix(
+    shap_values_blob: bytes | None, class_count: int
+) -> List[List[float]] | None:
+    shap_values = decode_shap_values(shap_values_blob, class_count)
+
+    return None if shap_values is None else shap_values.tolist()
+
+
+def get_top_feature_indices(shap_values: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indices of the `top_k` features with the largest absolute SHAP value in
+    any class, most influential first.
+    """
+    return np.argsort(-np.abs(shap_values).max(axis=1), kind="stable")[:top_k]
+
+
+def get_class_values(ordinal_encoder) -> List[CausalityAssessmentLevelEnum]:
+    """
+    The class of each column of a SHAP matrix. The model predicts the codes
+    the ordinal encoder gave the classes, so its columns follow the encoder's
+    categories, not the order of `CausalityAssessmentLevelEnum`.
+    """
+    return [
+        CausalityAssessmentLevelEnum(category)
+        for category in ordinal_encoder.categories_[0]
+    ]
+
+
+def get_top_shap_contributions(
+    shap_values: np.ndarray,
+    feature_names: List[str],
+    class_values: List[CausalityAssessmentLevelEnum],
+    top_k: int,
+) -> List[Dict]:
+    """
+    The `top_k` strongest positive and `top_k` strongest negative
+    contributions of each class, as `shap_contribution` rows. `class_values`
+    names the columns of the matrix, see `get_class_values`.
+    """
+    # Strongest positive first, read backwards for the strongest negative
+    feature_order = np.argsort(-shap_values, axis=0, kind="stable")
+
+    rows = []
+    for class_index in range(min(shap_values.shape[1], len(class_values))):
+        class_shap_values = shap_values[:, class_index]
+
+        for candidate_indices, keep in [
+            (feature_order[:top_k, class_index], lambda value: value > 0),
+            (feature_order[::-1, class_index][:top_k], lambda value: value < 0),
+        ]:
+            rank = 0
+            for feature_index in candidate_indices:
+                shap_value = float(class_shap_values[feature_index])
+                if not keep(shap_value):
+                    break
+
+                rank += 1
+                rows.append(
+                    {
+                        "class_value": class_values[class_index],
+                        "feature_name": feature_names[feature_index],
+                        "shap_value": shap_value,
+                        "rank": rank,
+                    }
+                )
+
+    return rows
+
+
+def get_feature_name_set_id(ml_model_id: str, feature_names: List[str]) -> str:
+    """Content address of a feature name set, the same in every process."""
+    return hashlib.sha1(
+        json.dumps([ml_model_id, feature_names]).encode("utf-8")
+    ).hexdigest()
+
+
+def save_feature_name_set(db, ml_model_id: str, feature_names: List[str]) -> str:
+    """
+    Store a feature name set unless it exists and return its id. `db` is a
+    Session or Connection, the row is written in its transaction.
+    """
+    feature_name_set_id = get_feature_name_set_id(ml_model_id, feature_names)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    db.execute(
+        text("""
+        INSERT INTO feature_name_set (id, ml_model_id, feature_names, created_at, updated_at)
+        VALUES (:id, :ml_model_id, :feature_names, :now, :now)
+        ON CONFLICT (id) DO NOTHING
+        """).bindparams(bindparam("now", type_=DateTime)),
+        {
+            "id": feature_name_set_id,
+            "ml_model_id": ml_model_id,
+            "feature_names": json.dumps(feature_names),
+            "now": now,
+        },
+    )
+
+    feature_names_by_set_id[feature_name_set_id] = feature_names
+
+    return feature_name_set_id
+
+
+def get_feature_names(db, feature_name_set_id: str | None) -> List[str] | None:
+    if feature_name_set_id is None:
+        return None
+
+    feature_names = feature_names_by_set_id.get(feature_name_set_id)
+
+    if feature_names is None and db is not None:
+        feature_names_json = db.execute(
+            text("SELECT feature_names FROM feature_name_set WHERE id = :id"),
+            {"id": feature_name_set_id},
+        ).scalar_one_or_none()
+
+        if feature_names_json is None:
+            return None
+
+        feature_names = json.loads(feature_names_json)
+        feature_names_by_set_id[feature_name_set_id] = feature_names
+
+    return feature_names
@@ -0,0 +1,516 @@
+import asyncio
+import datetime
+import logging
+import random
+import time
+import uuid
+from typing import Dict, List, Set
+
+import africastalking
+from basemodels import SMSMessageTypeEnum, SMSOutboxStatusEnum
+from config import settings
+from metrics import sms_provider_duration_seconds
+from models import SMSMessageModel, SMSOutboxModel
+from sessions import Session as SessionLocal
+from sqlalchemy import insert, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# Africa's Talking status codes of recipients the message was accepted for:
+# Processed, Sent and Queued. Any other code means it was not sent to them
+ACCEPTED_STATUS_CODES = {100, 101, 102}
+# Rejections worth retrying: InternalServerError, GatewayError and
+# RejectedByGateway. The others, e.g. InvalidPhoneNumber or UserInBlacklist,
+# would be rejected again
+RETRYABLE_STATUS_CODES = {500, 501, 502}
+
+
+class AfricasTalkingSMSProvider:
+    def __init__(self, username: str, api_key: str):
+        self.username = username
+        self.api_key = api_key
+        self._sms = None
+
+    def send(self, message: str, recipients: List[str]) -> Dict:
+        if self._sms is None:
+            africastalking.initialize(self.username, self.api_key)
+            self._sms = africastalking.SMS
+
+        return self._sms.send(message, recipients)
+
+
+class FakeSMSProvider:
+    """
+    Local stand-in for Africa's Talking. Records every message and answers
+    with a response of the same shape. `fail_next` makes the next sends raise
+    as a provider outage would. Numbers in `rejected_numbers` are answered
+    with a per-recipient failure as an invalid number would be, and numbers in
+    `gateway_error_numbers` as a failing gateway would be.
+    """
+
+    def __init__(self):
+        self.sent_messages = []
+        self.fail_next = 0
+        self.rejected_numbers: Set[str] = set()
+        self.gateway_error_numbers: Set[str] = set()
+
+    def send(self, message: str, recipients: List[str]) -> Dict:
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise ConnectionError("Fake SMS provider unavailable")
+
+        self.sent_messages.append({"message": message, "recipients": recipients})
+
+        return {
+            "SMSMessageData": {
+                "Message": f"Sent to {len(recipients)}/{len(recipients)}",
+                "Recipients": [
+                    self._get_recipient_status(recipient) for recipient in recipients
+                ],
+            }
+        }
+
+    def _get_recipient_status(self, recipient: str) -> Dict:
+        if recipient in self.rejected_numbers:
+            status, status_code = "InvalidPhoneNumber", 403
+        elif recipient in self.gateway_error_numbers:
+            status, status_code = "GatewayError", 501
+        else:
+            return {
+                "number": recipient,
+                "status": "Success",
+                "statusCode": 101,
+                "messageId": f"fake-{uuid.uuid4()}",
+                "messageParts": 1,
+                "cost": "KES 0.0000",
+            }
+
+        return {
+            "number": recipient,
+            "status": status,
+            "statusCode": status_code,
+            "messageId": "None",
+            "cost": "0",
+        }
+
+
+def get_sms_provider():
+    if settings.sms_provider == "fake":
+        return FakeSMSProvider()
+
+    return AfricasTalkingSMSProvider(
+        settings.africas_talking_username, settings.africas_talking_api_key
+    )
+
+
+def build_sms_message_rows(
+    response: Dict,
+    content: str,
+    sms_type: SMSMessageTypeEnum,
+    adr_id: str | None,
+    sms_outbox_id: str | None = None,
+) -> List[Dict]:
+    """Turn a provider send response into one `sms_message` row per recipient."""
+    return [
+        {
+            "adr_id": adr_id,
+            "sms_outbox_id": sms_outbox_id,
+            "content": content,
+            "sms_type": sms_type,
+            "cost": message.get("cost", None),
+            "message_id": message.get("messageId", None),
+            "message_parts": message.get("messageParts", None),
+            "number": message.get("number", None),
+            "status": message.get("status"),
+            "status_code": message.get("statusCode"),
+        }
+        for message in response.get("SMSMessageData").get("Recipients")
+    ]
+
+
+def describe_rejections(sms_message_rows: List[Dict]) -> str:
+    return "Provider rejected " + ", ".join(
+        f"{row['number']} ({row['status']})" for row in sms_message_rows
+    )
+
+
+def enqueue_sms(
+    db: Session,
+    adr_id: str,
+    sms_type: SMSMessageTypeEnum,
+    recipients: List[str],
+    content: str,
+) -> SMSOutboxModel:
+    """
+    Queue an SMS for an ADR, at most once per ADR and message type.
+
+    Requests for a message that is already queued or sent return the existing
+    job. A job that ran out of attempts is queued again.
+    """
+    idempotency_key = f"{adr_id}:{sms_type.value}"
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    job = (
+        db.query(SMSOutboxModel)
+        .filter(SMSOutboxModel.idempotency_key == idempotency_key)
+        .first()
+    )
+
+    if job is None:
+        job = SMSOutboxModel(
+            idempotency_key=idempotency_key,
+            adr_id=adr_id,
+            sms_type=sms_type,
+            recipients=recipients,
+            content=content,
+            status=SMSOutboxStatusEnum.pending,
+            attempts=0,
+            next_attempt_at=now,
+        )
+        db.add(job)
+
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request queued the same message first
+            db.rollback()
+            return (
+                db.query(SMSOutboxModel)
+                .filter(SMSOutboxModel.idempotency_key == idempotency_key)
+                .one()
+            )
+    elif job.status == SMSOutboxStatusEnum.failed:
+        job.status = SMSOutboxStatusEnum.pending
+        job.attempts = 0
+        job.next_attempt_at = now
+        job.last_error = None
+        db.commit()
+
+    return job
+
+
+def enqueue_sms_batch(
+    db: Session, messages: List[Dict], campaign_id: str | None = None
+) -> int:
+    """
+    Queue many SMS with a single insert. Each message needs `adr_id`,
+    `sms_type`, `recipients` and `content`. Messages already queued for their
+    ADR and type are skipped. Returns the number of queued messages.
+    """
+    if not messages:
+        return 0
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "idempotency_key": f"{message['adr_id']}:{message['sms_type'].value}",
+            "adr_id": message["adr_id"],
+            "sms_type": message["sms_type"],
+            "recipients": message["recipients"],
+            "content": message["content"],
+            "status": SMSOutboxStatusEnum.pending,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "campaign_id": campaign_id,
+        }
+        for message in messages
+    ]
+
+    # Insert against the table so the result reports how many rows were new
+    result = db.execute(
+        sqlite_insert(SMSOutboxModel.__table__).on_conflict_do_nothing(
+            index_elements=["idempotency_key"]
+        ),
+        rows,
+    )
+    db.commit()
+
+    return result.rowcount
+
+
+class SMSDispatcher:
+    """
+    Background task sending queued SMS through the provider.
+
+    Due jobs are claimed in batches, so several workers can share the outbox.
+    At most `concurrency` provider calls run at once. Failed sends are retried
+    with exponential backoff until `max_attempts`. Jobs claimed by a worker
+    that died are picked up again after `claim_timeout_seconds`. The claim
+    restarts when a job's send starts and each job is recorded as soon as its
+    send finishes, so jobs waiting behind a slow batch are not claimed twice.
+    """
+
+    def __init__(
+        self,
+        provider,
+        concurrency: int = 4,
+        batch_size: int = 20,
+        poll_seconds: float = 5.0,
+        max_attempts: int = 6,
+        backoff_base_seconds: float = 10.0,
+        backoff_max_seconds: float = 900.0,
+        claim_timeout_seconds: float = 120.0,
+    ):
+        self.provider = provider
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.claim_timeout_seconds = claim_timeout_seconds
+        self._semaphore = None
+        self._wake_event = None
+        self._loop = None
+        self._task = None
+
+    def start(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._wake_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._loop = None
+
+    def wake(self):
+        """Dispatch without waiting for the next poll. Safe from any thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake_event.set)
+
+    async def run(self):
+        while True:
+            try:
+                while await self.dispatch_due() == self.batch_size:
+                    pass
+            except Exception:
+                logging.exception("SMS dispatch failed")
+
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+
+    async def dispatch_due(self) -> int:
+        """Send one batch of due jobs. Returns the number of jobs claimed."""
+        jobs = await asyncio.to_thread(self._claim_due)
+        await asyncio.gather(*(self._send(job) for job in jobs))
+        return len(jobs)
+
+    async def _send(self, job: Dict):
+        async with self._semaphore:
+            if not await asyncio.to_thread(self._extend_claim, job):
+                return
+
+            started_at = time.perf_counter()
+            try:
+                response = await asyncio.to_thread(
+                    self.provider.send, job["content"], job["recipients"]
+                )
+                error = None
+            except Exception as e:
+                response = None
+                error = e
+
+            self._observe_send(started_at, "error" if error else "success")
+            await asyncio.to_thread(self._record_result, job, response, error)
+
+    def _observe_send(self, started_at: float, outcome: str):
+        sms_provider_duration_seconds.labels(
+            type(self.provider).__name__, outcome
+        ).observe(time.perf_counter() - started_at)
+
+    def _claim_due(self) -> List[Dict]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        claim_expired_at = now - datetime.timedelta(seconds=self.claim_timeout_seconds)
+        claimable = or_(
+            (SMSOutboxModel.status == SMSOutboxStatusEnum.pending)
+            & (SMSOutboxModel.next_attempt_at <= now),
+            (SMSOutboxModel.status == SMSOutboxStatusEnum.sending)
+            & (SMSOutboxModel.claimed_at < claim_expired_at),
+        )
+
+        with SessionLocal() as db:
+            candidate_ids = [
+                job_id
+                for (job_id,) in db.query(SMSOutboxModel.id)
+                .filter(claimable)
+                .order_by(SMSOutboxModel.next_attempt_at)
+                .limit(self.batch_size)
+            ]
+
+            if not candidate_ids:
+                return []
+
+            # Claim in one update. Rows another worker claimed in the meantime
+            # no longer match `claimable`, and the claim time identifies ours
+            db.query(SMSOutboxModel).filter(
+                SMSOutboxModel.id.in_(candidate_ids), claimable
+            ).update(
+                {
+                    SMSOutboxModel.status: SMSOutboxStatusEnum.sending,
+                    SMSOutboxModel.claimed_at: now,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+
+            return [
+                {
+                    "id": job.id,
+                    "adr_id": job.adr_id,
+                    "sms_type": job.sms_type,
+                    "content": job.content,
+                    "recipients": job.recipients,
+                    "claimed_at": job.claimed_at,
+                }
+                for job in db.query(SMSOutboxModel).filter(
+                    SMSOutboxModel.id.in_(candidate_ids),
+                    SMSOutboxModel.status == SMSOutboxStatusEnum.sending,
+                    SMSOutboxModel.claimed_at == now,
+                )
+            ]
+
+    def _extend_claim(self, job: Dict) -> bool:
+        """
+        Restart the claim of a job about to be sent. False when the claim
+        expired and another worker took the job over.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        with SessionLocal() as db:
+            extended_count = (
+                db.query(SMSOutboxModel)
+                .filter(
+                    SMSOutboxModel.id == job["id"],
+                    SMSOutboxModel.status == SMSOutboxStatusEnum.sending,
+                    SMSOutboxModel.claimed_at == job["claimed_at"],
+                )
+                .update({SMSOutboxModel.claimed_at: now}, synchronize_session=False)
+            )
+            db.commit()
+
+        job["claimed_at"] = now
+        return extended_count == 1
+
+    def _record_result(self, job: Dict, response: Dict | None, error: Exception | None):
+        """
+        Store the provider response of one job: its `sms_message` rows and
+        the job's new status. Recipients rejected for a transient reason are
+        retried, the others are recorded once. Each recipient gets a single
+        row, a retried one when it is accepted or the job gives up.
+        """
+        sms_message_rows = []
+
+        if error is None:
+            try:
+                sms_message_rows = build_sms_message_rows(
+                    response,
+                    job["content"],
+                    job["sms_type"],
+                    job["adr_id"],
+                    job["id"],
+                )
+            except (AttributeError, TypeError) as e:
+                error = ValueError(f"Unexpected provider response: {e}")
+
+        retry_rows = [
+            row
+            for row in sms_message_rows
+            if row["status_code"] in RETRYABLE_STATUS_CODES
+        ]
+        rejected_rows = [
+            row
+            for row in sms_message_rows
+            if row["status_code"] not in ACCEPTED_STATUS_CODES
+            and row["status_code"] not in RETRYABLE_STATUS_CODES
+        ]
+        if retry_rows:
+            error = ValueError(describe_rejections(retry_rows))
+
+        with SessionLocal() as db:
+            outbox_job = db.get(SMSOutboxModel, job["id"])
+
+            if outbox_job is None:
+                # Deleted while it was being sent, the messages still went out
+                for row in sms_message_rows:
+                    row["sms_outbox_id"] = None
+            elif error is not None and outbox_job.attempts + 1 < self.max_attempts:
+                # Recorded on the attempt that settles them
+                sms_message_rows = [
+                    row for row in sms_message_rows if row not in retry_rows
+                ]
+
+            if sms_message_rows:
+                db.execute(insert(SMSMessageModel), sms_message_rows)
+
+            if outbox_job is None:
+                logging.warning(f"SMS outbox job {job['id']} no longer exists")
+            elif error is None:
+                outbox_job.attempts += 1
+                outbox_job.last_error = (
+                    describe_rejections(rejected_rows) if rejected_rows else None
+                )
+                if rejected_rows and len(rejected_rows) == len(sms_message_rows):
+                    outbox_job.status = SMSOutboxStatusEnum.failed
+                    logging.error(
+                        f"SMS {outbox_job.idempotency_key} failed: "
+                        f"{outbox_job.last_error}"
+                    )
+                else:
+                    outbox_job.status = SMSOutboxStatusEnum.sent
+            else:
+                if retry_rows:
+                    # Only these are sent again, the others are settled
+                    outbox_job.recipients = [row["number"] for row in retry_rows]
+                self._schedule_retry(outbox_job, error)
+
+            db.commit()
+
+    def _schedule_retry(self, job: SMSOutboxModel, error: Exception):
+        job.attempts += 1
+        job.last_error = str(error)
+
+        if job.attempts >= self.max_attempts:
+            job.status = SMSOutboxStatusEnum.failed
+            logging.error(f"SMS {job.idempotency_key} failed: {error}")
+            return
+
+        delay = min(
+            self.backoff_max_seconds,
+            self.backoff_base_seconds * 2 ** (job.attempts - 1),
+        )
+        # Jitter so jobs that failed together during an outage spread out
+        delay *= random.uniform(0.5, 1.0)
+
+        job.status = SMSOutboxStatusEnum.pending
+        job.next_attempt_at = datetime.datetime.now(
+            datetime.timezone.utc
+        ) + datetime.timedelta(seconds=delay)
+        logging.warning(
+            f"SMS {job.idempotency_key} attempt {job.attempts} failed, "
+            f"retrying in {delay:.0f}s: {error}"
+        )
+
+
+sms_dispatcher = SMSDispatcher(
+    get_sms_provider(),
+    concurrency=settings.sms_dispatch_concurrency,
+    batch_size=settings.sms_dispatch_batch_size,
+    poll_seconds=settings.sms_dispatch_poll_seconds,
+    max_attempts=settings.sms_dispatch_max_attempts,
+    backoff_base_seconds=settings.sms_dispatch_backoff_base_seconds,
+    backoff_max_seconds=settings.sms_dispatch_backoff_max_seconds,
+    claim_timeout_seconds=settings.sms_dispatch_claim_timeout_seconds,
+)
@@ -0,0 +1,97 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# `engines` opens sqlite:///db.sqlite relative to the working directory, so
+# move to a scratch directory before anything imports it
+os.chdir(tempfile.mkdtemp())
+
+for name in [
+    "ML_MODEL_PATH",
+    "ENCODERS_PATH",
+    "MLFLOW_TRACKING_SERVER_HOST",
+    "MLFLOW_TRACKING_SERVER_PORT",
+    "MLFLOW_INFERENCE_SERVER_HOST",
+    "MLFLOW_INFERENCE_SERVER_PORT",
+    "MLFLOW_MODEL_NAME",
+    "MLFLOW_MODEL_ALIAS",
+    "MLFLOW_MODEL_ARTIFACTS_PATH",
+    "MINIO_HOST",
+    "MINIO_API_PORT",
+    "MINIO_ACCESS_KEY",
+    "MINIO_SECRET_ACCESS_KEY",
+    "AWS_REGION",
+    "AFRICAS_TALKING_USERNAME",
+    "AFRICAS_TALKING_API_KEY",
+]:
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("SERVER_ACCESS_SECRET_KEY", "test-access-secret-key-32-bytes!")
+os.environ.setdefault("SERVER_REFRESH_SECRET_KEY", "test-refresh-secret-key-32-bytes")
+os.environ.setdefault("SERVER_ACCESS_ALGORITHM", "HS256")
+os.environ.setdefault("SERVER_REFRESH_ALGORITHM", "HS256")
+os.environ.setdefault("SERVER_ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("SERVER_REFRESH_TOKEN_EXPIRE_DAYS", "7")
+os.environ.setdefault("SMS_PROVIDER", "fake")
+# Fastest cost bcrypt accepts, hashing is not what the tests measure
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+
+@pytest.fixture
+def db():
+    from engines import engine
+    from migrations import add_missing_columns
+    from models import Base
+    from search import create_search_indexes
+    from sessions import Session as SessionLocal
+
+    Base.metadata.create_all(engine)
+    add_missing_columns(engine, Base.metadata)
+    create_search_indexes(engine)
+
+    with SessionLocal() as session:
+        yield session
+
+    engine.dispose()
+    os.remove("db.sqlite")
+
+
+@pytest.fixture
+def user(db):
+    from models import UserModel
+
+    user = UserModel(
+        username="reviewer", password="not-a-hash", first_name="Jane", last_name="Doe"
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def client(db, user):
+    from app import app
+    from auth import get_current_user
+    from basemodels import UserDetailsBaseModel
+    from fastapi.testclient import TestClient
+    from fastapi_pagination import add_pagination
+
+    principal = UserDetailsBaseModel(
+        id=user.id,
+        username=user.username,
+        first_name=user.first_name,
+        last_name=user.last_name,
+    )
+    app.dependency_overrides[get_current_user] = lambda: principal
+    # The lifespan also paginates the routes declared after `add_pagination`
+    add_pagination(app)
+
+    # Without the context manager the lifespan, which downloads the model
+    # bundle and seeds data, does not run
+    yield TestClient(app)
+
+    app.dependency_overrides.clear()
@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Iterator[List[str]]:
+    """Collect every SQL statement executed on `engine` inside the block."""
+    statements = []
+
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def assert_query_count(engine: Engine, expected: int) -> Iterator[List[str]]:
+    """
+    Fail if the block does not execute exactly `expected` SQL statements.
+
+    Use it to pin an endpoint to a fixed number of queries regardless of how
+    many related rows exist, e.g. `with assert_query_count(engine, 2): ...`.
+    """
+    with count_queries(engine) as statements:
+        yield statements
+
+    if len(statements) != expected:
+        executed = "\n".join(statements)
+        raise AssertionError(
+            f"Expected {expected} queries, got {len(statements)}:\n{executed}"
+        )
@@ -0,0 +1,72 @@
+import pytest
+from basemodels import SMSMessageTypeEnum
+from config import settings
+from delivery_reports import DeliveryReportBuffer, delivery_report_buffer
+from models import SMSMessageModel
+
+REPORT = {"id": "ATXid_1", "status": "Success"}
+
+
+@pytest.fixture
+def message(db):
+    message = SMSMessageModel(
+        message_id="ATXid_1",
+        sms_type=SMSMessageTypeEnum.individual_alert,
+        number="+254700000001",
+        content="Alert",
+        cost="KES 0.8000",
+        status="Success",
+        status_code=101,
+    )
+    db.add(message)
+    db.commit()
+    return message
+
+
+@pytest.fixture(autouse=True)
+def empty_buffer():
+    yield
+    delivery_report_buffer.reports.clear()
+
+
+def test_refuses_reports_without_configured_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "delivery_report_token", None)
+
+    response = client.post("/api/v1/sms/delivery_report", data=REPORT)
+
+    assert response.status_code == 503
+    assert delivery_report_buffer.reports == {}
+
+
+@pytest.mark.parametrize("query", ["", "?token=wrong"])
+def test_refuses_reports_with_wrong_token(client, monkeypatch, query):
+    monkeypatch.setattr(settings, "delivery_report_token", "secret")
+
+    response = client.post(f"/api/v1/sms/delivery_report{query}", data=REPORT)
+
+    assert response.status_code == 403
+    assert delivery_report_buffer.reports == {}
+
+
+def test_buffers_reports_with_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "delivery_report_token", "secret")
+
+    response = client.post("/api/v1/sms/delivery_report?token=secret", data=REPORT)
+
+    assert response.status_code == 200
+    assert delivery_report_buffer.reports == {"ATXid_1": ("Delivered", None)}
+
+
+def test_final_status_is_never_replaced(db, message):
+    buffer = DeliveryReportBuffer()
+
+    buffer.add("ATXid_1", "Buffered")
+    assert buffer.flush() == 1
+    buffer.add("ATXid_1", "Success")
+    assert buffer.flush() == 1
+    buffer.add("ATXid_1", "Failed", "DeliveryFailure")
+    assert buffer.flush() == 0
+
+    db.refresh(message)
+    assert message.status == "Delivered"
+    assert message.failure_reason is None
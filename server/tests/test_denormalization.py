@@ -0,0 +1,115 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import rescoring
+from basemodels import (
+    CausalityAssessmentLevelEnum,
+    CriteriaForSeriousnessEnum,
+    GenderEnum,
+    IsSeriousEnum,
+    KnownAllergyEnum,
+    PregnancyStatusEnum,
+)
+from denormalization import (
+    backfill_current_causality_assessment_levels,
+    refresh_current_causality_assessment_level,
+    set_current_causality_assessment_level,
+)
+from models import ADRModel, CausalityAssessmentLevelModel, MedicalInstitutionModel
+
+
+def add_adr(db, user) -> ADRModel:
+    institution = MedicalInstitutionModel(name="Kenyatta National Hospital")
+    db.add(institution)
+    db.flush()
+
+    adr = ADRModel(
+        medical_institution_id=institution.id,
+        patient_name="John Kamau",
+        inpatient_or_outpatient_number="IP0001",
+        patient_gender=GenderEnum.male,
+        known_allergy=KnownAllergyEnum.no,
+        pregnancy_status=PregnancyStatusEnum.not_applicable,
+        is_serious=IsSeriousEnum.yes,
+        criteria_for_seriousness=CriteriaForSeriousnessEnum.hospitalisation,
+        user_id=user.id,
+    )
+    db.add(adr)
+    db.commit()
+    return adr
+
+
+def add_causality_assessment_level(db, adr, days_after: int) -> str:
+    causality_assessment_level = CausalityAssessmentLevelModel(
+        adr_id=adr.id,
+        causality_assessment_level_value=CausalityAssessmentLevelEnum.possible,
+        created_at=datetime.datetime(2025, 1, 1) + datetime.timedelta(days=days_after),
+    )
+    db.add(causality_assessment_level)
+    db.flush()
+    set_current_causality_assessment_level(db, adr.id, causality_assessment_level.id)
+    db.commit()
+    return causality_assessment_level.id
+
+
+def get_current_id(db, adr) -> str:
+    db.expire_all()
+    return db.get(ADRModel, adr.id).current_causality_assessment_level_id
+
+
+def test_current_is_the_first_assessment(db, user):
+    adr = add_adr(db, user)
+    first_id = add_causality_assessment_level(db, adr, 0)
+    second_id = add_causality_assessment_level(db, adr, 1)
+    add_causality_assessment_level(db, adr, 2)
+    assert get_current_id(db, adr) == first_id
+
+    # Deleting it falls back to the earliest remaining assessment
+    db.delete(db.get(CausalityAssessmentLevelModel, first_id))
+    db.flush()
+    refresh_current_causality_assessment_level(db, adr.id)
+    db.commit()
+    assert get_current_id(db, adr) == second_id
+
+
+def test_backfill_repoints_at_the_first_assessment(db, user):
+    missing_adr = add_adr(db, user)
+    missing_first_id = add_causality_assessment_level(db, missing_adr, 0)
+    moved_adr = add_adr(db, user)
+    moved_first_id = add_causality_assessment_level(db, moved_adr, 0)
+    later_id = add_causality_assessment_level(db, moved_adr, 1)
+
+    db.query(ADRModel).filter(ADRModel.id == missing_adr.id).update(
+        {ADRModel.current_causality_assessment_level_id: None}
+    )
+    # As older rescoring runs left it
+    db.query(ADRModel).filter(ADRModel.id == moved_adr.id).update(
+        {ADRModel.current_causality_assessment_level_id: later_id}
+    )
+    db.commit()
+
+    backfill_current_causality_assessment_levels(db)
+    db.commit()
+
+    assert get_current_id(db, missing_adr) == missing_first_id
+    assert get_current_id(db, moved_adr) == moved_first_id
+
+
+def test_rescoring_keeps_the_current_assessment(db, user, monkeypatch):
+    adr = add_adr(db, user)
+    first_id = add_causality_assessment_level(db, adr, 0)
+
+    # Unscorable ADRs are rescored without loading a model
+    monkeypatch.setattr(rescoring, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(rescoring, "init_scoring_worker", lambda: None)
+    monkeypatch.setattr(rescoring, "is_scorable", lambda adr: False)
+
+    rescoring.run_rescoring_job("final_ml_model/7", workers=1)
+
+    assert get_current_id(db, adr) == first_id
+    assert [
+        ml_model_id
+        for (ml_model_id,) in db.query(CausalityAssessmentLevelModel.ml_model_id)
+        .filter(CausalityAssessmentLevelModel.adr_id == adr.id)
+        .order_by(CausalityAssessmentLevelModel.created_at)
+    ] == ["final_ml_model@champion", "final_ml_model/7"]
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+from institution_directory import institution_directory
+from models import MedicalInstitutionModel
+
+
+@pytest.fixture
+def slow_refresh(db, monkeypatch):
+    """Count rebuilds, each taking 200 ms unless `release` is set sooner."""
+    refresh = institution_directory.refresh
+    release = threading.Event()
+    started = []
+
+    def slow_refresh(db):
+        started.append(time.monotonic())
+        release.wait(0.2)
+        refresh(db)
+
+    monkeypatch.setattr(institution_directory, "refresh", slow_refresh)
+    monkeypatch.setattr(institution_directory, "refreshed_at", 0.0)
+    yield started, release
+
+    release.set()
+    wait_for_refreshes()
+
+
+def wait_for_refreshes():
+    deadline = time.monotonic() + 5
+    while institution_directory._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not institution_directory._refreshing
+
+
+def test_stale_autocompletes_trigger_one_rebuild(client, db, slow_refresh):
+    started, release = slow_refresh
+    db.add(MedicalInstitutionModel(name="Kenyatta National Hospital"))
+    db.commit()
+    assert institution_directory.is_stale()
+
+    for _ in range(50):
+        response = client.get(
+            "/api/v1/medical_institution/autocomplete", params={"query": "ken"}
+        )
+        # Answered from the old directory while the rebuild runs
+        assert response.status_code == 200
+
+    release.set()
+    wait_for_refreshes()
+
+    assert len(started) == 1
+    assert not institution_directory.is_stale()
+    assert [
+        institution["name"] for institution in institution_directory.autocomplete("ken")
+    ] == ["Kenyatta National Hospital"]
+
+
+def test_writes_during_a_rebuild_trigger_one_more(db, slow_refresh):
+    started, release = slow_refresh
+
+    institution_directory.refresh_in_background()
+    for _ in range(3):
+        institution_directory.refresh_in_background(rerun_if_running=True)
+
+    release.set()
+    wait_for_refreshes()
+
+    assert len(started) == 2
@@ -0,0 +1,90 @@
+import json
+import sqlite3
+
+from basemodels import CausalityAssessmentLevelEnum
+from engines import engine
+from migrations import drop_legacy_shap_columns, migrate_legacy_shap_columns
+from models import CausalityAssessmentLevelModel
+from sqlalchemy import inspect, text
+
+SHAP_VALUES_MATRIX = [[0.5, -0.25], [0.125, 0.0]]
+FEATURE_NAMES = ["age", "weight"]
+
+
+def add_legacy_row(db) -> str:
+    with engine.begin() as connection:
+        for column in ("shap_values_matrix", "feature_names"):
+            connection.execute(
+                text(f"ALTER TABLE causality_assessment_level ADD COLUMN {column} JSON")
+            )
+
+    causality_assessment_level = CausalityAssessmentLevelModel(
+        adr_id="adr-1",
+        causality_assessment_level_value=CausalityAssessmentLevelEnum.likely,
+        base_values=[0.25, 0.75],
+    )
+    db.add(causality_assessment_level)
+    db.commit()
+
+    with engine.begin() as connection:
+        connection.execute(
+            text("""
+            UPDATE causality_assessment_level
+            SET shap_values_matrix = :shap_values_matrix, feature_names = :feature_names
+            WHERE id = :id
+            """),
+            {
+                "id": causality_assessment_level.id,
+                "shap_values_matrix": json.dumps(SHAP_VALUES_MATRIX),
+                "feature_names": json.dumps(FEATURE_NAMES),
+            },
+        )
+
+    return causality_assessment_level.id
+
+
+def get_columns() -> set:
+    return {
+        column["name"]
+        for column in inspect(engine).get_columns("causality_assessment_level")
+    }
+
+
+def test_startup_migration_keeps_legacy_columns(db):
+    causality_assessment_level_id = add_legacy_row(db)
+
+    assert migrate_legacy_shap_columns(engine) == 1
+    assert migrate_legacy_shap_columns(engine) == 0
+    assert {"shap_values_matrix", "feature_names"} <= get_columns()
+
+    db.expire_all()
+    causality_assessment_level = db.get(
+        CausalityAssessmentLevelModel, causality_assessment_level_id
+    )
+    assert causality_assessment_level.shap_values_matrix == SHAP_VALUES_MATRIX
+    assert causality_assessment_level.feature_names == FEATURE_NAMES
+
+
+def test_drop_legacy_columns_after_backup(db, tmp_path):
+    causality_assessment_level_id = add_legacy_row(db)
+    db.close()
+    backup_path = str(tmp_path / "db.sqlite.bak")
+
+    assert drop_legacy_shap_columns(engine, backup_path) == [
+        "shap_values_matrix",
+        "feature_names",
+    ]
+    assert not {"shap_values_matrix", "feature_names"} & get_columns()
+    assert drop_legacy_shap_columns(engine) == []
+
+    with sqlite3.connect(backup_path) as backup_connection:
+        assert backup_connection.execute(
+            "SELECT feature_names FROM causality_assessment_level WHERE id = ?",
+            (causality_assessment_level_id,),
+        ).fetchone() == (json.dumps(FEATURE_NAMES),)
+
+    db.expire_all()
+    causality_assessment_level = db.get(
+        CausalityAssessmentLevelModel, causality_assessment_level_id
+    )
+    assert causality_assessment_level.shap_values_matrix == SHAP_VALUES_MATRIX
@@ -0,0 +1,40 @@
+"""
+Export the model bundle to ONNX and compare its predictions with
+scikit-learn over `data.csv`. Skipped without the optional ONNX packages or
+a downloaded bundle.
+"""
+
+import os
+
+import pandas as pd
+import pytest
+from config import settings
+from conftest import SERVER_DIR
+from onnx_export import check_parity, export_onnx
+from prediction import OnnxModel, get_sklearn_ml_model, input_to_prediction_format
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("skl2onnx")
+
+# The server reads the bundle and the data relative to its own directory
+ARTIFACTS_PATH = os.path.join(SERVER_DIR, settings.mlflow_model_artifacts_path)
+DATA_PATH = os.path.join(SERVER_DIR, "data.csv")
+
+
+@pytest.mark.skipif(
+    not os.path.exists(f"{ARTIFACTS_PATH}/model/model.pkl"),
+    reason="No model bundle downloaded",
+)
+def test_onnx_export_matches_sklearn(tmp_path):
+    ml_model = get_sklearn_ml_model(ARTIFACTS_PATH)
+    prediction_input = input_to_prediction_format(
+        pd.read_csv(DATA_PATH), artifacts_path=ARTIFACTS_PATH
+    )
+    # Exported next to the test rather than into the bundle
+    onnx_model_path = str(tmp_path / "model.onnx")
+
+    export_onnx(ml_model, prediction_input.iloc[:1], onnx_model_path)
+    parity = check_parity(ml_model, OnnxModel(onnx_model_path), prediction_input)
+
+    assert parity["row_count"] == len(pd.read_csv(DATA_PATH))
+    assert parity["passed"], parity
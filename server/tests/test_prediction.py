@@ -0,0 +1,46 @@
+import json
+import os
+
+import joblib
+import pandas as pd
+import pytest
+from prediction import format_feature_values_batch
+from sklearn.preprocessing import MinMaxScaler
+
+COLUMN_METADATA = {
+    "categorical_columns": [],
+    "numerical_columns": ["patient_age"],
+    "date_columns": [],
+    "boolean_columns": ["is_serious"],
+    "prediction_columns": ["patient_age", "is_serious"],
+    "columns_to_drop": [],
+}
+
+
+@pytest.fixture
+def artifacts_path(tmp_path, monkeypatch):
+    from config import settings
+
+    (tmp_path / "scalers").mkdir()
+    (tmp_path / "metadata").mkdir()
+    (tmp_path / "metadata" / "model_columns.json").write_text(
+        json.dumps(COLUMN_METADATA)
+    )
+    monkeypatch.setattr(settings, "mlflow_model_artifacts_path", str(tmp_path))
+    return tmp_path
+
+
+def save_scaler(artifacts_path, max_age: int, mtime: float):
+    scaler_path = artifacts_path / "scalers" / "minmax_scaler.pkl"
+    joblib.dump(MinMaxScaler().fit([[0], [max_age]]), scaler_path)
+    os.utime(scaler_path, (mtime, mtime))
+
+
+def test_scaling_follows_a_replaced_scaler(artifacts_path):
+    prediction_input = pd.DataFrame({"patient_age": [0.5], "is_serious": [1]})
+
+    save_scaler(artifacts_path, max_age=100, mtime=1_000_000)
+    assert format_feature_values_batch(prediction_input) == [[50, True]]
+
+    save_scaler(artifacts_path, max_age=80, mtime=2_000_000)
+    assert format_feature_values_batch(prediction_input) == [[40, True]]
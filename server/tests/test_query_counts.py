@@ -0,0 +1,128 @@
+"""
+Pin the ADR and causality assessment reads to a fixed number of SQL
+statements, whether the ADR has one review and SMS or many, so a
+relationship that starts loading lazily fails here instead of in
+production.
+"""
+
+import pytest
+from basemodels import (
+    CausalityAssessmentLevelEnum,
+    CriteriaForSeriousnessEnum,
+    GenderEnum,
+    IsSeriousEnum,
+    KnownAllergyEnum,
+    PregnancyStatusEnum,
+    SMSMessageTypeEnum,
+)
+from denormalization import reconcile_review_counts
+from engines import engine
+from models import (
+    ADRModel,
+    CausalityAssessmentLevelModel,
+    MedicalInstitutionModel,
+    ReviewModel,
+    SMSMessageModel,
+    UserModel,
+)
+from query_counter import assert_query_count
+
+
+@pytest.fixture(params=[1, 10], ids=["one_related_row", "many_related_rows"])
+def adr(request, db, user):
+    related_count = request.param
+
+    institution = MedicalInstitutionModel(name="Kenyatta National Hospital")
+    db.add(institution)
+    db.flush()
+
+    adr = ADRModel(
+        medical_institution_id=institution.id,
+        patient_name="John Kamau",
+        inpatient_or_outpatient_number="IP0001",
+        patient_gender=GenderEnum.male,
+        known_allergy=KnownAllergyEnum.no,
+        pregnancy_status=PregnancyStatusEnum.not_applicable,
+        is_serious=IsSeriousEnum.yes,
+        criteria_for_seriousness=CriteriaForSeriousnessEnum.hospitalisation,
+        user_id=user.id,
+    )
+    db.add(adr)
+    db.flush()
+
+    causality_assessment_level = CausalityAssessmentLevelModel(
+        adr_id=adr.id,
+        causality_assessment_level_value=CausalityAssessmentLevelEnum.likely,
+    )
+    db.add(causality_assessment_level)
+    db.flush()
+    adr.current_causality_assessment_level_id = causality_assessment_level.id
+
+    for i in range(related_count):
+        # `user.password` is unique
+        reviewer = UserModel(
+            username=f"reviewer{i}", password=f"hash{i}", first_name="R", last_name=""
+        )
+        db.add(reviewer)
+        db.flush()
+        db.add(
+            ReviewModel(
+                causality_assessment_level_id=causality_assessment_level.id,
+                user_id=reviewer.id,
+                approved=i % 2 == 0,
+            )
+        )
+        db.add(
+            SMSMessageModel(
+                adr_id=adr.id,
+                sms_type=SMSMessageTypeEnum.individual_alert,
+                number="+254700000000",
+                content="Alert",
+                cost="KES 0.8000",
+                status="Success",
+                status_code=101,
+            )
+        )
+
+    db.commit()
+    reconcile_review_counts(db)
+    db.commit()
+
+    # Plain values, so reading them inside a counted block runs no query
+    return {
+        "id": adr.id,
+        "causality_assessment_level_id": causality_assessment_level.id,
+        "review_count": related_count,
+    }
+
+
+def test_get_adr_by_id(client, adr):
+    with assert_query_count(engine, 1):
+        response = client.get(f"/api/v1/adr/{adr['id']}")
+
+    assert response.status_code == 200
+    assert response.json()["id"] == adr["id"]
+
+
+def test_get_causality_assessment_level_by_id(client, adr):
+    with assert_query_count(engine, 1):
+        response = client.get(
+            f"/api/v1/causality_assessment_level/{adr['causality_assessment_level_id']}"
+        )
+
+    assert response.status_code == 200
+    content = response.json()
+    assert (
+        content["approved_count"] + content["not_approved_count"] == adr["review_count"]
+    )
+    assert "unapproved_count" not in content
+
+
+def test_get_causality_assessment_level_by_adr_id(client, adr):
+    with assert_query_count(engine, 1):
+        response = client.get(
+            f"/api/v1/specific_adr/{adr['id']}/causality_assessment_level"
+        )
+
+    assert response.status_code == 200
+    assert response.json()["id"] == adr["causality_assessment_level_id"]
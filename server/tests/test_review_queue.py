@@ -0,0 +1,60 @@
+import time
+
+from basemodels import (
+    CausalityAssessmentLevelEnum,
+    CriteriaForSeriousnessEnum,
+    GenderEnum,
+    IsSeriousEnum,
+    KnownAllergyEnum,
+    PregnancyStatusEnum,
+)
+from models import ADRModel, CausalityAssessmentLevelModel, MedicalInstitutionModel
+
+
+def add_adr(db, user, institution, patient_name: str, is_serious: IsSeriousEnum):
+    adr = ADRModel(
+        medical_institution_id=institution.id,
+        patient_name=patient_name,
+        inpatient_or_outpatient_number="IP0001",
+        patient_gender=GenderEnum.female,
+        known_allergy=KnownAllergyEnum.no,
+        pregnancy_status=PregnancyStatusEnum.not_applicable,
+        is_serious=is_serious,
+        criteria_for_seriousness=CriteriaForSeriousnessEnum.hospitalisation,
+        user_id=user.id,
+    )
+    db.add(adr)
+    db.flush()
+
+    causality_assessment_level = CausalityAssessmentLevelModel(
+        adr_id=adr.id,
+        causality_assessment_level_value=CausalityAssessmentLevelEnum.possible,
+    )
+    db.add(causality_assessment_level)
+    db.flush()
+    adr.current_causality_assessment_level_id = causality_assessment_level.id
+    db.commit()
+
+    # Distinct created_at values
+    time.sleep(0.01)
+
+
+def test_serious_adrs_first_then_oldest_first(db, user, client):
+    institution = MedicalInstitutionModel(name="Kenyatta National Hospital")
+    db.add(institution)
+    db.commit()
+
+    add_adr(db, user, institution, "Not serious, oldest", IsSeriousEnum.no)
+    add_adr(db, user, institution, "Serious, older", IsSeriousEnum.yes)
+    add_adr(db, user, institution, "Not serious, newest", IsSeriousEnum.no)
+    add_adr(db, user, institution, "Serious, newer", IsSeriousEnum.yes)
+
+    response = client.get("/api/v1/review_queue")
+
+    assert response.status_code == 200
+    assert [row["patient_name"] for row in response.json()] == [
+        "Serious, older",
+        "Serious, newer",
+        "Not serious, oldest",
+        "Not serious, newest",
+    ]
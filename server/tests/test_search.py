@@ -0,0 +1,101 @@
+import pytest
+from models import MedicalInstitutionModel
+from search import get_search_params
+from sqlalchemy import text
+from test_denormalization import add_adr
+
+
+@pytest.fixture
+def institutions(db):
+    db.add_all(
+        [
+            MedicalInstitutionModel(
+                name="JM Memorial Hospital", county="Nyandarua", sub_county="Ol Kalou"
+            ),
+            MedicalInstitutionModel(
+                name="Kalou Dispensary", county="Nyandarua", sub_county="Kinangop"
+            ),
+            MedicalInstitutionModel(
+                name="Kenyatta National Hospital",
+                county="Nairobi",
+                sub_county="Dagoretti",
+            ),
+        ]
+    )
+    db.commit()
+
+
+def search_institutions(client, query: str) -> list:
+    response = client.get("/api/v1/medical_institution", params={"query": query})
+    assert response.status_code == 200
+    return sorted(institution["name"] for institution in response.json()["items"])
+
+
+def match_names(db, search: str) -> list:
+    return [
+        name
+        for (name,) in db.execute(
+            text("""
+            SELECT medical_institution.name FROM medical_institution
+            JOIN medical_institution_search
+                ON medical_institution_search.rowid = medical_institution.rowid
+            WHERE medical_institution_search MATCH :search
+            """),
+            {"search": search},
+        )
+    ]
+
+
+def test_triggers_keep_the_index_in_sync(db):
+    institution = MedicalInstitutionModel(name="Kenyatta National Hospital")
+    db.add(institution)
+    db.commit()
+    assert match_names(db, '"kenyatta"') == ["Kenyatta National Hospital"]
+
+    institution.name = "Moi Teaching and Referral Hospital"
+    db.commit()
+    assert match_names(db, '"kenyatta"') == []
+    assert match_names(db, '"referral"') == ["Moi Teaching and Referral Hospital"]
+
+    db.delete(institution)
+    db.commit()
+    assert match_names(db, '"referral"') == []
+
+
+def test_short_terms_are_kept(client, institutions):
+    # "ol" is too short for the trigram index, it still has to match
+    assert search_institutions(client, "Ol Kalou") == ["JM Memorial Hospital"]
+
+
+def test_short_queries_match_every_indexed_column(client, institutions):
+    # Matches the sub-county, not the name
+    assert search_institutions(client, "ol") == ["JM Memorial Hospital"]
+    assert search_institutions(client, "km") == []
+
+
+def test_short_terms_are_not_wildcards(db):
+    assert get_search_params(db, "adr_search", "a_ 1%")["search_short_terms"] == (
+        '["%a\\\\_%", "%1\\\\%%"]'
+    )
+
+
+def test_falls_back_to_fuzzy_matching(client, institutions):
+    response = client.get("/api/v1/medical_institution", params={"query": "Kenyata"})
+
+    # Any shared trigram matches, the closest row ranks first
+    assert response.json()["items"][0]["name"] == "Kenyatta National Hospital"
+
+
+def test_adr_listing_keeps_short_terms(client, db, user):
+    add_adr(db, user)
+
+    def search_adrs(query: str) -> list:
+        response = client.get(
+            "/api/v1/adrs_with_causality_and_review_count", params={"query": query}
+        )
+        assert response.status_code == 200
+        return [adr["patient_name"] for adr in response.json()["items"]]
+
+    assert search_adrs("Jo Kamau") == ["John Kamau"]
+    assert search_adrs("Ja Kamau") == []
+    assert search_adrs("jo") == ["John Kamau"]
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+from basemodels import CausalityAssessmentLevelEnum
+from config import settings
+from denormalization import set_current_causality_assessment_level
+from models import (
+    DEFAULT_ML_MODEL_ID,
+    CausalityAssessmentLevelModel,
+    FeatureNameSetModel,
+)
+from prediction import ML_MODEL_ID_FILENAME, get_served_ml_model_id
+from shap import Explanation
+from sklearn.preprocessing import OrdinalEncoder
+from test_denormalization import add_adr
+
+ADR_UPDATE = {
+    "patient_name": "John Kamau",
+    "patient_gender": "male",
+    "pregnancy_status": "not applicable",
+    "known_allergy": "no",
+    "rifampicin_suspected": True,
+    "rechallenge": "yes",
+    "is_serious": "yes",
+    "criteria_for_seriousness": "hospitalisation",
+}
+
+
+@pytest.fixture
+def served_ml_model_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "mlflow_model_artifacts_path", str(tmp_path))
+    (tmp_path / ML_MODEL_ID_FILENAME).write_text("final_ml_model/7")
+    return "final_ml_model/7"
+
+
+@pytest.fixture
+def fake_ml_model(monkeypatch):
+    """Every ADR is assessed as possible, without a model bundle."""
+    import app
+
+    class FakeMLModel:
+        def predict(self, X):
+            return np.array([1.0])
+
+    ordinal_encoder = OrdinalEncoder().fit([["certain"], ["possible"]])
+    monkeypatch.setattr(app, "get_ml_model", lambda: FakeMLModel())
+    monkeypatch.setattr(app, "get_encoders", lambda: (None, ordinal_encoder))
+    monkeypatch.setattr(
+        app,
+        "input_to_prediction_format",
+        lambda df: pd.DataFrame({"patient_age": [0.5], "rechallenge_yes": [1.0]}),
+    )
+    monkeypatch.setattr(
+        app,
+        "explainer",
+        lambda X: Explanation(values=np.zeros((1, 2, 2)), base_values=np.zeros((1, 2))),
+        raising=False,
+    )
+    monkeypatch.setattr(app, "format_feature_values", lambda df: [0.5, 1.0])
+
+
+def test_served_ml_model_id_falls_back_to_the_default(tmp_path):
+    assert get_served_ml_model_id(str(tmp_path)) == DEFAULT_ML_MODEL_ID
+
+    (tmp_path / ML_MODEL_ID_FILENAME).write_text("final_ml_model/7\n")
+    assert get_served_ml_model_id(str(tmp_path)) == "final_ml_model/7"
+
+
+def test_update_keeps_assessments_by_other_models(
+    client, db, user, served_ml_model_id, fake_ml_model
+):
+    adr = add_adr(db, user)
+    previous = CausalityAssessmentLevelModel(
+        adr_id=adr.id,
+        ml_model_id="final_ml_model/6",
+        causality_assessment_level_value=CausalityAssessmentLevelEnum.certain,
+    )
+    db.add(previous)
+    db.flush()
+    set_current_causality_assessment_level(db, adr.id, previous.id)
+    db.commit()
+
+    for _ in range(2):
+        response = client.put(
+            f"/api/v1/adr/{adr.id}",
+            json={**ADR_UPDATE, "medical_institution_id": adr.medical_institution_id},
+        )
+        assert response.status_code == 200
+
+    db.expire_all()
+    causality_assessment_levels = (
+        db.query(CausalityAssessmentLevelModel)
+        .filter(CausalityAssessmentLevelModel.adr_id == adr.id)
+        .order_by(CausalityAssessmentLevelModel.created_at)
+        .all()
+    )
+    # The older model's assessment is untouched, the served model's one is
+    # added once and then updated in place
+    assert [
+        (level.ml_model_id, level.causality_assessment_level_value)
+        for level in causality_assessment_levels
+    ] == [
+        ("final_ml_model/6", CausalityAssessmentLevelEnum.certain),
+        (served_ml_model_id, CausalityAssessmentLevelEnum.possible),
+    ]
+    feature_name_set = db.get(
+        FeatureNameSetModel, causality_assessment_levels[1].feature_name_set_id
+    )
+    assert feature_name_set.ml_model_id == served_ml_model_id
@@ -0,0 +1,22 @@
+import time
+
+from basemodels import CausalityAssessmentLevelEnum
+from models import ShadowPredictionModel
+from shadow_scoring import ShadowScorer
+
+
+def test_broken_bundle_disables_shadow_scoring(db, tmp_path):
+    # An empty directory, the workers fail to load a model from it
+    shadow_scorer = ShadowScorer(str(tmp_path), "final_ml_model/8")
+    shadow_scorer.start()
+    # Wait for the pool to notice its workers died
+    shadow_scorer._executor.submit(time.sleep, 0).exception(timeout=30)
+
+    for _ in range(2):
+        shadow_scorer.submit(
+            "adr-1", {}, CausalityAssessmentLevelEnum.possible, production_latency_ms=5
+        )
+
+    assert shadow_scorer.pending == 0
+    assert shadow_scorer._executor is None
+    assert db.query(ShadowPredictionModel).count() == 0
@@ -0,0 +1,69 @@
+from basemodels import CausalityAssessmentLevelEnum
+from models import CausalityAssessmentLevelModel
+from sessions import Session as SessionLocal
+from shap_analytics import ShapImportanceCache
+from shap_storage import save_feature_name_set
+from test_denormalization import add_adr
+
+CLASS_VALUES = [
+    CausalityAssessmentLevelEnum.certain,
+    CausalityAssessmentLevelEnum.possible,
+]
+
+
+def add_assessment(db, adr, shap_values_matrix) -> str:
+    causality_assessment_level = CausalityAssessmentLevelModel(
+        adr_id=adr.id,
+        ml_model_id="final_ml_model/7",
+        causality_assessment_level_value=CausalityAssessmentLevelEnum.possible,
+        base_values=[0.5, 0.5],
+        shap_values_matrix=shap_values_matrix,
+        feature_name_set_id=save_feature_name_set(
+            db, "final_ml_model/7", ["patient_age", "rechallenge_yes"]
+        ),
+    )
+    db.add(causality_assessment_level)
+    db.commit()
+    return causality_assessment_level.id
+
+
+def get_importance(cache, db) -> dict:
+    return cache.get(db, "final_ml_model/7").to_dict(db, CLASS_VALUES)
+
+
+def test_picks_up_assessments_changed_by_another_worker(db, user):
+    cache = ShapImportanceCache()
+    adr = add_adr(db, user)
+    first_id = add_assessment(db, adr, [[1.0, 0.0], [0.0, 0.0]])
+    second_id = add_assessment(db, adr, [[3.0, 0.0], [0.0, 0.0]])
+    assert get_importance(cache, db)["mean_abs_shap_values"][0] == [2.0, 0.0]
+
+    # Written elsewhere, so this process never clears its cache
+    with SessionLocal() as other_db:
+        other_db.get(CausalityAssessmentLevelModel, first_id).shap_values_matrix = [
+            [5.0, 0.0],
+            [0.0, 0.0],
+        ]
+        other_db.commit()
+    assert get_importance(cache, db)["mean_abs_shap_values"][0] == [4.0, 0.0]
+
+    with SessionLocal() as other_db:
+        other_db.delete(other_db.get(CausalityAssessmentLevelModel, second_id))
+        other_db.commit()
+    importance = get_importance(cache, db)
+    assert importance["assessment_count"] == 1
+    assert importance["mean_abs_shap_values"][0] == [5.0, 0.0]
+
+
+def test_reads_only_new_assessments(db, user):
+    cache = ShapImportanceCache()
+    adr = add_adr(db, user)
+    add_assessment(db, adr, [[1.0, 0.0], [0.0, 0.0]])
+    first_aggregate = cache.get(db, "final_ml_model/7")
+
+    add_assessment(db, adr, [[3.0, 0.0], [0.0, 0.0]])
+    second_aggregate = cache.get(db, "final_ml_model/7")
+
+    # Built on the cached sums rather than from scratch
+    assert second_aggregate.refreshed_at == first_aggregate.refreshed_at
+    assert second_aggregate.to_dict(db, CLASS_VALUES)["assessment_count"] == 2
@@ -0,0 +1,32 @@
+import numpy as np
+from basemodels import CausalityAssessmentLevelEnum
+from shap_storage import get_class_values, get_top_shap_contributions
+from sklearn.preprocessing import OrdinalEncoder
+
+
+def test_contributions_follow_the_encoder_class_order():
+    # Categories are numbered alphabetically, not in the enum's order
+    ordinal_encoder = OrdinalEncoder().fit(
+        [["unlikely"], ["possible"], ["unclassified"]]
+    )
+    class_values = get_class_values(ordinal_encoder)
+    assert class_values == [
+        CausalityAssessmentLevelEnum.possible,
+        CausalityAssessmentLevelEnum.unclassified,
+        CausalityAssessmentLevelEnum.unlikely,
+    ]
+
+    # Only the column of the class encoded as 2 has a contribution
+    shap_values = np.zeros((2, 3))
+    shap_values[1, 2] = 0.5
+
+    assert get_top_shap_contributions(
+        shap_values, ["age", "weight"], class_values, top_k=5
+    ) == [
+        {
+            "class_value": CausalityAssessmentLevelEnum.unlikely,
+            "feature_name": "weight",
+            "shap_value": 0.5,
+            "rank": 1,
+        }
+    ]
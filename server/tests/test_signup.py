@@ -0,0 +1,25 @@
+def test_signup_stores_a_hash_of_the_password(client, db):
+    from models import UserModel
+
+    response = client.post(
+        "/api/v1/signup",
+        json={"username": "wanjiru", "password": "correct horse battery"},
+    )
+    assert response.status_code == 200
+
+    login = {"username": "wanjiru"}
+    assert (
+        client.post(
+            "/api/v1/token", data={**login, "password": "correct horse battery"}
+        ).status_code
+        == 200
+    )
+    assert (
+        client.post("/api/v1/token", data={**login, "password": "wanjiru"}).status_code
+        == 401
+    )
+
+    stored_password = (
+        db.query(UserModel.password).filter(UserModel.username == "wanjiru").scalar()
+    )
+    assert stored_password != "correct horse battery"
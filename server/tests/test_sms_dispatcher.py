@@ -0,0 +1,251 @@
+"""
+Drive the SMS outbox through `FakeSMSProvider`: claiming due jobs, retrying
+failed sends and giving up after the last attempt.
+"""
+
+import asyncio
+import datetime
+
+import pytest
+from basemodels import SMSMessageTypeEnum, SMSOutboxStatusEnum
+from models import SMSMessageModel, SMSOutboxModel
+from sms_dispatcher import FakeSMSProvider, SMSDispatcher, enqueue_sms
+
+
+@pytest.fixture
+def provider():
+    return FakeSMSProvider()
+
+
+@pytest.fixture
+def dispatcher(provider):
+    # No backoff, so a failed job is due again on the next dispatch
+    return SMSDispatcher(provider, max_attempts=3, backoff_base_seconds=0)
+
+
+def dispatch(dispatcher: SMSDispatcher) -> int:
+    async def dispatch_due():
+        dispatcher._semaphore = asyncio.Semaphore(dispatcher.concurrency)
+        return await dispatcher.dispatch_due()
+
+    return asyncio.run(dispatch_due())
+
+
+def queue(db, recipients=("+254700000001", "+254700000002")) -> str:
+    job = enqueue_sms(
+        db, "adr-1", SMSMessageTypeEnum.individual_alert, list(recipients), "Alert"
+    )
+    return job.id
+
+
+def get_job(db, job_id: str) -> SMSOutboxModel:
+    db.expire_all()
+    return db.get(SMSOutboxModel, job_id)
+
+
+def test_claims_due_jobs_once(db, dispatcher, provider):
+    job_id = queue(db)
+
+    assert dispatch(dispatcher) == 1
+    assert dispatch(dispatcher) == 0
+
+    job = get_job(db, job_id)
+    assert job.status == SMSOutboxStatusEnum.sent
+    assert job.attempts == 1
+    assert len(provider.sent_messages) == 1
+    assert [message.sms_outbox_id for message in db.query(SMSMessageModel)] == [
+        job_id,
+        job_id,
+    ]
+
+
+def test_skips_jobs_claimed_by_another_worker(db, dispatcher, provider):
+    job_id = queue(db)
+    job = get_job(db, job_id)
+    job.status = SMSOutboxStatusEnum.sending
+    job.claimed_at = datetime.datetime.now(datetime.timezone.utc)
+    db.commit()
+
+    assert dispatch(dispatcher) == 0
+    assert provider.sent_messages == []
+
+
+def test_records_each_job_as_its_send_finishes(db, provider):
+    dispatcher = SMSDispatcher(provider, concurrency=1)
+    first_job_id = queue(db, ["+254700000001"])
+    second_job_id = enqueue_sms(
+        db, "adr-2", SMSMessageTypeEnum.individual_alert, ["+254700000002"], "Alert"
+    ).id
+    statuses_at_send = []
+
+    def send(message, recipients):
+        statuses_at_send.append(
+            {
+                job_id: get_job(db, job_id).status
+                for job_id in [first_job_id, second_job_id]
+            }
+        )
+        return FakeSMSProvider.send(provider, message, recipients)
+
+    provider.send = send
+    dispatch(dispatcher)
+
+    # The job sent first is recorded before the other one is sent
+    assert sorted(statuses_at_send[1].values()) == [
+        SMSOutboxStatusEnum.sending,
+        SMSOutboxStatusEnum.sent,
+    ]
+    assert get_job(db, first_job_id).status == SMSOutboxStatusEnum.sent
+    assert get_job(db, second_job_id).status == SMSOutboxStatusEnum.sent
+
+
+def test_skips_jobs_another_worker_took_over(db, dispatcher, provider):
+    job_id = queue(db)
+    claim_due = dispatcher._claim_due
+
+    def claim_due_then_expire():
+        jobs = claim_due()
+        # The claim expired and another worker claimed the job again
+        job = get_job(db, job_id)
+        job.claimed_at = datetime.datetime.now(
+            datetime.timezone.utc
+        ) + datetime.timedelta(seconds=1)
+        db.commit()
+        return jobs
+
+    dispatcher._claim_due = claim_due_then_expire
+    dispatch(dispatcher)
+
+    assert provider.sent_messages == []
+    assert get_job(db, job_id).status == SMSOutboxStatusEnum.sending
+
+
+def test_retries_after_provider_error(db, dispatcher, provider):
+    job_id = queue(db)
+    provider.fail_next = 1
+
+    dispatch(dispatcher)
+
+    job = get_job(db, job_id)
+    assert job.status == SMSOutboxStatusEnum.pending
+    assert job.attempts == 1
+    assert "unavailable" in job.last_error
+
+    dispatch(dispatcher)
+
+    job = get_job(db, job_id)
+    assert job.status == SMSOutboxStatusEnum.sent
+    assert job.attempts == 2
+    assert job.last_error is None
+
+
+def get_sms_messages(db) -> list:
+    db.expire_all()
+    return [
+        (message.number, message.status)
+        for message in db.query(SMSMessageModel).order_by(SMSMessageModel.number)
+    ]
+
+
+def test_retries_only_transient_rejections(db, dispatcher, provider):
+    job_id = queue(db)
+    provider.gateway_error_numbers = {"+254700000002"}
+
+    dispatch(dispatcher)
+
+    job = get_job(db, job_id)
+    assert job.status == SMSOutboxStatusEnum.pending
+    assert job.recipients == ["+254700000002"]
+    assert "GatewayError" in job.last_error
+    # The retried recipient gets its row once settled
+    assert get_sms_messages(db) == [("+254700000001", "Success")]
+
+    provider.gateway_error_numbers = set()
+    dispatch(dispatcher)
+
+    assert get_job(db, job_id).status == SMSOutboxStatusEnum.sent
+    assert [message["recipients"] for message in provider.sent_messages] == [
+        ["+254700000001", "+254700000002"],
+        ["+254700000002"],
+    ]
+    assert get_sms_messages(db) == [
+        ("+254700000001", "Success"),
+        ("+254700000002", "Success"),
+    ]
+
+
+def test_records_transient_rejections_once_when_giving_up(db, dispatcher, provider):
+    job_id = queue(db)
+    provider.gateway_error_numbers = {"+254700000002"}
+
+    for _ in range(dispatcher.max_attempts):
+        dispatch(dispatcher)
+
+    assert get_job(db, job_id).status == SMSOutboxStatusEnum.failed
+    assert get_sms_messages(db) == [
+        ("+254700000001", "Success"),
+        ("+254700000002", "GatewayError"),
+    ]
+
+
+def test_records_permanent_rejections_once(db, dispatcher, provider):
+    job_id = queue(db)
+    provider.rejected_numbers = {"+254700000002"}
+
+    dispatch(dispatcher)
+    assert dispatch(dispatcher) == 0
+
+    job = get_job(db, job_id)
+    assert job.status == SMSOutboxStatusEnum.sent
+    assert job.attempts == 1
+    assert "InvalidPhoneNumber" in job.last_error
+    assert len(provider.sent_messages) == 1
+    assert get_sms_messages(db) == [
+        ("+254700000001", "Success"),
+        ("+254700000002", "InvalidPhoneNumber"),
+    ]
+
+
+def test_fails_when_every_recipient_is_rejected(db, dispatcher, provider):
+    job_id = queue(db)
+    provider.rejected_numbers = {"+254700000001", "+254700000002"}
+
+    dispatch(dispatcher)
+
+    job = get_job(db, job_id)
+    assert job.status == SMSOutboxStatusEnum.failed
+    assert job.attempts == 1
+    assert dispatch(dispatcher) == 0
+
+
+def test_records_messages_of_a_job_deleted_while_sending(db, dispatcher, provider):
+    job_id = queue(db)
+    send = provider.send
+
+    def delete_then_send(message, recipients):
+        db.delete(get_job(db, job_id))
+        db.commit()
+        return send(message, recipients)
+
+    provider.send = delete_then_send
+    dispatch(dispatcher)
+
+    assert get_job(db, job_id) is None
+    assert [message.sms_outbox_id for message in db.query(SMSMessageModel)] == [
+        None,
+        None,
+    ]
+
+
+def test_fails_after_max_attempts(db, dispatcher, provider):
+    job_id = queue(db)
+    provider.fail_next = dispatcher.max_attempts
+
+    for _ in range(dispatcher.max_attempts):
+        dispatch(dispatcher)
+
+    job = get_job(db, job_id)
+    assert job.status == SMSOutboxStatusEnum.failed
+    assert job.attempts == dispatcher.max_attempts
+    assert dispatch(dispatcher) == 0
+    assert provider.sent_messages == []
@@ -0,0 +1,23 @@
+import time
+
+from models import MedicalInstitutionModel
+
+
+def test_rows_get_the_time_they_were_written(db):
+    first = MedicalInstitutionModel(name="Kenyatta National Hospital")
+    db.add(first)
+    db.commit()
+    time.sleep(0.01)
+    second = MedicalInstitutionModel(name="Moi Teaching and Referral Hospital")
+    db.add(second)
+    db.commit()
+
+    assert first.created_at < second.created_at
+
+    updated_at = first.updated_at
+    time.sleep(0.01)
+    first.name = "Kenyatta National Hospital, Nairobi"
+    db.commit()
+
+    assert first.updated_at > updated_at
+    assert first.created_at < second.created_at
@@ -0,0 +1,148 @@
+import datetime
+import threading
+import time
+import uuid
+
+from config import settings
+from models import RefreshTokenFamilyModel
+from sqlalchemy.orm import Session
+
+
+class RevokedTokenFamilies:
+    """
+    In-process set of revoked refresh token families, so `get_current_user`
+    can reject tokens of revoked sessions without a database round-trip.
+
+    Revocations made by this process are added immediately. The set is
+    reloaded from `refresh_token_family` when it is older than
+    `max_age_seconds` so revocations made by other workers are picked up.
+    """
+
+    def __init__(self, max_age_seconds: int = 30):
+        self.max_age_seconds = max_age_seconds
+        self.family_ids = frozenset()
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session):
+        # Tokens of expired families are rejected by their `exp` claim anyway
+        family_ids = frozenset(
+            family_id
+            for (family_id,) in db.query(RefreshTokenFamilyModel.id).filter(
+                RefreshTokenFamilyModel.revoked_at.is_not(None),
+                RefreshTokenFamilyModel.expires_at
+                > datetime.datetime.now(datetime.timezone.utc),
+            )
+        )
+
+        with self._lock:
+            self.family_ids = family_ids
+            self.refreshed_at = time.monotonic()
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.refreshed_at > self.max_age_seconds
+
+    def add(self, family_id: str):
+        with self._lock:
+            self.family_ids = self.family_ids | {family_id}
+
+    def __contains__(self, family_id: str) -> bool:
+        return family_id in self.family_ids
+
+
+revoked_token_families = RevokedTokenFamilies(
+    max_age_seconds=settings.revoked_token_families_max_age_seconds
+)
+
+
+def create_token_family(
+    db: Session, user_id: str, expires_delta: datetime.timedelta
+) -> RefreshTokenFamilyModel:
+    family = RefreshTokenFamilyModel(
+        user_id=user_id,
+        current_jti=str(uuid.uuid4()),
+        expires_at=datetime.datetime.now(datetime.timezone.utc) + expires_delta,
+    )
+
+    db.add(family)
+    db.commit()
+
+    return family
+
+
+def rotate_token_family(
+    db: Session, family_id: str, jti: str, expires_delta: datetime.timedelta
+) -> RefreshTokenFamilyModel | None:
+    """
+    Move a family on to a new refresh token. Returns None when the family is
+    unknown, revoked, or `jti` is not its current token. The last case means
+    an already rotated token was presented again, so the family is revoked.
+    """
+    new_jti = str(uuid.uuid4())
+
+    # Compare-and-swap so two requests presenting the same token cannot both
+    # rotate it
+    rotated_count = (
+        db.query(RefreshTokenFamilyModel)
+        .filter(
+            RefreshTokenFamilyModel.id == family_id,
+            RefreshTokenFamilyModel.current_jti == jti,
+            RefreshTokenFamilyModel.revoked_at.is_(None),
+        )
+        .update(
+            {
+                RefreshTokenFamilyModel.current_jti: new_jti,
+                RefreshTokenFamilyModel.expires_at: datetime.datetime.now(
+                    datetime.timezone.utc
+                )
+                + expires_delta,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+
+    if rotated_count == 1:
+        return db.get(RefreshTokenFamilyModel, family_id)
+
+    family = db.get(RefreshTokenFamilyModel, family_id)
+
+    if family is not None and family.revoked_at is None:
+        revoke_token_families(db, [family.id])
+
+    return None
+
+
+def revoke_token_families(db: Session, family_ids: list[str]):
+    if not family_ids:
+        return
+
+    db.query(RefreshTokenFamilyModel).filter(
+        RefreshTokenFamilyModel.id.in_(family_ids),
+        RefreshTokenFamilyModel.revoked_at.is_(None),
+    ).update(
+        {
+            RefreshTokenFamilyModel.revoked_at: datetime.datetime.now(
+                datetime.timezone.utc
+            )
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+    for family_id in family_ids:
+        revoked_token_families.add(family_id)
+
+
+def prune_expired_token_families(db: Session) -> int:
+    deleted_count = (
+        db.query(RefreshTokenFamilyModel)
+        .filter(
+            RefreshTokenFamilyModel.expires_at
+            <= datetime.datetime.now(datetime.timezone.utc)
+        )
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+
+    return deleted_count